@@ -126,21 +126,27 @@ module "inspector" {
 module "blue_green_deployment" {
   source = "./modules/blue-green-deployment"
 
-  project_name         = var.project_name
-  environment          = var.environment
-  vpc_id               = module.vpc.vpc_id
-  private_subnet_ids   = module.vpc.private_subnet_ids
-  security_group_id    = module.security_groups.jenkins_security_group_id
-  iam_instance_profile = module.iam.instance_profile_name
-  target_group_arn     = module.alb.target_group_arn
-  efs_file_system_id   = module.efs.file_system_id
-  aws_region           = var.aws_region
-  kms_key_id           = module.iam.kms_key_id
-  kms_key_arn          = module.iam.kms_key_arn
+  project_name            = var.project_name
+  environment             = var.environment
+  vpc_id                  = module.vpc.vpc_id
+  private_subnet_ids      = module.vpc.private_subnet_ids
+  security_group_id       = module.security_groups.jenkins_security_group_id
+  iam_instance_profile    = module.iam.instance_profile_name
+  target_group_arn        = module.alb.target_group_arn
+  green_target_group_arn  = module.alb.green_target_group_arn
+  listener_arn            = module.alb.listener_jenkins_arn
+  probe_security_group_id = module.security_groups.health_prober_security_group_id
+  efs_file_system_id      = module.efs.file_system_id
+  aws_region              = var.aws_region
+  kms_key_id              = module.iam.kms_key_id
+  kms_key_arn             = module.iam.kms_key_arn
 
   # Blue/Green specific configuration
   instance_type = var.jenkins_instance_type
 
+  # Controller signals for the vertical scaler
+  jenkins_url = local.jenkins_url
+
   common_tags = local.common_tags
 }
 
@@ -167,7 +173,7 @@ module "cost_optimization" {
 
   environment          = var.environment
   jenkins_asg_name     = module.blue_green_deployment.blue_asg_name
-  jenkins_url          = "https://${module.alb.dns_name}"
+  jenkins_url          = local.jenkins_url
   cost_alert_email     = var.alert_email
   monthly_budget_limit = "200"
 
@@ -200,4 +206,7 @@ locals {
     ManagedBy   = "Terraform"
     Epic        = "Epic-2-Golden-Image"
   }
+
+  # The ALB only listens on HTTP; Jenkins is served on 8080
+  jenkins_url = "http://${module.alb.dns_name}:8080"
 }
@@ -144,6 +144,38 @@ resource "aws_lb_target_group" "jenkins" {
   })
 }
 
+# Target Group for the green environment; the listener weights traffic
+# between the two during a blue/green switch
+resource "aws_lb_target_group" "jenkins_green" {
+  name     = "${var.environment}-jenkins-green-tg"
+  port     = 8080
+  protocol = "HTTP"
+  vpc_id   = var.vpc_id
+
+  health_check {
+    enabled             = true
+    healthy_threshold   = 2
+    unhealthy_threshold = 5
+    timeout             = 30
+    interval            = 60
+    path                = "/login"
+    matcher             = "200,403"
+    port                = "traffic-port"
+    protocol            = "HTTP"
+  }
+
+  stickiness {
+    type            = "lb_cookie"
+    cookie_duration = 86400
+    enabled         = true
+  }
+
+  tags = merge(var.tags, {
+    Name = "${var.environment}-${replace(lower(var.project_name), " ", "-")}-green-tg"
+    Type = "Jenkins Target Group"
+  })
+}
+
 # ALB Listener - HTTP
 resource "aws_lb_listener" "jenkins_http" {
   load_balancer_arn = aws_lb.jenkins.arn
@@ -174,6 +206,11 @@ resource "aws_lb_listener" "jenkins" {
     target_group_arn = aws_lb_target_group.jenkins.arn
   }
 
+  # The deployment orchestrator owns the blue/green weights after creation
+  lifecycle {
+    ignore_changes = [default_action]
+  }
+
   tags = var.tags
 }
 
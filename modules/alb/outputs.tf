@@ -36,6 +36,11 @@ output "target_group_name" {
   value       = aws_lb_target_group.jenkins.name
 }
 
+output "green_target_group_arn" {
+  description = "ARN of the green environment target group"
+  value       = aws_lb_target_group.jenkins_green.arn
+}
+
 output "listener_http_arn" {
   description = "ARN of the HTTP listener"
   value       = aws_lb_listener.jenkins_http.arn
@@ -9,6 +9,13 @@ locals {
     "t3.medium", # 2 vCPU, 4GB RAM - $30/month
     "t3.large",  # 2 vCPU, 8GB RAM - $60/month
   ]
+
+  # On-demand hourly prices used by the scaler's instance-type catalog
+  instance_prices = {
+    "t3.small"  = 0.0208
+    "t3.medium" = 0.0416
+    "t3.large"  = 0.0832
+  }
 }
 
 # CloudWatch alarm for high memory (scale up)
@@ -49,20 +56,32 @@ resource "aws_cloudwatch_metric_alarm" "high_cpu_scale_up" {
 
 # Lambda function for automatic vertical scaling
 resource "aws_lambda_function" "vertical_scaler" {
-  filename      = "${path.module}/vertical_scaler.zip"
-  function_name = "${var.project_name}-${var.environment}-vertical-scaler"
-  role          = aws_iam_role.vertical_scaler_role.arn
-  handler       = "vertical_scaler.lambda_handler"
-  runtime       = "python3.9"
-  timeout       = 300
-  memory_size   = 256
+  filename         = data.archive_file.vertical_scaler.output_path
+  source_code_hash = data.archive_file.vertical_scaler.output_base64sha256
+  function_name    = "${var.project_name}-${var.environment}-vertical-scaler"
+  role             = aws_iam_role.vertical_scaler_role.arn
+  handler          = "vertical_scaler.lambda_handler"
+  runtime          = "python3.9"
+  timeout          = 300
+  memory_size      = 256
 
   environment {
     variables = {
-      BLUE_ASG_NAME  = aws_autoscaling_group.blue.name
-      GREEN_ASG_NAME = aws_autoscaling_group.green.name
-      INSTANCE_TYPES = jsonencode(local.instance_types)
-      SNS_TOPIC_ARN  = aws_sns_topic.deployment_notifications.arn
+      BLUE_ASG_NAME   = aws_autoscaling_group.blue.name
+      GREEN_ASG_NAME  = aws_autoscaling_group.green.name
+      INSTANCE_TYPES  = jsonencode(local.instance_types)
+      INSTANCE_PRICES = jsonencode(local.instance_prices)
+      SNS_TOPIC_ARN   = aws_sns_topic.deployment_notifications.arn
+      ENVIRONMENT     = var.environment
+      METRICS_MODE    = var.metrics_mode
+
+      METRIC_HISTORY_BUCKET = var.metric_history_bucket
+      METRIC_HISTORY_HOURS  = var.metric_history_hours
+      SCALING_MODE          = var.vertical_scaling_mode
+
+      JENKINS_URL                   = var.jenkins_url
+      JENKINS_METRICS_SOURCE        = var.jenkins_metrics_source
+      JENKINS_CREDENTIALS_PARAMETER = var.jenkins_credentials_parameter
     }
   }
 
@@ -71,6 +90,32 @@ resource "aws_lambda_function" "vertical_scaler" {
   })
 }
 
+# Package the vertical scaler from source so code changes are deployed
+data "archive_file" "vertical_scaler" {
+  type        = "zip"
+  output_path = "${path.module}/vertical_scaler.zip"
+
+  source {
+    content  = file("${path.module}/vertical_scaler.py")
+    filename = "vertical_scaler.py"
+  }
+
+  source {
+    content  = file("${path.module}/../lambda-common/aws_snapshot.py")
+    filename = "aws_snapshot.py"
+  }
+
+  source {
+    content  = file("${path.module}/../lambda-common/metrics.py")
+    filename = "metrics.py"
+  }
+
+  source {
+    content  = file("${path.module}/../lambda-common/jenkins_api.py")
+    filename = "jenkins_api.py"
+  }
+}
+
 # IAM role for vertical scaler Lambda
 resource "aws_iam_role" "vertical_scaler_role" {
   name = "${var.project_name}-${var.environment}-vertical-scaler-role"
@@ -94,16 +139,23 @@ resource "aws_iam_role_policy" "vertical_scaler_policy" {
 
   policy = jsonencode({
     Version = "2012-10-17"
-    Statement = [
+    Statement = concat([
       {
         Effect = "Allow"
         Action = [
           "autoscaling:DescribeAutoScalingGroups",
           "autoscaling:UpdateAutoScalingGroup",
+          "autoscaling:StartInstanceRefresh",
+          "autoscaling:CancelInstanceRefresh",
+          "autoscaling:DescribeInstanceRefreshes",
           "ec2:DescribeLaunchTemplates",
+          "ec2:DescribeLaunchTemplateVersions",
           "ec2:CreateLaunchTemplateVersion",
+          "ec2:DescribeInstanceTypes",
           "ec2:DescribeInstances",
           "cloudwatch:GetMetricStatistics",
+          "cloudwatch:GetMetricData",
+          "cloudwatch:PutMetricData",
           "sns:Publish",
           "logs:CreateLogGroup",
           "logs:CreateLogStream",
@@ -111,7 +163,27 @@ resource "aws_iam_role_policy" "vertical_scaler_policy" {
         ]
         Resource = "*"
       }
-    ]
+      ], var.metric_history_bucket != "" ? [
+      {
+        Effect = "Allow"
+        Action = [
+          "s3:GetObject",
+          "s3:PutObject"
+        ]
+        Resource = "arn:aws:s3:::${var.metric_history_bucket}/vertical-scaler/*"
+      },
+      {
+        Effect   = "Allow"
+        Action   = "s3:ListBucket"
+        Resource = "arn:aws:s3:::${var.metric_history_bucket}"
+      }
+      ] : [], var.jenkins_credentials_parameter != "" ? [
+      {
+        Effect   = "Allow"
+        Action   = "ssm:GetParameter"
+        Resource = "arn:aws:ssm:*:*:parameter/${trimprefix(var.jenkins_credentials_parameter, "/")}"
+      }
+    ] : [])
   })
 }
 
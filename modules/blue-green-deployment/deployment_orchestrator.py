@@ -2,8 +2,15 @@ import json
 import boto3
 import logging
 import os
+import random
+import time
 from datetime import datetime
 
+import health_prober
+from aws_snapshot import AwsSnapshot
+from deployment_timeline import Timeline
+from log_writer import BufferedLogWriter
+
 # Configure logging
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
@@ -11,8 +18,69 @@ logger.setLevel(logging.INFO)
 # Initialize AWS clients
 autoscaling = boto3.client('autoscaling')
 elbv2 = boto3.client('elbv2')
+ec2 = boto3.client('ec2')
 sns = boto3.client('sns')
 cloudwatch = boto3.client('logs')
+metrics = boto3.client('cloudwatch')
+dynamodb = boto3.client('dynamodb')
+ssm = boto3.client('ssm')
+
+# Describe results shared by every step of one invocation
+snapshot = AwsSnapshot()
+
+# Switch checkpoints; without a table they only survive warm invocations
+DEPLOYMENT_STATE_TABLE = os.environ.get('DEPLOYMENT_STATE_TABLE')
+SWITCH_STATE_KEY = 'switch'
+
+# A switch runs as persisted steps, resumed by scheduled ticks and ASG events
+SWITCH_STEPS = ['scale_up', 'wait_healthy', 'validate', 'shift', 'drain']
+# Rolling back onto a standby runs the same way, so no invocation waits for it to serve
+STANDBY_ROLLBACK_STEPS = ['restore_standby', 'finish_rollback']
+STEP_TIMEOUT_SECONDS = int(os.environ.get('STEP_TIMEOUT_SECONDS', '600'))
+BACKOFF_BASE_SECONDS = 10
+BACKOFF_MAX_SECONDS = 120
+
+# Weighted canary shifting: the green target group sits beside TARGET_GROUP_ARN
+# (blue) behind one listener. Without them traffic follows ASG registration.
+GREEN_TARGET_GROUP_ARN = os.environ.get('GREEN_TARGET_GROUP_ARN', '')
+LISTENER_ARN = os.environ.get('LISTENER_ARN', '')
+CANARY_STEPS = json.loads(os.environ.get('CANARY_STEPS', '[10, 25, 50, 100]'))
+CANARY_BAKE_SECONDS = int(os.environ.get('CANARY_BAKE_SECONDS', '300'))
+CANARY_CHECK_SECONDS = 60
+CANARY_MAX_P95_SECONDS = float(os.environ.get('CANARY_MAX_P95_SECONDS', '2.0'))
+CANARY_MAX_5XX_PERCENT = float(os.environ.get('CANARY_MAX_5XX_PERCENT', '1.0'))
+CANARY_MIN_REQUESTS = 50
+CANARY_STICKINESS_SECONDS = 3600
+
+# Probe Jenkins itself on each instance; needs the Lambda inside the VPC
+HEALTH_PROBES_ENABLED = os.environ.get('HEALTH_PROBES_ENABLED', 'false') == 'true'
+
+# After a switch the previous color can stay on standby so a rollback skips
+# the cold boot: 'warm' parks its instances in ASG Standby (running but
+# deregistered), 'warm_pool' stops them in a warm pool. 0 scales it to zero.
+STANDBY_WINDOW_SECONDS = int(os.environ.get('STANDBY_WINDOW_SECONDS', '0'))
+STANDBY_MODE = os.environ.get('STANDBY_MODE', 'warm')
+STANDBY_RESTORE_TIMEOUT_SECONDS = 180
+
+# A warm standby must not keep a second Jenkins on the shared JENKINS_HOME:
+# it is parked with Jenkins stopped and EFS unmounted, and resumed the other
+# way round. The mount comes back from the fstab entry user data wrote.
+JENKINS_HOME = '/var/lib/jenkins'
+STANDBY_PARK_COMMANDS = [
+    'systemctl stop jenkins',
+    f'if mountpoint -q {JENKINS_HOME}; then umount {JENKINS_HOME}; fi'
+]
+STANDBY_RESUME_COMMANDS = [
+    f'mountpoint -q {JENKINS_HOME} || mount {JENKINS_HOME}',
+    'systemctl start jenkins'
+]
+
+# Structured status logs and EMF switch metrics, flushed once per invocation
+LOG_GROUP_NAME = os.environ.get('LOG_GROUP_NAME')
+SWITCH_METRICS_NAMESPACE = 'Jenkins/BlueGreen'
+
+_switch_store = None
+_log_writer = None
 
 def handler(event, context):
     """
@@ -20,18 +88,27 @@ def handler(event, context):
     Handles automated deployment switching and health validation
     """
     
+    snapshot.reset()
+
     try:
         # Get environment variables
         blue_asg_name = os.environ['BLUE_ASG_NAME']
         green_asg_name = os.environ['GREEN_ASG_NAME']
         target_group_arn = os.environ['TARGET_GROUP_ARN']
         sns_topic_arn = os.environ['SNS_TOPIC_ARN']
-        log_group_name = os.environ['LOG_GROUP_NAME']
         
         logger.info(f"Starting deployment orchestration at {datetime.now()}")
         
-        # Determine current active deployment
-        active_deployment = get_active_deployment(blue_asg_name, green_asg_name, target_group_arn)
+        # Resume an in-flight switch on its tick, or early on an ASG event
+        if event.get('action') == 'resume' or event.get('source') == 'aws.autoscaling':
+            return resume_deployment_switch(
+                target_group_arn, sns_topic_arn,
+                force=event.get('source') == 'aws.autoscaling'
+            )
+
+        # Determine current active deployment; later steps reuse this snapshot
+        deployment = resolve_deployment(blue_asg_name, green_asg_name, target_group_arn)
+        active_deployment = deployment['state']
         logger.info(f"Current active deployment: {active_deployment}")
         
         # Check if deployment switch is requested
@@ -40,12 +117,24 @@ def handler(event, context):
                 blue_asg_name, green_asg_name, target_group_arn, 
                 sns_topic_arn, active_deployment
             )
+
+        # Return traffic to the previous color while it is on standby
+        if event.get('action') == 'rollback':
+            return rollback_to_standby(target_group_arn, sns_topic_arn, 'manual rollback')
         
         # Perform health checks on active deployment
-        health_status = perform_health_checks(active_deployment, blue_asg_name, green_asg_name)
+        health_status = perform_health_checks(deployment)
         
         # Log health status
-        log_deployment_status(log_group_name, active_deployment, health_status)
+        log_deployment_status(active_deployment, health_status)
+
+        # A bad cutover found within the standby window rolls straight back
+        if health_status['status'] in ('unhealthy', 'degraded'):
+            state = get_switch_store().load()
+            if get_active_standby(state) and state['to'] == active_deployment:
+                return rollback_to_standby(
+                    target_group_arn, sns_topic_arn, f"{active_deployment} {health_status['status']} after switch"
+                )
         
         return {
             'statusCode': 200,
@@ -69,118 +158,424 @@ def handler(event, context):
             })
         }
 
-def get_active_deployment(blue_asg_name, green_asg_name, target_group_arn):
-    """Determine which deployment is currently active"""
-    
-    try:
-        # Get target group targets
-        response = elbv2.describe_target_health(TargetGroupArn=target_group_arn)
-        
-        if not response['TargetHealthDescriptions']:
-            return None
-        
-        # Get instance IDs from target group
-        target_instance_ids = [target['Target']['Id'] for target in response['TargetHealthDescriptions']]
-        
-        # Check blue ASG instances
-        blue_response = autoscaling.describe_auto_scaling_groups(
-            AutoScalingGroupNames=[blue_asg_name]
-        )
-        blue_instances = [instance['InstanceId'] for instance in blue_response['AutoScalingGroups'][0]['Instances']]
-        
-        # Check if any blue instances are in target group
-        if any(instance_id in target_instance_ids for instance_id in blue_instances):
-            return 'blue'
-        else:
-            return 'green'
-            
-    except Exception as e:
-        logger.error(f"Error determining active deployment: {str(e)}")
-        return None
+    finally:
+        logger.info(f"AWS describe snapshot: {snapshot.report()}")
+        flush_logs()
+
+def resolve_deployment(blue_asg_name, green_asg_name, target_group_arn):
+    """Resolve which colors are serving traffic
+
+    Describes both ASGs in one call and matches their instances against
+    target-group membership (or listener weights with weighted routing).
+    Returns a snapshot whose 'state' is 'blue', 'green', 'mixed' or 'none'.
+    """
+
+    response = snapshot.describe_auto_scaling_groups(autoscaling, [blue_asg_name, green_asg_name])
+    groups = {group['AutoScalingGroupName']: group for group in response['AutoScalingGroups']}
+    asgs = {'blue': groups.get(blue_asg_name), 'green': groups.get(green_asg_name)}
+    instances = {
+        color: {i['InstanceId'] for i in group['Instances']} if group else set()
+        for color, group in asgs.items()
+    }
+
+    if is_weighted_routing():
+        # The listener decides; a color serves if it has weight and instances
+        weights = get_traffic_weights(target_group_arn)
+        serving = {color: instances[color] if weights.get(color, 0) > 0 else set() for color in instances}
+    else:
+        targets = elbv2.describe_target_health(TargetGroupArn=target_group_arn)['TargetHealthDescriptions']
+        registered = {t['Target']['Id'] for t in targets if t.get('TargetHealth', {}).get('State') != 'draining'}
+        serving = {color: ids & registered for color, ids in instances.items()}
+
+    serving_colors = [color for color in ('blue', 'green') if serving[color]]
+    if len(serving_colors) == 2:
+        state = 'mixed'
+    elif serving_colors:
+        state = serving_colors[0]
+    else:
+        state = 'none'
+
+    return {'state': state, 'asgs': asgs, 'instances': instances, 'serving': serving}
 
 def handle_deployment_switch(blue_asg_name, green_asg_name, target_group_arn, sns_topic_arn, current_active):
-    """Handle blue/green deployment switch"""
+    """Start a blue/green deployment switch and run it until its first wait"""
     
-    try:
-        if current_active == 'blue':
-            # Switch from blue to green
-            new_active = 'green'
-            new_asg_name = green_asg_name
-            old_asg_name = blue_asg_name
+    store = get_switch_store()
+    state = store.load()
+    if state and state['status'] == 'in_progress':
+        logger.info(f"Switch {state['switch_id']} already in progress at step {state['step']}")
+        return switch_response(state)
+
+    # A new switch supersedes the last one's standby
+    if get_active_standby(state):
+        release_standby(state['standby'])
+
+    if current_active == 'mixed':
+        logger.error("Both colors are serving traffic; refusing to switch")
+        return {
+            'statusCode': 409,
+            'body': json.dumps({'error': 'Both blue and green are serving traffic', 'active_deployment': 'mixed'})
+        }
+
+    if current_active == 'blue':
+        # Switch from blue to green
+        new_active = 'green'
+        new_asg_name = green_asg_name
+        old_asg_name = blue_asg_name
+    else:
+        # Switch from green to blue
+        new_active = 'blue'
+        new_asg_name = blue_asg_name
+        old_asg_name = green_asg_name
+
+    now = time.time()
+    state = {
+        'switch_id': f"{current_active}-to-{new_active}-{int(now)}",
+        'status': 'in_progress',
+        'from': current_active,
+        'to': new_active,
+        'old_asg_name': old_asg_name,
+        'new_asg_name': new_asg_name,
+        'step': SWITCH_STEPS[0],
+        'step_started_at': now,
+        'step_entered_at': now,
+        'attempt': 0,
+        'next_check_at': 0,
+        'started_at': now,
+        'steps': [],
+        'version': state['version'] if state else 0
+    }
+    if not store.save(state):
+        logger.info("Another switch started concurrently")
+        return switch_response(store.load())
+
+    logger.info(f"Switching from {current_active} to {new_active} ({state['switch_id']})")
+    return switch_response(advance_switch(store, state, target_group_arn, sns_topic_arn))
+
+def resume_deployment_switch(target_group_arn, sns_topic_arn, force=False):
+    """Continue an in-flight switch from its checkpoint
+
+    Scheduled ticks respect the backoff; ASG events (force=True) check
+    immediately, since they usually mean the awaited change has happened.
+    """
+
+    store = get_switch_store()
+    state = store.load()
+
+    standby = get_active_standby(state)
+    if standby and time.time() >= standby['until']:
+        release_standby(standby)
+        store.save(state)
+
+    if not state or state['status'] != 'in_progress':
+        return {'statusCode': 200, 'body': json.dumps({'message': 'No switch in progress'})}
+
+    return switch_response(advance_switch(store, state, target_group_arn, sns_topic_arn, force))
+
+def advance_switch(store, state, target_group_arn, sns_topic_arn, force=False):
+    """Run switch steps until one has to wait or the switch finishes
+
+    The state is checkpointed after every step, so a later invocation picks
+    up exactly where this one stopped.
+    """
+
+    timeline = Timeline(get_log_writer(), state['switch_id'], switch_from=state['from'], switch_to=state['to'])
+    steps = STANDBY_ROLLBACK_STEPS if state.get('standby_rollback') else SWITCH_STEPS
+
+    while state['status'] == 'in_progress':
+        now = time.time()
+        if now < state['next_check_at'] and not force:
+            break
+        force = False
+
+        step = state['step']
+        try:
+            with timeline.span(f"{step}.attempt", attempt=state['attempt']) as span:
+                outcome, message = SWITCH_STEP_HANDLERS[step](state, target_group_arn)
+                span.update(outcome=outcome, message=message)
+        except Exception as e:
+            # Transient API errors are retried with backoff until the step times out
+            outcome, message = 'wait', f"error: {str(e)}"
+        logger.info(f"Switch {state['switch_id']} step {step}: {outcome} ({message})")
+
+        if outcome == 'wait' and now - state['step_started_at'] > STEP_TIMEOUT_SECONDS:
+            outcome, message = 'rollback', f"{step} timed out after {STEP_TIMEOUT_SECONDS}s: {message}"
+
+        if outcome == 'advance':
+            # Steps wait across invocations, so their span runs from the checkpointed entry time
+            entered_at = state.get('step_entered_at', state['step_started_at'])
+            finished_at = time.time()
+            state['steps'].append({'step': step, 'seconds': round(finished_at - entered_at, 1)})
+            timeline.record(step, finished_at - entered_at, entered_at, attempts=state['attempt'] + 1,
+                            instance_ids=state.get('instance_ids') if step == 'wait_healthy' else None)
+            index = steps.index(step) + 1
+            if index < len(steps):
+                state.update(step=steps[index], step_started_at=now, step_entered_at=now,
+                             attempt=0, next_check_at=0)
+            elif state.get('standby_rollback'):
+                state['status'] = 'rolled_back'
+                send_alert(sns_topic_arn, f"Deployment rolled back to {state['from']} standby: {state['error']}")
+            else:
+                state['status'] = 'completed'
+                record_switch_outcome(state, finished_at, timeline)
+                send_alert(sns_topic_arn, f"Deployment switch completed: {state['from']} -> {state['to']}")
+        elif outcome == 'wait':
+            state['attempt'] += 1
+            # Steps that wait on a schedule (canary bakes) set resume_at themselves
+            state['next_check_at'] = state.pop('resume_at', None) or now + get_backoff_seconds(state['attempt'])
         else:
-            # Switch from green to blue
-            new_active = 'blue'
-            new_asg_name = blue_asg_name
-            old_asg_name = green_asg_name
-        
-        logger.info(f"Switching from {current_active} to {new_active}")
-        
-        # Step 1: Scale up new environment
-        logger.info(f"Scaling up {new_active} environment")
-        autoscaling.update_auto_scaling_group(
-            AutoScalingGroupName=new_asg_name,
-            MinSize=1,
-            MaxSize=3,
-            DesiredCapacity=1
+            logger.error(f"Switch {state['switch_id']} failed at {step}, rolling back: {message}")
+            state['status'] = 'rolled_back'
+            state['error'] = message
+            rollback_deployment(
+                state['old_asg_name'], state['new_asg_name'], target_group_arn, sns_topic_arn,
+                old_target_group_arn=get_target_group_arn(state['from'], target_group_arn),
+                timeline=timeline
+            )
+            record_switch_outcome(state, time.time(), timeline)
+
+        if not store.save(state):
+            logger.info(f"Switch {state['switch_id']} was advanced by another invocation")
+            return store.load()
+
+    return state
+
+def record_switch_outcome(state, now, timeline):
+    """Span for the whole switch, plus a rollback count by outcome"""
+    timeline.record('switch', now - state['started_at'], state['started_at'],
+                    outcome=state['status'], steps=state['steps'], error=state.get('error'))
+    get_log_writer().metric(
+        SWITCH_METRICS_NAMESPACE,
+        {'SwitchRollbacks': (1 if state['status'] == 'rolled_back' else 0, 'Count')},
+        {'Outcome': state['status']},
+        {'switch_id': state['switch_id'], 'from': state['from'], 'to': state['to']}
+    )
+
+def get_backoff_seconds(attempt):
+    """Exponential backoff with equal jitter, capped at BACKOFF_MAX_SECONDS"""
+    delay = min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * 2 ** attempt)
+    return delay / 2 + random.uniform(0, delay / 2)
+
+def switch_response(state):
+    """Lambda response describing a switch's progress"""
+    status_codes = {'in_progress': 202, 'completed': 200, 'rolled_back': 500}
+    return {
+        'statusCode': status_codes.get(state['status'], 200),
+        'body': json.dumps({
+            'switch_id': state['switch_id'],
+            'status': state['status'],
+            'step': state['step'],
+            'new_active': state['to'],
+            'next_check_at': state['next_check_at'],
+            'error': state.get('error'),
+            'timestamp': datetime.now().isoformat()
+        })
+    }
+
+def step_scale_up(state, target_group_arn):
+    """Scale up the new environment"""
+    autoscaling.update_auto_scaling_group(
+        AutoScalingGroupName=state['new_asg_name'],
+        MinSize=1,
+        MaxSize=3,
+        DesiredCapacity=1
+    )
+    snapshot.invalidate(autoscaling)
+    return 'advance', f"scaled up {state['to']}"
+
+def step_wait_healthy(state, target_group_arn):
+    """Wait for the new environment's instances to become healthy"""
+    healthy = get_healthy_instance_ids(state['new_asg_name'])
+    if healthy:
+        # Lets the timeline report tie instance boot phases to this switch
+        state['instance_ids'] = healthy
+        return 'advance', f"{len(healthy)} healthy instances"
+    return 'wait', f"no healthy instances yet (attempt {state['attempt'] + 1})"
+
+def step_validate(state, target_group_arn):
+    """Health-check the new environment before it takes traffic"""
+    new_target_group_arn = get_target_group_arn(state['to'], target_group_arn) if is_weighted_routing() else None
+    healthy, probe = validate_new_deployment_health(state['new_asg_name'], new_target_group_arn)
+    if probe:
+        state['probe'] = summarize_probe(probe)
+    if healthy:
+        return 'advance', 'health checks passed'
+    return 'rollback', 'health checks failed'
+
+def step_shift(state, target_group_arn):
+    """Move traffic to the new environment, one gated canary weight at a time
+
+    Each weight bakes for CANARY_BAKE_SECONDS and is checked every minute;
+    a breach of the latency or error gate rolls the switch back.
+    """
+
+    if not is_weighted_routing():
+        switch_traffic(state['new_asg_name'], target_group_arn)
+        return 'advance', 'traffic switched'
+
+    now = time.time()
+    index = state.get('canary_index', -1)
+
+    if index >= 0:
+        gate = evaluate_canary_gates(
+            get_target_group_arn(state['to'], target_group_arn),
+            state['canary_started_at'],
+            now
         )
-        
-        # Step 2: Wait for new instances to be healthy
-        wait_for_healthy_instances(new_asg_name, target_group_arn)
-        
-        # Step 3: Perform health checks on new environment
-        if not validate_new_deployment_health(new_asg_name):
-            # Rollback if health checks fail
-            logger.error(f"Health checks failed for {new_active}, rolling back")
-            rollback_deployment(old_asg_name, new_asg_name, target_group_arn, sns_topic_arn)
-            return {
-                'statusCode': 500,
-                'body': json.dumps({'error': 'Deployment failed health checks, rolled back'})
-            }
-        
-        # Step 4: Switch traffic to new environment
-        switch_traffic(new_asg_name, target_group_arn)
-        
-        # Step 5: Scale down old environment
-        logger.info(f"Scaling down {current_active} environment")
-        autoscaling.update_auto_scaling_group(
-            AutoScalingGroupName=old_asg_name,
-            MinSize=0,
-            MaxSize=0,
-            DesiredCapacity=0
+        state.setdefault('canary_gates', []).append({'weight': CANARY_STEPS[index], **gate})
+        if not gate['passed']:
+            return 'rollback', f"canary gate failed at {CANARY_STEPS[index]}%: {gate['reason']}"
+
+        bake_ends = state['canary_started_at'] + CANARY_BAKE_SECONDS
+        if now < bake_ends:
+            # A passing check is progress; only a stuck shift should time out
+            state['step_started_at'] = now
+            state['resume_at'] = min(bake_ends, now + CANARY_CHECK_SECONDS)
+            return 'wait', f"baking at {CANARY_STEPS[index]}% ({gate['reason']})"
+
+        if index == len(CANARY_STEPS) - 1:
+            return 'advance', f"{state['to']} serving {CANARY_STEPS[index]}% after {len(CANARY_STEPS)} canary steps"
+
+    index += 1
+    set_traffic_weights(target_group_arn, state['to'], CANARY_STEPS[index])
+    state.update(canary_index=index, canary_started_at=now, step_started_at=now)
+    state['resume_at'] = now + min(CANARY_CHECK_SECONDS, CANARY_BAKE_SECONDS)
+    return 'wait', f"shifted {CANARY_STEPS[index]}% to {state['to']}"
+
+def step_drain(state, target_group_arn):
+    """Scale down the old environment, or park it on standby for a fast rollback"""
+    if STANDBY_WINDOW_SECONDS > 0:
+        state['standby'] = enter_standby(state['from'], state['old_asg_name'])
+        return 'advance', f"{state['from']} on {STANDBY_MODE} standby for {STANDBY_WINDOW_SECONDS}s"
+
+    autoscaling.update_auto_scaling_group(
+        AutoScalingGroupName=state['old_asg_name'],
+        MinSize=0,
+        MaxSize=0,
+        DesiredCapacity=0
+    )
+    snapshot.invalidate(autoscaling)
+    return 'advance', f"scaled down {state['from']}"
+
+def step_restore_standby(state, target_group_arn):
+    """Bring the previous color back from standby and wait for a healthy target
+
+    Gives up waiting after STANDBY_RESTORE_TIMEOUT_SECONDS: the rollback
+    was asked for because the new color is bad, so it goes ahead anyway.
+    """
+    standby = state['standby']
+    if not standby.get('restore_started_at'):
+        restore_standby(standby)
+
+    old_target_group_arn = get_target_group_arn(state['from'], target_group_arn)
+    if is_standby_serving(standby, old_target_group_arn):
+        return 'advance', f"{state['from']} serving again"
+    if time.time() - standby['restore_started_at'] > STANDBY_RESTORE_TIMEOUT_SECONDS:
+        return 'advance', f"{state['from']} not serving after {STANDBY_RESTORE_TIMEOUT_SECONDS}s, rolling back anyway"
+    return 'wait', f"waiting for {state['from']} to serve (attempt {state['attempt'] + 1})"
+
+def step_finish_rollback(state, target_group_arn):
+    """Return traffic to the restored color and scale the new one down"""
+    rollback_deployment(
+        state['old_asg_name'], state['new_asg_name'], target_group_arn, None,
+        old_target_group_arn=get_target_group_arn(state['from'], target_group_arn),
+        timeline=Timeline(get_log_writer(), state['switch_id'], switch_from=state['from'], switch_to=state['to']),
+        standby=state['standby'],
+        alert=False
+    )
+    return 'advance', f"rolled back to {state['from']}"
+
+SWITCH_STEP_HANDLERS = {
+    'scale_up': step_scale_up,
+    'wait_healthy': step_wait_healthy,
+    'validate': step_validate,
+    'shift': step_shift,
+    'drain': step_drain,
+    'restore_standby': step_restore_standby,
+    'finish_rollback': step_finish_rollback
+}
+
+class InMemorySwitchStore:
+    """Switch checkpoint held by this container only"""
+
+    def __init__(self):
+        self.state = None
+
+    def load(self):
+        return json.loads(json.dumps(self.state)) if self.state else None
+
+    def save(self, state):
+        if (self.state or {}).get('version', 0) != state['version']:
+            return False
+        state['version'] += 1
+        self.state = json.loads(json.dumps(state))
+        return True
+
+class DynamoDBSwitchStore:
+    """Switch checkpoint in DynamoDB, versioned so concurrent invocations cannot both advance it"""
+
+    def __init__(self, table_name):
+        self.table_name = table_name
+
+    def load(self):
+        response = dynamodb.get_item(
+            TableName=self.table_name,
+            Key={'pk': {'S': SWITCH_STATE_KEY}},
+            ConsistentRead=True
         )
-        
-        # Send success notification
-        send_alert(sns_topic_arn, f"Deployment switch completed: {current_active} -> {new_active}")
-        
-        return {
-            'statusCode': 200,
-            'body': json.dumps({
-                'message': f'Successfully switched from {current_active} to {new_active}',
-                'new_active': new_active,
-                'timestamp': datetime.now().isoformat()
-            })
-        }
-        
-    except Exception as e:
-        logger.error(f"Error during deployment switch: {str(e)}")
-        send_alert(sns_topic_arn, f"Deployment switch failed: {str(e)}")
-        raise
+        item = response.get('Item')
+        if not item:
+            return None
+        state = json.loads(item['state']['S'])
+        state['version'] = int(item['version']['N'])
+        return state
+
+    def save(self, state):
+        """Write the checkpoint if nobody else has since; returns False on a lost race"""
+        expected = state['version']
+        body = {k: v for k, v in state.items() if k != 'version'}
+        try:
+            dynamodb.put_item(
+                TableName=self.table_name,
+                Item={
+                    'pk': {'S': SWITCH_STATE_KEY},
+                    'state': {'S': json.dumps(body)},
+                    'status': {'S': state['status']},
+                    'version': {'N': str(expected + 1)}
+                },
+                ConditionExpression='attribute_not_exists(pk) OR version = :expected',
+                ExpressionAttributeValues={':expected': {'N': str(expected)}}
+            )
+        except dynamodb.exceptions.ConditionalCheckFailedException:
+            return False
+        state['version'] = expected + 1
+        return True
+
+def get_switch_store():
+    """Return the switch checkpoint store, reused across warm invocations"""
+    global _switch_store
+
+    if _switch_store is None:
+        if DEPLOYMENT_STATE_TABLE:
+            _switch_store = DynamoDBSwitchStore(DEPLOYMENT_STATE_TABLE)
+        else:
+            _switch_store = InMemorySwitchStore()
+    return _switch_store
 
-def perform_health_checks(active_deployment, blue_asg_name, green_asg_name):
-    """Perform comprehensive health checks on active deployment"""
+def perform_health_checks(deployment):
+    """Perform comprehensive health checks on the serving deployment"""
     
-    if not active_deployment:
+    if deployment['state'] == 'none':
         return {'status': 'unknown', 'message': 'No active deployment found'}
     
     try:
-        asg_name = blue_asg_name if active_deployment == 'blue' else green_asg_name
-        
-        # Get ASG instances
-        response = autoscaling.describe_auto_scaling_groups(
-            AutoScalingGroupNames=[asg_name]
-        )
-        
-        instances = response['AutoScalingGroups'][0]['Instances']
+        # Instances of every serving color, from the resolver's snapshot
+        colors = ['blue', 'green'] if deployment['state'] == 'mixed' else [deployment['state']]
+        instances = [
+            instance
+            for color in colors
+            for instance in deployment['asgs'][color]['Instances']
+        ]
         
         if not instances:
             return {'status': 'unhealthy', 'message': 'No instances in ASG'}
@@ -189,63 +584,100 @@ def perform_health_checks(active_deployment, blue_asg_name, green_asg_name):
         
         health_percentage = len(healthy_instances) / len(instances) * 100
         
-        return {
+        health_status = {
             'status': 'healthy' if health_percentage >= 100 else 'degraded',
             'healthy_instances': len(healthy_instances),
             'total_instances': len(instances),
             'health_percentage': health_percentage
         }
+
+        # Instances the ASG calls healthy must also be serving Jenkins
+        if HEALTH_PROBES_ENABLED and healthy_instances:
+            probe = probe_application_health([i['InstanceId'] for i in healthy_instances])
+            health_status['application'] = summarize_probe(probe)
+            if not probe['healthy']:
+                health_status['status'] = 'degraded'
+
+        return health_status
         
     except Exception as e:
         logger.error(f"Error performing health checks: {str(e)}")
         return {'status': 'error', 'message': str(e)}
 
-def wait_for_healthy_instances(asg_name, target_group_arn, timeout=600):
-    """Wait for instances to become healthy"""
-    import time
+def get_healthy_instance_ids(asg_name):
+    """IDs of the healthy instances in an ASG"""
     
-    start_time = time.time()
-    
-    while time.time() - start_time < timeout:
-        try:
-            # Check ASG instance health
-            response = autoscaling.describe_auto_scaling_groups(
-                AutoScalingGroupNames=[asg_name]
-            )
-            
-            instances = response['AutoScalingGroups'][0]['Instances']
-            healthy_instances = [i for i in instances if i['HealthStatus'] == 'Healthy']
-            
-            if len(healthy_instances) >= 1:
-                logger.info(f"Instances in {asg_name} are healthy")
-                return True
-                
-            time.sleep(30)
-            
-        except Exception as e:
-            logger.error(f"Error waiting for healthy instances: {str(e)}")
-            time.sleep(30)
-    
-    raise Exception(f"Timeout waiting for healthy instances in {asg_name}")
+    try:
+        response = snapshot.describe_auto_scaling_groups(autoscaling, [asg_name])
+        instances = response['AutoScalingGroups'][0]['Instances']
+        return [i['InstanceId'] for i in instances if i['HealthStatus'] == 'Healthy']
+        
+    except Exception as e:
+        logger.error(f"Error checking instance health: {str(e)}")
+        return []
+
+def validate_new_deployment_health(asg_name, target_group_arn=None):
+    """Validate health of new deployment before switching traffic
 
-def validate_new_deployment_health(asg_name):
-    """Validate health of new deployment before switching traffic"""
-    # Implementation would include application-specific health checks
-    # For now, return True if instances are running
+    Requires a healthy instance in the ASG, every target healthy in the new
+    environment's own target group (if it has one) and, with probes enabled,
+    Jenkins answering on every instance. Returns (healthy, probe report or None).
+    """
     
     try:
-        response = autoscaling.describe_auto_scaling_groups(
-            AutoScalingGroupNames=[asg_name]
-        )
+        response = snapshot.describe_auto_scaling_groups(autoscaling, [asg_name])
         
         instances = response['AutoScalingGroups'][0]['Instances']
         healthy_instances = [i for i in instances if i['HealthStatus'] == 'Healthy']
         
-        return len(healthy_instances) >= 1
+        if len(healthy_instances) < 1:
+            return False, None
+
+        if target_group_arn:
+            targets = elbv2.describe_target_health(TargetGroupArn=target_group_arn)['TargetHealthDescriptions']
+            states = [t['TargetHealth']['State'] for t in targets]
+            logger.info(f"Target health in new target group: {states}")
+            if not states or any(state != 'healthy' for state in states):
+                return False, None
+
+        if HEALTH_PROBES_ENABLED:
+            probe = probe_application_health([i['InstanceId'] for i in healthy_instances])
+            return probe['healthy'], probe
+
+        return True, None
         
     except Exception as e:
         logger.error(f"Error validating deployment health: {str(e)}")
-        return False
+        return False, None
+
+def probe_application_health(instance_ids):
+    """Probe /login, /api/json and /whoAmI on each instance concurrently"""
+    
+    addresses = {
+        instance['PrivateIpAddress']: instance['InstanceId']
+        for instance in snapshot.describe_instances(ec2, instance_ids)
+        if instance.get('PrivateIpAddress')
+    }
+
+    result = health_prober.probe_instances(list(addresses))
+    result['instances'] = {addresses[ip]: report for ip, report in result['instances'].items()}
+    logger.info(f"Application probe: healthy={result['healthy']} over {result['connections']} connections")
+    return result
+
+def summarize_probe(probe):
+    """Per-instance latency and error summary of a probe, for state and logs"""
+    return {
+        'healthy': probe['healthy'],
+        'instances': {
+            instance_id: {
+                'healthy': report['healthy'],
+                'p50': report['p50'],
+                'p95': report['p95'],
+                'error_rate': report['error_rate']
+            }
+            for instance_id, report in probe['instances'].items()
+        }
+    }
 
 def switch_traffic(new_asg_name, target_group_arn):
     """Switch traffic to new deployment"""
@@ -253,57 +685,367 @@ def switch_traffic(new_asg_name, target_group_arn):
     # For this implementation, we assume the ASG handles target registration
     logger.info(f"Traffic switched to {new_asg_name}")
 
-def rollback_deployment(old_asg_name, new_asg_name, target_group_arn, sns_topic_arn):
-    """Rollback deployment in case of failure"""
+def is_weighted_routing():
+    """True when blue and green each have a target group behind a shared listener"""
+    return bool(GREEN_TARGET_GROUP_ARN and LISTENER_ARN)
+
+def get_target_group_arn(color, target_group_arn):
+    """Target group serving a deployment color; TARGET_GROUP_ARN is blue's"""
+    if color == 'green' and GREEN_TARGET_GROUP_ARN:
+        return GREEN_TARGET_GROUP_ARN
+    return target_group_arn
+
+def get_traffic_weights(target_group_arn):
+    """Current listener weight per color"""
+    listener = snapshot.describe(elbv2, 'describe_listeners', ListenerArns=[LISTENER_ARN])['Listeners'][0]
+    colors = {target_group_arn: 'blue', GREEN_TARGET_GROUP_ARN: 'green'}
+    weights = {}
+    for action in listener['DefaultActions']:
+        if action['Type'] != 'forward':
+            continue
+        groups = action.get('ForwardConfig', {}).get('TargetGroups')
+        if not groups:
+            groups = [{'TargetGroupArn': action['TargetGroupArn'], 'Weight': 1}]
+        total = sum(g.get('Weight', 1) for g in groups) or 1
+        for group in groups:
+            if group['TargetGroupArn'] in colors:
+                weights[colors[group['TargetGroupArn']]] = 100 * group.get('Weight', 1) / total
+    return weights
+
+def set_traffic_weights(target_group_arn, new_color, weight):
+    """Send `weight` percent of new sessions to new_color and the rest to the other color"""
+    new_arn = get_target_group_arn(new_color, target_group_arn)
+    old_arn = GREEN_TARGET_GROUP_ARN if new_arn == target_group_arn else target_group_arn
+    elbv2.modify_listener(
+        ListenerArn=LISTENER_ARN,
+        DefaultActions=[{
+            'Type': 'forward',
+            'ForwardConfig': {
+                'TargetGroups': [
+                    {'TargetGroupArn': new_arn, 'Weight': weight},
+                    {'TargetGroupArn': old_arn, 'Weight': 100 - weight}
+                ],
+                # Keep Jenkins sessions on the color they started on
+                'TargetGroupStickinessConfig': {
+                    'Enabled': True,
+                    'DurationSeconds': CANARY_STICKINESS_SECONDS
+                }
+            }
+        }]
+    )
+    snapshot.invalidate(elbv2)
+    logger.info(f"Listener weights: {new_color}={weight}%")
+
+def get_arn_suffix(arn, marker):
+    """CloudWatch dimension value for an ELB ARN, e.g. 'targetgroup/name/id'"""
+    suffix = arn[arn.index(marker):]
+    # Listener ARNs extend the load balancer's: app/name/id/listener-id
+    return '/'.join(suffix.split('/')[:3])
+
+def evaluate_canary_gates(target_group_arn, start, end):
+    """Check the new target group's p95 latency and 5xx rate since the weight changed"""
+
+    dimensions = [
+        {'Name': 'TargetGroup', 'Value': get_arn_suffix(target_group_arn, 'targetgroup/')},
+        {'Name': 'LoadBalancer', 'Value': get_arn_suffix(LISTENER_ARN, 'app/')}
+    ]
+    queries = {
+        'p95': ('TargetResponseTime', 'p95'),
+        'errors': ('HTTPCode_Target_5XX_Count', 'Sum'),
+        'requests': ('RequestCount', 'Sum')
+    }
+    response = metrics.get_metric_data(
+        MetricDataQueries=[
+            {
+                'Id': query_id,
+                'MetricStat': {
+                    'Metric': {
+                        'Namespace': 'AWS/ApplicationELB',
+                        'MetricName': metric_name,
+                        'Dimensions': dimensions
+                    },
+                    'Period': 60,
+                    'Stat': stat
+                }
+            }
+            for query_id, (metric_name, stat) in queries.items()
+        ],
+        StartTime=datetime.utcfromtimestamp(start - 60),
+        EndTime=datetime.utcfromtimestamp(end)
+    )
+    values = {result['Id']: result['Values'] for result in response['MetricDataResults']}
+
+    requests = sum(values.get('requests', []))
+    errors = sum(values.get('errors', []))
+    p95 = max(values.get('p95', []), default=0)
+    error_percent = 100 * errors / requests if requests else 0
+    gate = {'requests': requests, 'p95_seconds': round(p95, 3), 'error_percent': round(error_percent, 2)}
+
+    if p95 > CANARY_MAX_P95_SECONDS:
+        return {**gate, 'passed': False, 'reason': f"p95 {p95:.2f}s > {CANARY_MAX_P95_SECONDS}s"}
+    if requests >= CANARY_MIN_REQUESTS and error_percent > CANARY_MAX_5XX_PERCENT:
+        return {**gate, 'passed': False, 'reason': f"5xx {error_percent:.1f}% > {CANARY_MAX_5XX_PERCENT}%"}
+    return {**gate, 'passed': True, 'reason': f"p95 {p95:.2f}s, 5xx {error_percent:.1f}% of {requests:.0f}"}
+
+def rollback_deployment(old_asg_name, new_asg_name, target_group_arn, sns_topic_arn, old_target_group_arn=None,
+                        timeline=None, standby=None, alert=True):
+    """Rollback deployment in case of failure
+
+    With a standby the old environment has already been brought back by
+    the restore_standby step, so it is not cold-booted. With alert=False
+    (run as a step) errors propagate for the step machine to retry.
+    """
+
+    timeline = timeline or Timeline(get_log_writer(), f"rollback-{int(time.time())}")
     
     try:
         logger.info("Rolling back deployment")
+
+        with timeline.span('rollback', standby=standby['mode'] if standby else None):
+            if standby:
+                with timeline.span('rollback.release_warm_pool', mode=standby['mode']):
+                    finish_standby_restore(standby)
+
+            # Send every new session back to the old environment first
+            if is_weighted_routing() and old_target_group_arn:
+                old_color = 'green' if old_target_group_arn == GREEN_TARGET_GROUP_ARN else 'blue'
+                with timeline.span('rollback.restore_traffic'):
+                    set_traffic_weights(target_group_arn, old_color, 100)
+            
+            # Scale up old environment
+            if not standby:
+                with timeline.span('rollback.scale_up_old'):
+                    autoscaling.update_auto_scaling_group(
+                        AutoScalingGroupName=old_asg_name,
+                        MinSize=1,
+                        MaxSize=3,
+                        DesiredCapacity=1
+                    )
+            
+            # Scale down new environment
+            with timeline.span('rollback.scale_down_new'):
+                autoscaling.update_auto_scaling_group(
+                    AutoScalingGroupName=new_asg_name,
+                    MinSize=0,
+                    MaxSize=0,
+                    DesiredCapacity=0
+                )
+            snapshot.invalidate(autoscaling)
         
-        # Scale up old environment
+        if alert:
+            send_alert(sns_topic_arn, "Deployment rolled back due to health check failures")
+        
+    except Exception as e:
+        logger.error(f"Error during rollback: {str(e)}")
+        if not alert:
+            raise
+        send_alert(sns_topic_arn, f"Rollback failed: {str(e)}")
+
+def get_active_standby(state):
+    """Standby left by the last switch, if it completed and still holds one"""
+    if state and state['status'] == 'completed' and state.get('standby') and not state['standby'].get('released_at'):
+        return state['standby']
+    return None
+
+def enter_standby(color, asg_name):
+    """Take an environment out of service but keep it ready to return
+
+    Safe to repeat: instances already on standby are left alone.
+    """
+
+    instance_ids = []
+    if STANDBY_MODE == 'warm_pool':
+        # Scale-in returns the instance to the pool stopped, EFS and Jenkins already set up
+        autoscaling.put_warm_pool(
+            AutoScalingGroupName=asg_name,
+            MaxGroupPreparedCapacity=1,
+            MinSize=0,
+            PoolState='Stopped',
+            InstanceReusePolicy={'ReuseOnScaleIn': True}
+        )
         autoscaling.update_auto_scaling_group(
-            AutoScalingGroupName=old_asg_name,
+            AutoScalingGroupName=asg_name,
+            MinSize=0,
+            MaxSize=1,
+            DesiredCapacity=0
+        )
+    else:
+        group = snapshot.describe_auto_scaling_groups(autoscaling, [asg_name])['AutoScalingGroups'][0]
+        in_service = [i['InstanceId'] for i in group['Instances'] if i['LifecycleState'] == 'InService']
+        instance_ids = [
+            i['InstanceId'] for i in group['Instances']
+            if i['LifecycleState'] in ('InService', 'EnteringStandby', 'Standby')
+        ]
+        # Entering standby lowers desired capacity, which may not go below the minimum
+        autoscaling.update_auto_scaling_group(AutoScalingGroupName=asg_name, MinSize=0)
+        if in_service:
+            autoscaling.enter_standby(
+                AutoScalingGroupName=asg_name,
+                InstanceIds=in_service,
+                ShouldDecrementDesiredCapacity=True
+            )
+        if instance_ids:
+            run_on_instances(instance_ids, STANDBY_PARK_COMMANDS, f"Park {color} Jenkins on standby")
+    snapshot.invalidate(autoscaling)
+
+    return {
+        'mode': STANDBY_MODE,
+        'color': color,
+        'asg_name': asg_name,
+        'instance_ids': instance_ids,
+        'until': time.time() + STANDBY_WINDOW_SECONDS
+    }
+
+def restore_standby(standby):
+    """Start putting a standby environment back into service
+
+    Exiting Standby re-registers running instances in seconds; a warm pool
+    instance only has to start. is_standby_serving tells when it is done.
+    """
+
+    asg_name = standby['asg_name']
+    if standby['mode'] == 'warm_pool':
+        autoscaling.update_auto_scaling_group(
+            AutoScalingGroupName=asg_name,
             MinSize=1,
             MaxSize=3,
             DesiredCapacity=1
         )
-        
-        # Scale down new environment
+    else:
+        group = snapshot.describe_auto_scaling_groups(autoscaling, [asg_name])['AutoScalingGroups'][0]
+        parked = [
+            i['InstanceId'] for i in group['Instances']
+            if i['InstanceId'] in standby['instance_ids'] and i['LifecycleState'] == 'Standby'
+        ]
+        if parked:
+            # The new color is being rolled back, so its controller is the one to go
+            run_on_instances(parked, STANDBY_RESUME_COMMANDS, f"Resume {standby['color']} Jenkins from standby")
+            autoscaling.exit_standby(AutoScalingGroupName=asg_name, InstanceIds=parked)
+        # Replaces anything lost while parked; parked instances count once back
         autoscaling.update_auto_scaling_group(
-            AutoScalingGroupName=new_asg_name,
-            MinSize=0,
-            MaxSize=0,
-            DesiredCapacity=0
+            AutoScalingGroupName=asg_name,
+            MinSize=1,
+            MaxSize=3,
+            DesiredCapacity=max(1, len(parked))
         )
-        
-        send_alert(sns_topic_arn, "Deployment rolled back due to health check failures")
-        
-    except Exception as e:
-        logger.error(f"Error during rollback: {str(e)}")
-        send_alert(sns_topic_arn, f"Rollback failed: {str(e)}")
+    snapshot.invalidate(autoscaling)
+    standby['restore_started_at'] = time.time()
+
+def run_on_instances(instance_ids, commands, comment):
+    """Run shell commands on instances through SSM Run Command"""
+    response = ssm.send_command(
+        InstanceIds=instance_ids,
+        DocumentName='AWS-RunShellScript',
+        Comment=comment,
+        Parameters={'commands': commands}
+    )
+    logger.info(f"{comment}: command {response['Command']['CommandId']} on {', '.join(instance_ids)}")
+    return response['Command']['CommandId']
+
+def is_standby_serving(standby, target_group_arn):
+    """True once a restored standby instance is InService with a healthy target"""
+    group = snapshot.describe_auto_scaling_groups(autoscaling, [standby['asg_name']])['AutoScalingGroups'][0]
+    instance_ids = {i['InstanceId'] for i in group['Instances'] if i['LifecycleState'] == 'InService'}
+    targets = elbv2.describe_target_health(TargetGroupArn=target_group_arn)['TargetHealthDescriptions']
+    return any(t['Target']['Id'] in instance_ids and t['TargetHealth']['State'] == 'healthy' for t in targets)
+
+def finish_standby_restore(standby):
+    """Drop what is left of a restored standby"""
+    if standby['mode'] == 'warm_pool':
+        # The pool is empty once its instance is back in service
+        autoscaling.delete_warm_pool(AutoScalingGroupName=standby['asg_name'], ForceDelete=True)
+        snapshot.invalidate(autoscaling)
+    standby['released_at'] = time.time()
+
+def release_standby(standby):
+    """Scale a standby environment down for good once its window has passed"""
+    asg_name = standby['asg_name']
+    logger.info(f"Releasing {standby['mode']} standby of {standby['color']}")
+
+    if standby['mode'] == 'warm_pool':
+        autoscaling.delete_warm_pool(AutoScalingGroupName=asg_name, ForceDelete=True)
+    else:
+        group = snapshot.describe_auto_scaling_groups(autoscaling, [asg_name])['AutoScalingGroups'][0]
+        for instance in group['Instances']:
+            if instance['InstanceId'] in standby['instance_ids'] and instance['LifecycleState'] == 'Standby':
+                autoscaling.terminate_instance_in_auto_scaling_group(
+                    InstanceId=instance['InstanceId'],
+                    ShouldDecrementDesiredCapacity=False
+                )
+
+    autoscaling.update_auto_scaling_group(
+        AutoScalingGroupName=asg_name,
+        MinSize=0,
+        MaxSize=0,
+        DesiredCapacity=0
+    )
+    snapshot.invalidate(autoscaling)
+    standby['released_at'] = time.time()
+
+def rollback_to_standby(target_group_arn, sns_topic_arn, reason):
+    """Roll a completed switch back onto the previous color's standby"""
+
+    store = get_switch_store()
+    state = store.load()
+    standby = get_active_standby(state)
+    if not standby:
+        return {
+            'statusCode': 409,
+            'body': json.dumps({'error': 'No standby environment to roll back to'})
+        }
+
+    logger.warning(f"Rolling switch {state['switch_id']} back to {state['from']} standby: {reason}")
+    now = time.time()
+    state.update(
+        status='in_progress',
+        standby_rollback=True,
+        error=reason,
+        step=STANDBY_ROLLBACK_STEPS[0],
+        step_started_at=now,
+        step_entered_at=now,
+        attempt=0,
+        next_check_at=0
+    )
+    if not store.save(state):
+        logger.info("Switch state changed concurrently; not rolling back")
+        return switch_response(store.load())
+    # Runs until the standby has to be waited for; resume ticks finish it
+    state = advance_switch(store, state, target_group_arn, sns_topic_arn)
+
+    return {
+        'statusCode': 200 if state['status'] == 'rolled_back' else 202,
+        'body': json.dumps({
+            'switch_id': state['switch_id'],
+            'status': state['status'],
+            'active_deployment': state['from'],
+            'standby_mode': standby['mode'],
+            'error': reason,
+            'timestamp': datetime.now().isoformat()
+        })
+    }
 
-def log_deployment_status(log_group_name, active_deployment, health_status):
+def get_log_writer():
+    """Return the buffered log writer, reused across warm invocations"""
+    global _log_writer
+
+    if _log_writer is None:
+        _log_writer = BufferedLogWriter(cloudwatch, LOG_GROUP_NAME)
+    return _log_writer
+
+def flush_logs():
+    """Ship this invocation's buffered events to the daily stream"""
+    if LOG_GROUP_NAME:
+        get_log_writer().flush(f"deployment-orchestrator-{datetime.now().strftime('%Y-%m-%d')}")
+
+def log_deployment_status(active_deployment, health_status):
     """Log deployment status to CloudWatch"""
     
-    try:
-        log_stream_name = f"deployment-orchestrator-{datetime.now().strftime('%Y-%m-%d')}"
-        
-        log_event = {
-            'timestamp': int(datetime.now().timestamp() * 1000),
-            'message': json.dumps({
-                'active_deployment': active_deployment,
-                'health_status': health_status,
-                'timestamp': datetime.now().isoformat()
-            })
-        }
-        
-        cloudwatch.put_log_events(
-            logGroupName=log_group_name,
-            logStreamName=log_stream_name,
-            logEvents=[log_event]
-        )
-        
-    except Exception as e:
-        logger.error(f"Error logging deployment status: {str(e)}")
+    get_log_writer().log({
+        'event': 'health_check',
+        'active_deployment': active_deployment,
+        'health_status': health_status,
+        'timestamp': datetime.now().isoformat()
+    })
 
 def send_alert(sns_topic_arn, message):
     """Send alert notification"""
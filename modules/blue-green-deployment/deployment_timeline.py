@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+Deployment Timeline
+Span timings for blue/green switches, exported as EMF log events, and a
+report of phase durations across past switches
+"""
+
+import argparse
+import json
+import time
+from contextlib import contextmanager
+
+from health_prober import percentile
+
+TIMELINE_NAMESPACE = 'Jenkins/BlueGreen'
+SPAN_METRIC = 'PhaseSeconds'
+
+# Report order: instance phases (from user data) slot in while wait_healthy runs
+PHASE_ORDER = [
+    'switch', 'scale_up', 'wait_healthy', 'instance_boot', 'efs_mount', 'jenkins_start',
+    'user_data', 'validate', 'shift', 'drain', 'rollback'
+]
+
+class Timeline:
+    """Spans for one switch, all tagged with its correlation id
+
+    Spans within an invocation are timed on the monotonic clock. Phases that
+    run across invocations (a step waiting over several ticks) are recorded
+    from checkpointed wall-clock times, as monotonic clocks are per process.
+    """
+
+    def __init__(self, writer, correlation_id, **attributes):
+        self.writer = writer
+        self.correlation_id = correlation_id
+        self.attributes = attributes
+
+    @contextmanager
+    def span(self, phase, **attributes):
+        """Time the enclosed block; the yielded dict collects extra attributes"""
+        start = time.time()
+        started = time.monotonic()
+        fields = {'status': 'ok', **attributes}
+        try:
+            yield fields
+        except Exception as e:
+            fields.update(status='error', error=str(e))
+            raise
+        finally:
+            self.record(phase, time.monotonic() - started, start, **fields)
+
+    def record(self, phase, seconds, start=None, **attributes):
+        """Export one span as an EMF document: a PhaseSeconds metric and a searchable log event"""
+        seconds = round(seconds, 3)
+        properties = {
+            'event': 'span',
+            'source': 'orchestrator',
+            'correlation_id': self.correlation_id,
+            'phase': phase,
+            'seconds': seconds,
+            'start': start,
+            **self.attributes,
+            **attributes
+        }
+        self.writer.metric(
+            TIMELINE_NAMESPACE,
+            {SPAN_METRIC: (seconds, 'Seconds')},
+            {'Phase': phase},
+            {name: value for name, value in properties.items() if value is not None}
+        )
+
+def read_spans_from_file(path):
+    """Span events from a JSON-lines export (one event per line)"""
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if line.startswith('{'):
+                event = json.loads(line)
+                if event.get('event') == 'span':
+                    yield event
+
+def read_spans_from_logs(log_group_name, days):
+    """Span events from the deployment log group, orchestrator and instances alike"""
+    import boto3
+
+    logs = boto3.client('logs')
+    paginator = logs.get_paginator('filter_log_events')
+    pages = paginator.paginate(
+        logGroupName=log_group_name,
+        startTime=int((time.time() - days * 86400) * 1000),
+        filterPattern='{ $.event = "span" }'
+    )
+    for page in pages:
+        for log_event in page['events']:
+            event = json.loads(log_event['message'])
+            if event.get('source') == 'instance':
+                # Instance streams are named "<instance id>-<color>-deployment"
+                event.setdefault('instance_id', log_event['logStreamName'].rsplit('-', 2)[0])
+            yield event
+
+def build_report(spans):
+    """p50/p95/max duration per phase, in switch order
+
+    Instance phases count only for instances a switch waited on, so ad-hoc
+    launches do not skew the numbers.
+    """
+
+    spans = list(spans)
+    switch_instances = set()
+    for span in spans:
+        switch_instances.update(span.get('instance_ids') or [])
+
+    durations = {}
+    switches = set()
+    for span in spans:
+        if span.get('source') == 'instance':
+            if switch_instances and span.get('instance_id') not in switch_instances:
+                continue
+        else:
+            switches.add(span['correlation_id'])
+        durations.setdefault(span['phase'], []).append(span['seconds'])
+
+    def order(phase):
+        base = phase.split('.')[0]
+        return (PHASE_ORDER.index(base) if base in PHASE_ORDER else len(PHASE_ORDER), phase)
+
+    return {
+        'switches': len(switches),
+        'phases': [
+            {
+                'phase': phase,
+                'count': len(durations[phase]),
+                'p50': percentile(durations[phase], 50),
+                'p95': percentile(durations[phase], 95),
+                'max': max(durations[phase])
+            }
+            for phase in sorted(durations, key=order)
+        ]
+    }
+
+def main(argv=None):
+    """Report p50/p95 phase durations across past blue/green switches"""
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--log-group', help='deployment log group to query')
+    source.add_argument('--file', help='JSON-lines export of span events')
+    parser.add_argument('--days', type=int, default=30, help='history to include (log group only)')
+    parser.add_argument('--json', action='store_true', help='print the report as JSON')
+    args = parser.parse_args(argv)
+
+    spans = read_spans_from_file(args.file) if args.file else read_spans_from_logs(args.log_group, args.days)
+    report = build_report(spans)
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+
+    print(f"{report['switches']} switches")
+    print(f"{'phase':<24}{'count':>7}{'p50 (s)':>10}{'p95 (s)':>10}{'max (s)':>10}")
+    for row in report['phases']:
+        print(f"{row['phase']:<24}{row['count']:>7}{row['p50']:>10.1f}{row['p95']:>10.1f}{row['max']:>10.1f}")
+
+if __name__ == '__main__':
+    main()
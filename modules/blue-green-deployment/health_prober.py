@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+"""
+Application Health Prober for Blue/Green Validation
+Probes Jenkins endpoints on every candidate instance concurrently
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Endpoints that prove Jenkins is serving, not just that the instance is up
+PROBE_PATHS = ('/login', '/api/json', '/whoAmI')
+PROBE_PORT = 8080
+PROBE_SAMPLES = 5
+PROBE_TIMEOUT_SECONDS = 5
+MAX_CONNECTIONS_PER_HOST = 4
+
+# 403 means Jenkins answered but wants credentials, which is still healthy
+HEALTHY_STATUSES = {200, 403}
+PROBE_MAX_P95_SECONDS = 2.0
+PROBE_MAX_ERROR_RATE = 0.1
+
+class ConnectionPool:
+    """Keep-alive HTTP/1.1 connections, bounded per host"""
+
+    def __init__(self, max_per_host=MAX_CONNECTIONS_PER_HOST, timeout=PROBE_TIMEOUT_SECONDS):
+        self.max_per_host = max_per_host
+        self.timeout = timeout
+        self.idle = {}
+        self.limits = {}
+        self.opened = 0
+
+    async def request(self, host, port, path):
+        """GET path, returning the status code; reuses an idle connection when there is one"""
+        key = (host, port)
+        limit = self.limits.setdefault(key, asyncio.Semaphore(self.max_per_host))
+
+        async with limit:
+            idle = self.idle.setdefault(key, [])
+            while True:
+                reused = bool(idle)
+                reader, writer = idle.pop() if reused else await self._connect(host, port)
+                try:
+                    status, keep_alive = await asyncio.wait_for(
+                        self._exchange(reader, writer, host, path), self.timeout
+                    )
+                    break
+                except (ConnectionError, asyncio.IncompleteReadError):
+                    writer.close()
+                    # The server may have closed an idle connection; retry on another
+                    if not reused:
+                        raise
+                except BaseException:
+                    writer.close()
+                    raise
+
+            if keep_alive:
+                idle.append((reader, writer))
+            else:
+                writer.close()
+            return status
+
+    async def _connect(self, host, port):
+        self.opened += 1
+        return await asyncio.wait_for(asyncio.open_connection(host, port), self.timeout)
+
+    async def _exchange(self, reader, writer, host, path):
+        writer.write(
+            f"GET {path} HTTP/1.1\r\nHost: {host}\r\nUser-Agent: jenkins-health-prober\r\n"
+            f"Accept: */*\r\nConnection: keep-alive\r\n\r\n".encode()
+        )
+        await writer.drain()
+
+        status_line = await reader.readuntil(b'\r\n')
+        status = int(status_line.split()[1])
+        headers = {}
+        while True:
+            line = await reader.readuntil(b'\r\n')
+            if line == b'\r\n':
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+
+        # Drain the body so the connection can carry the next request
+        if headers.get('transfer-encoding', '').lower() == 'chunked':
+            while True:
+                size = int((await reader.readuntil(b'\r\n')).split(b';')[0], 16)
+                await reader.readexactly(size + 2)
+                if size == 0:
+                    break
+        elif 'content-length' in headers:
+            await reader.readexactly(int(headers['content-length']))
+        else:
+            await reader.read()
+            return status, False
+
+        return status, headers.get('connection', '').lower() != 'close'
+
+    def close(self):
+        for connections in self.idle.values():
+            for _, writer in connections:
+                writer.close()
+        self.idle = {}
+
+def percentile(values, p):
+    """Nearest-rank percentile, or None for no values"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, -(-len(ordered) * p // 100))
+    return ordered[int(rank) - 1]
+
+def summarize(latencies, errors, samples):
+    """Latency percentiles and error rate for one set of samples"""
+    return {
+        'samples': samples,
+        'errors': errors,
+        'error_rate': round(errors / samples, 3) if samples else 1.0,
+        'p50': round(percentile(latencies, 50), 4) if latencies else None,
+        'p95': round(percentile(latencies, 95), 4) if latencies else None,
+        'max': round(max(latencies), 4) if latencies else None
+    }
+
+async def probe_endpoint(pool, host, port, path, samples):
+    """Sample one endpoint; returns (latencies of good responses, error count)"""
+    latencies = []
+    errors = 0
+    for _ in range(samples):
+        started = time.perf_counter()
+        try:
+            status = await pool.request(host, port, path)
+        except Exception:
+            errors += 1
+            continue
+        if status in HEALTHY_STATUSES:
+            latencies.append(time.perf_counter() - started)
+        else:
+            errors += 1
+    return latencies, errors
+
+async def probe_instance(pool, host, port, paths, samples):
+    """Probe every endpoint on one instance concurrently"""
+    results = await asyncio.gather(*(probe_endpoint(pool, host, port, path, samples) for path in paths))
+
+    endpoints = {}
+    all_latencies = []
+    all_errors = 0
+    for path, (latencies, errors) in zip(paths, results):
+        endpoints[path] = summarize(latencies, errors, samples)
+        all_latencies.extend(latencies)
+        all_errors += errors
+
+    report = summarize(all_latencies, all_errors, samples * len(paths))
+    report['endpoints'] = endpoints
+    report['healthy'] = (
+        report['error_rate'] <= PROBE_MAX_ERROR_RATE
+        and report['p95'] is not None
+        and report['p95'] <= PROBE_MAX_P95_SECONDS
+    )
+    return report
+
+async def probe_hosts(hosts, port=PROBE_PORT, paths=PROBE_PATHS, samples=PROBE_SAMPLES, timeout=PROBE_TIMEOUT_SECONDS):
+    """Probe all hosts ('address' or 'address:port') concurrently over one connection pool"""
+    pool = ConnectionPool(timeout=timeout)
+    targets = [(host.partition(':')[0], int(host.partition(':')[2] or port)) for host in hosts]
+    try:
+        reports = await asyncio.gather(*(
+            probe_instance(pool, address, target_port, paths, samples) for address, target_port in targets
+        ))
+    finally:
+        pool.close()
+    return dict(zip(hosts, reports)), pool.opened
+
+def probe_instances(hosts, port=PROBE_PORT, paths=PROBE_PATHS, samples=PROBE_SAMPLES, timeout=PROBE_TIMEOUT_SECONDS):
+    """Probe Jenkins on each host and report per-instance latency and errors
+
+    Returns {'healthy': bool, 'instances': {host: report}}, where each report
+    has p50/p95/max latency (seconds) and error rate overall and per endpoint.
+    """
+
+    if not hosts:
+        return {'healthy': False, 'instances': {}, 'connections': 0}
+
+    reports, opened = asyncio.run(probe_hosts(list(hosts), port, paths, samples, timeout))
+    return {
+        'healthy': all(report['healthy'] for report in reports.values()),
+        'instances': reports,
+        'connections': opened
+    }
+
+class StandInHandler(BaseHTTPRequestHandler):
+    """Local Jenkins stand-in: serves the probe paths with configurable latency and errors"""
+
+    protocol_version = 'HTTP/1.1'
+    latency = 0.01
+    error_rate = 0.0
+
+    def do_GET(self):
+        time.sleep(random.uniform(0, 2 * self.latency))
+        if self.path.split('?')[0] not in PROBE_PATHS:
+            status = 404
+        elif random.random() < self.error_rate:
+            status = 503
+        else:
+            status = 403 if self.path.startswith('/api/json') else 200
+
+        body = json.dumps({'path': self.path}).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+def start_stand_in(latency=0.01, error_rate=0.0):
+    """Run a stand-in on a free local port; returns the server"""
+    handler = type('Handler', (StandInHandler,), {'latency': latency, 'error_rate': error_rate})
+    server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def main(argv=None):
+    """Probe local stand-ins (one slow or failing) and print the report"""
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument('--instances', type=int, default=3)
+    parser.add_argument('--samples', type=int, default=PROBE_SAMPLES)
+    parser.add_argument('--latency', type=float, default=0.01, help='mean stand-in latency (s)')
+    parser.add_argument('--error-rate', type=float, default=0.3, help='error rate of the last stand-in')
+    args = parser.parse_args(argv)
+
+    servers = [start_stand_in(args.latency) for _ in range(args.instances - 1)]
+    servers.append(start_stand_in(args.latency, args.error_rate))
+
+    hosts = [f"127.0.0.1:{server.server_address[1]}" for server in servers]
+    started = time.perf_counter()
+    result = probe_instances(hosts, samples=args.samples)
+    elapsed = time.perf_counter() - started
+
+    for host, report in result['instances'].items():
+        print(f"{host}: healthy={report['healthy']} p50={report['p50']}s p95={report['p95']}s "
+              f"errors={report['error_rate']:.0%}")
+    print(f"Probed {len(hosts)} instances x {len(PROBE_PATHS)} endpoints x {args.samples} samples "
+          f"in {elapsed:.2f}s over {result['connections']} connections; healthy={result['healthy']}")
+
+    for server in servers:
+        server.shutdown()
+
+if __name__ == '__main__':
+    main()
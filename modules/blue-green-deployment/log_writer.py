@@ -0,0 +1,200 @@
+"""
+Buffered CloudWatch Logs Writer
+Collects structured events during an invocation and ships them in batches
+"""
+
+import json
+import logging
+import random
+import time
+
+from metrics import emf_document
+
+logger = logging.getLogger()
+
+# PutLogEvents limits
+MAX_BATCH_EVENTS = 10000
+MAX_BATCH_BYTES = 1048576
+MAX_EVENT_BYTES = 256 * 1024 - 26
+EVENT_OVERHEAD_BYTES = 26
+MAX_BATCH_SPAN_MS = 24 * 3600 * 1000
+
+RETRYABLE_ERRORS = {'ThrottlingException', 'ServiceUnavailableException', 'InternalFailure'}
+MAX_RETRIES = 5
+RETRY_BASE_SECONDS = 0.2
+
+def get_error_code(error):
+    """AWS error code of a client exception, or None"""
+    return getattr(error, 'response', {}).get('Error', {}).get('Code')
+
+class BufferedLogWriter:
+    """Structured log events for one log group, flushed in PutLogEvents-sized batches
+
+    Events may be plain records or Embedded Metric Format documents, which
+    CloudWatch turns into metrics without any PutMetricData calls.
+    """
+
+    def __init__(self, logs, log_group_name):
+        self.logs = logs
+        self.log_group_name = log_group_name
+        self.events = []
+        self.known_streams = set()
+
+        # Ask CloudWatch to extract metrics from EMF documents in our batches
+        logs.meta.events.register('before-call.logs.PutLogEvents', self._add_emf_header)
+
+    @staticmethod
+    def _add_emf_header(params, **kwargs):
+        params['headers']['x-amzn-logs-format'] = 'json/emf'
+
+    def log(self, record, timestamp=None):
+        """Buffer a record (dict or string)
+
+        Oversized strings are truncated. Oversized dicts are never cut
+        mid-JSON: an EMF document sheds its properties into a separate
+        record (or is dropped if its metrics alone are too big), and any
+        other dict is replaced by a truncated preview.
+        """
+        if isinstance(record, str):
+            message = record
+            if len(message.encode()) > MAX_EVENT_BYTES:
+                message = message.encode()[:MAX_EVENT_BYTES].decode(errors='ignore')
+        else:
+            message = json.dumps(record, default=str)
+            if len(message.encode()) > MAX_EVENT_BYTES:
+                if '_aws' in record:
+                    self._log_oversized_emf(record, timestamp)
+                    return
+                message = self._preview(record, message)
+        self.events.append({
+            'timestamp': int(timestamp * 1000) if timestamp else int(time.time() * 1000),
+            'message': message
+        })
+
+    def _log_oversized_emf(self, document, timestamp):
+        """Split an EMF document into its metrics and, separately, its properties"""
+        directives = document['_aws']['CloudWatchMetrics']
+        names = {metric['Name'] for directive in directives for metric in directive['Metrics']}
+        dimensions = {name for directive in directives for dimension_set in directive['Dimensions'] for name in dimension_set}
+
+        core = {key: value for key, value in document.items() if key == '_aws' or key in names | dimensions}
+        if len(json.dumps(core, default=str).encode()) > MAX_EVENT_BYTES:
+            logger.warning(f"Dropping EMF document over {MAX_EVENT_BYTES} bytes: {sorted(names)}")
+            return
+        self.log(core, timestamp)
+
+        # Properties go out as a plain record, keyed by the same dimensions
+        properties = {key: value for key, value in document.items() if key not in core}
+        self.log({**{name: document[name] for name in dimensions if name in document}, **properties}, timestamp)
+
+    @staticmethod
+    def _preview(record, message):
+        """Valid JSON standing in for a record over the event size limit
+
+        Short top-level fields (event, ids, dimensions) are kept so the
+        stub can still be found; the rest survives as a truncated preview.
+        """
+        fields = {
+            key: value for key, value in record.items()
+            if isinstance(value, (str, int, float, bool, type(None))) and len(str(value)) <= 256
+        }
+        size = len(message.encode())
+        preview = message
+        while preview:
+            preview = preview.encode()[:len(preview.encode()) // 2].decode(errors='ignore')
+            stub = json.dumps({**fields, 'truncated': True, 'original_bytes': size, 'preview': preview}, default=str)
+            if len(stub.encode()) <= MAX_EVENT_BYTES:
+                return stub
+
+        # The short fields alone are too big: keep as many as fit
+        stub = {'truncated': True, 'original_bytes': size}
+        stub_bytes = len(json.dumps(stub).encode())
+        for key, value in fields.items():
+            # Each field adds ', "key": value' to the object
+            field_bytes = len(json.dumps({key: value}, default=str).encode())
+            if stub_bytes + field_bytes > MAX_EVENT_BYTES:
+                break
+            stub[key] = value
+            stub_bytes += field_bytes
+        return json.dumps(stub, default=str)
+
+    def metric(self, namespace, metrics, dimensions=None, properties=None, timestamp=None):
+        """Buffer an EMF document; arguments as for metrics.emf_document"""
+        timestamp = timestamp or time.time()
+        self.log(emf_document(namespace, metrics, dimensions, properties, timestamp), timestamp)
+
+    def batches(self):
+        """Split buffered events into time-ordered batches within PutLogEvents limits"""
+        batch = []
+        size = 0
+        for event in sorted(self.events, key=lambda e: e['timestamp']):
+            event_size = len(event['message'].encode()) + EVENT_OVERHEAD_BYTES
+            if batch and (
+                len(batch) >= MAX_BATCH_EVENTS
+                or size + event_size > MAX_BATCH_BYTES
+                or event['timestamp'] - batch[0]['timestamp'] > MAX_BATCH_SPAN_MS
+            ):
+                yield batch
+                batch = []
+                size = 0
+            batch.append(event)
+            size += event_size
+        if batch:
+            yield batch
+
+    def flush(self, log_stream_name):
+        """Send every buffered event to the stream, creating it if needed
+
+        Returns the number of events delivered. Failures are logged, not
+        raised, so a logging outage never fails the invocation.
+        """
+
+        if not self.events:
+            return 0
+
+        sent = 0
+        try:
+            self._ensure_stream(log_stream_name)
+            for batch in self.batches():
+                self._put(log_stream_name, batch)
+                sent += len(batch)
+        except Exception as e:
+            logger.error(f"Error writing to log group {self.log_group_name}: {str(e)}")
+        finally:
+            self.events = []
+
+        return sent
+
+    def _ensure_stream(self, log_stream_name):
+        if log_stream_name in self.known_streams:
+            return
+        try:
+            self.logs.create_log_stream(logGroupName=self.log_group_name, logStreamName=log_stream_name)
+        except Exception as e:
+            if get_error_code(e) != 'ResourceAlreadyExistsException':
+                raise
+        self.known_streams.add(log_stream_name)
+
+    def _put(self, log_stream_name, batch):
+        for attempt in range(MAX_RETRIES + 1):
+            try:
+                response = self.logs.put_log_events(
+                    logGroupName=self.log_group_name,
+                    logStreamName=log_stream_name,
+                    logEvents=batch
+                )
+                rejected = response.get('rejectedLogEventsInfo')
+                if rejected:
+                    logger.warning(f"Log events rejected: {rejected}")
+                return
+            except Exception as e:
+                code = get_error_code(e)
+                if code == 'ResourceNotFoundException' and attempt == 0:
+                    # Stream deleted since we created it
+                    self.known_streams.discard(log_stream_name)
+                    self._ensure_stream(log_stream_name)
+                    continue
+                if code not in RETRYABLE_ERRORS or attempt == MAX_RETRIES:
+                    raise
+                delay = RETRY_BASE_SECONDS * 2 ** attempt
+                time.sleep(delay / 2 + random.uniform(0, delay / 2))
@@ -55,6 +55,25 @@ resource "aws_cloudwatch_log_group" "deployment_logs" {
   tags = local.common_tags
 }
 
+# Instance boot, EFS mount and Jenkins start spans written by user data;
+# orchestrator spans reach the same metric through EMF
+resource "aws_cloudwatch_log_metric_filter" "instance_phase_seconds" {
+  name           = "${var.project_name}-${var.environment}-instance-phase-seconds"
+  log_group_name = aws_cloudwatch_log_group.deployment_logs.name
+  pattern        = "{ $.event = \"span\" && $.source = \"instance\" }"
+
+  metric_transformation {
+    name      = "PhaseSeconds"
+    namespace = "Jenkins/BlueGreen"
+    value     = "$.seconds"
+    unit      = "Seconds"
+
+    dimensions = {
+      Phase = "$.phase"
+    }
+  }
+}
+
 # Blue Environment Launch Template
 resource "aws_launch_template" "blue" {
   name_prefix   = "${local.blue_name_prefix}-lt-"
@@ -175,7 +194,7 @@ resource "aws_launch_template" "green" {
 resource "aws_autoscaling_group" "blue" {
   name                      = "${local.blue_name_prefix}-asg"
   vpc_zone_identifier       = var.private_subnet_ids
-  target_group_arns         = var.active_deployment == "blue" ? [var.target_group_arn] : []
+  target_group_arns         = var.green_target_group_arn != "" || var.active_deployment == "blue" ? [var.target_group_arn] : []
   health_check_type         = "ELB"
   health_check_grace_period = var.health_check_grace_period
 
@@ -241,7 +260,7 @@ resource "aws_autoscaling_group" "blue" {
 resource "aws_autoscaling_group" "green" {
   name                      = "${local.green_name_prefix}-asg"
   vpc_zone_identifier       = var.private_subnet_ids
-  target_group_arns         = var.active_deployment == "green" ? [var.target_group_arn] : []
+  target_group_arns         = var.green_target_group_arn != "" ? [var.green_target_group_arn] : var.active_deployment == "green" ? [var.target_group_arn] : []
   health_check_type         = "ELB"
   health_check_grace_period = var.health_check_grace_period
 
@@ -450,26 +469,100 @@ resource "aws_cloudwatch_metric_alarm" "green_high_cpu" {
 
 # Lambda function for automated deployment orchestration
 resource "aws_lambda_function" "deployment_orchestrator" {
-  filename      = "${path.module}/deployment_orchestrator.zip"
-  function_name = "${var.project_name}-${var.environment}-deployment-orchestrator"
-  role          = aws_iam_role.lambda_role.arn
-  handler       = "index.handler"
-  runtime       = "python3.9"
-  timeout       = 300
+  filename         = data.archive_file.deployment_orchestrator.output_path
+  source_code_hash = data.archive_file.deployment_orchestrator.output_base64sha256
+  function_name    = "${var.project_name}-${var.environment}-deployment-orchestrator"
+  role             = aws_iam_role.lambda_role.arn
+  handler          = "deployment_orchestrator.handler"
+  runtime          = "python3.9"
+  timeout          = 300
+
+  # Probing Jenkins directly needs the function inside the VPC
+  dynamic "vpc_config" {
+    for_each = var.health_probes_enabled ? [1] : []
+    content {
+      subnet_ids         = var.private_subnet_ids
+      security_group_ids = [var.probe_security_group_id]
+    }
+  }
 
   environment {
     variables = {
-      BLUE_ASG_NAME    = aws_autoscaling_group.blue.name
-      GREEN_ASG_NAME   = aws_autoscaling_group.green.name
-      TARGET_GROUP_ARN = var.target_group_arn
-      SNS_TOPIC_ARN    = aws_sns_topic.deployment_notifications.arn
-      LOG_GROUP_NAME   = aws_cloudwatch_log_group.deployment_logs.name
+      BLUE_ASG_NAME          = aws_autoscaling_group.blue.name
+      GREEN_ASG_NAME         = aws_autoscaling_group.green.name
+      TARGET_GROUP_ARN       = var.target_group_arn
+      SNS_TOPIC_ARN          = aws_sns_topic.deployment_notifications.arn
+      LOG_GROUP_NAME         = aws_cloudwatch_log_group.deployment_logs.name
+      DEPLOYMENT_STATE_TABLE = aws_dynamodb_table.deployment_state.name
+      STEP_TIMEOUT_SECONDS   = var.switch_step_timeout_seconds
+
+      GREEN_TARGET_GROUP_ARN = var.green_target_group_arn
+      LISTENER_ARN           = var.listener_arn
+      CANARY_STEPS           = jsonencode(var.canary_steps)
+      CANARY_BAKE_SECONDS    = var.canary_bake_seconds
+      CANARY_MAX_P95_SECONDS = var.canary_max_p95_seconds
+      CANARY_MAX_5XX_PERCENT = var.canary_max_5xx_percent
+
+      HEALTH_PROBES_ENABLED = tostring(var.health_probes_enabled)
+
+      STANDBY_WINDOW_SECONDS = var.standby_window_seconds
+      STANDBY_MODE           = var.standby_mode
     }
   }
 
   tags = local.common_tags
 }
 
+# Package the orchestrator from source so code changes are deployed
+data "archive_file" "deployment_orchestrator" {
+  type        = "zip"
+  output_path = "${path.module}/deployment_orchestrator.zip"
+
+  source {
+    content  = file("${path.module}/deployment_orchestrator.py")
+    filename = "deployment_orchestrator.py"
+  }
+
+  source {
+    content  = file("${path.module}/deployment_timeline.py")
+    filename = "deployment_timeline.py"
+  }
+
+  source {
+    content  = file("${path.module}/health_prober.py")
+    filename = "health_prober.py"
+  }
+
+  source {
+    content  = file("${path.module}/log_writer.py")
+    filename = "log_writer.py"
+  }
+
+  source {
+    content  = file("${path.module}/../lambda-common/aws_snapshot.py")
+    filename = "aws_snapshot.py"
+  }
+
+  source {
+    content  = file("${path.module}/../lambda-common/metrics.py")
+    filename = "metrics.py"
+  }
+}
+
+# Checkpoint of the in-flight blue/green switch
+resource "aws_dynamodb_table" "deployment_state" {
+  name         = "${var.project_name}-${var.environment}-deployment-state"
+  billing_mode = "PAY_PER_REQUEST"
+  hash_key     = "pk"
+
+  attribute {
+    name = "pk"
+    type = "S"
+  }
+
+  tags = local.common_tags
+}
+
 # IAM Role for Lambda deployment orchestrator
 resource "aws_iam_role" "lambda_role" {
   name = "${var.project_name}-${var.environment}-deployment-lambda-role"
@@ -512,18 +605,42 @@ resource "aws_iam_role_policy" "lambda_policy" {
         Action = [
           "autoscaling:UpdateAutoScalingGroup",
           "autoscaling:DescribeAutoScalingGroups",
+          "autoscaling:EnterStandby",
+          "autoscaling:ExitStandby",
+          "autoscaling:TerminateInstanceInAutoScalingGroup",
+          "autoscaling:PutWarmPool",
+          "autoscaling:DeleteWarmPool",
           "ec2:DescribeInstances",
           "elasticloadbalancing:RegisterTargets",
           "elasticloadbalancing:DeregisterTargets",
           "elasticloadbalancing:DescribeTargetHealth",
+          "elasticloadbalancing:DescribeListeners",
+          "elasticloadbalancing:ModifyListener",
+          "cloudwatch:GetMetricData",
+          "ssm:SendCommand",
           "sns:Publish"
         ]
         Resource = "*"
+      },
+      {
+        Effect = "Allow"
+        Action = [
+          "dynamodb:GetItem",
+          "dynamodb:PutItem"
+        ]
+        Resource = aws_dynamodb_table.deployment_state.arn
       }
     ]
   })
 }
 
+# ENI management for the orchestrator when it runs inside the VPC
+resource "aws_iam_role_policy_attachment" "lambda_vpc_access" {
+  count      = var.health_probes_enabled ? 1 : 0
+  role       = aws_iam_role.lambda_role.name
+  policy_arn = "arn:aws:iam::aws:policy/service-role/AWSLambdaVPCAccessExecutionRole"
+}
+
 # EventBridge rule for scheduled health checks
 resource "aws_cloudwatch_event_rule" "health_check" {
   name                = "${var.project_name}-${var.environment}-health-check"
@@ -548,3 +665,57 @@ resource "aws_lambda_permission" "allow_eventbridge" {
   principal     = "events.amazonaws.com"
   source_arn    = aws_cloudwatch_event_rule.health_check.arn
 }
+
+# Tick that resumes an in-flight switch from its checkpoint
+resource "aws_cloudwatch_event_rule" "deployment_switch_tick" {
+  name                = "${var.project_name}-${var.environment}-deployment-switch-tick"
+  description         = "Resume in-flight blue/green switches"
+  schedule_expression = "rate(1 minute)"
+
+  tags = local.common_tags
+}
+
+resource "aws_cloudwatch_event_target" "deployment_switch_tick_target" {
+  rule      = aws_cloudwatch_event_rule.deployment_switch_tick.name
+  target_id = "DeploymentSwitchTickTarget"
+  arn       = aws_lambda_function.deployment_orchestrator.arn
+  input     = jsonencode({ action = "resume" })
+}
+
+resource "aws_lambda_permission" "allow_eventbridge_switch_tick" {
+  statement_id  = "AllowExecutionFromEventBridgeSwitchTick"
+  action        = "lambda:InvokeFunction"
+  function_name = aws_lambda_function.deployment_orchestrator.function_name
+  principal     = "events.amazonaws.com"
+  source_arn    = aws_cloudwatch_event_rule.deployment_switch_tick.arn
+}
+
+# Instance launches in either ASG resume a waiting switch without backoff
+resource "aws_cloudwatch_event_rule" "deployment_switch_asg_events" {
+  name        = "${var.project_name}-${var.environment}-deployment-switch-asg-events"
+  description = "Resume blue/green switches when instances launch"
+
+  event_pattern = jsonencode({
+    source      = ["aws.autoscaling"]
+    detail-type = ["EC2 Instance Launch Successful", "EC2 Instance Launch Unsuccessful"]
+    detail = {
+      AutoScalingGroupName = [aws_autoscaling_group.blue.name, aws_autoscaling_group.green.name]
+    }
+  })
+
+  tags = local.common_tags
+}
+
+resource "aws_cloudwatch_event_target" "deployment_switch_asg_events_target" {
+  rule      = aws_cloudwatch_event_rule.deployment_switch_asg_events.name
+  target_id = "DeploymentSwitchAsgEventsTarget"
+  arn       = aws_lambda_function.deployment_orchestrator.arn
+}
+
+resource "aws_lambda_permission" "allow_eventbridge_switch_asg_events" {
+  statement_id  = "AllowExecutionFromEventBridgeSwitchAsgEvents"
+  action        = "lambda:InvokeFunction"
+  function_name = aws_lambda_function.deployment_orchestrator.function_name
+  principal     = "events.amazonaws.com"
+  source_arn    = aws_cloudwatch_event_rule.deployment_switch_asg_events.arn
+}
@@ -0,0 +1,308 @@
+#!/usr/bin/env python3
+"""
+Offline Vertical Scaling Policy Simulator
+Replays recorded CPU/Memory traces through vertical_scaler's decision logic
+and reports refreshes, time over threshold and instance-hours cost per policy
+
+Usage:
+    python scaling_simulator.py trace.csv --trace-type t3.medium \\
+        --policy baseline --policy gated \\
+        --policy "gated:CPU_SCALE_UP_THRESHOLD=70,SCALE_UP_SUSTAIN_MINUTES=30"
+    python scaling_simulator.py --synthetic-days 365
+
+Traces are CSV (or Parquet, if pandas is installed) with timestamp, cpu and
+memory columns. Timestamps may be epoch seconds or ISO 8601. Not packaged
+into the Lambda.
+"""
+
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+# vertical_scaler reads its configuration from the environment at import
+os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+os.environ.setdefault('BLUE_ASG_NAME', 'simulator-blue')
+os.environ.setdefault('GREEN_ASG_NAME', 'simulator-green')
+os.environ.setdefault('INSTANCE_TYPES', json.dumps(['t3.small', 't3.medium', 't3.large']))
+os.environ.setdefault('SNS_TOPIC_ARN', 'arn:aws:sns:us-east-1:000000000000:simulator')
+
+# Lambda packages ship lambda-common modules alongside the handler
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'lambda-common'))
+
+import vertical_scaler  # noqa: E402
+
+# Time over threshold is always measured against the shipped thresholds, so
+# policies that override them stay comparable
+REPORT_CPU_THRESHOLD = vertical_scaler.CPU_SCALE_UP_THRESHOLD
+REPORT_MEMORY_THRESHOLD = vertical_scaler.MEMORY_SCALE_UP_THRESHOLD
+
+# Capabilities used when a trace moves between types: vCPUs, memory, $/hour
+DEFAULT_CAPABILITIES = {
+    't3.small': {'vcpus': 2, 'memory_mib': 2048, 'price': 0.0208},
+    't3.medium': {'vcpus': 2, 'memory_mib': 4096, 'price': 0.0416},
+    't3.large': {'vcpus': 2, 'memory_mib': 8192, 'price': 0.0832},
+    't3.xlarge': {'vcpus': 4, 'memory_mib': 16384, 'price': 0.1664},
+    't3.2xlarge': {'vcpus': 8, 'memory_mib': 32768, 'price': 0.3328}
+}
+
+DECISION_INTERVAL_MINUTES = 10
+REFRESH_MINUTES = 10
+
+class TraceHistory:
+    """MetricHistory stand-in over simulated arrays, bounded at the current tick"""
+
+    def __init__(self, timestamps, observed):
+        self.timestamps = timestamps
+        self.observed = observed
+        self.scaling_events = []
+        self.refresh = None
+
+    def series(self, name, minutes, now=None):
+        # Traces carry host metrics only; Jenkins signals read as empty
+        if name not in self.observed:
+            return vertical_scaler.MetricSeries(name, [], [])
+        end = np.searchsorted(self.timestamps, now, side='right')
+        start = np.searchsorted(self.timestamps, now - minutes * 60, side='left')
+        return vertical_scaler.MetricSeries(
+            name,
+            self.timestamps[start:end].tolist(),
+            self.observed[name][start:end].tolist()
+        )
+
+    def record_scaling(self, old_type, new_type, direction, now=None):
+        vertical_scaler.MetricHistory.record_scaling(self, old_type, new_type, direction, now)
+
+def load_trace(path):
+    """Load (timestamps, cpu, memory) arrays from a CSV or Parquet trace"""
+
+    if path.endswith('.parquet'):
+        try:
+            import pandas as pd
+        except ImportError:
+            sys.exit("Reading Parquet traces requires pandas and pyarrow")
+        frame = pd.read_parquet(path, columns=['timestamp', 'cpu', 'memory'])
+        raw_timestamps = frame['timestamp'].to_numpy()
+        cpu = frame['cpu'].to_numpy(dtype=float)
+        memory = frame['memory'].to_numpy(dtype=float)
+    else:
+        with open(path, newline='') as f:
+            rows = list(csv.DictReader(f))
+        raw_timestamps = np.array([row['timestamp'] for row in rows])
+        cpu = np.array([float(row['cpu'] or 'nan') for row in rows])
+        memory = np.array([float(row['memory'] or 'nan') for row in rows])
+
+    try:
+        timestamps = raw_timestamps.astype(float).astype(np.int64)
+    except (TypeError, ValueError):
+        timestamps = raw_timestamps.astype('datetime64[s]').astype(np.int64)
+
+    order = np.argsort(timestamps, kind='stable')
+    timestamps, cpu, memory = timestamps[order], cpu[order], memory[order]
+
+    # Carry the last value across gaps in the recording
+    for values in (cpu, memory):
+        missing = np.isnan(values)
+        if missing.any():
+            index = np.where(~missing, np.arange(len(values)), 0)
+            np.maximum.accumulate(index, out=index)
+            values[:] = values[index]
+
+    return timestamps, cpu, memory
+
+def generate_synthetic_trace(days, seed=7, period_seconds=60):
+    """Weekday build-storm curve with noise, for benchmarking the simulator"""
+
+    rng = np.random.default_rng(seed)
+    timestamps = np.arange(0, days * 86400, period_seconds, dtype=np.int64) + 1704067200
+    hours = (timestamps % 86400) / 3600
+    weekday = ((timestamps // 86400) + 3) % 7 < 5
+
+    daily = np.clip(np.sin((hours - 7) / 12 * np.pi), 0, None)
+    cpu = 15 + 70 * daily * weekday + rng.normal(0, 8, len(timestamps))
+    memory = 35 + 45 * daily * weekday + rng.normal(0, 4, len(timestamps))
+
+    return timestamps, np.clip(cpu, 0, 100), np.clip(memory, 0, 100)
+
+def parse_policy(spec):
+    """Parse 'name' or 'name:CONST=value,...' into (label, kind, overrides)"""
+
+    kind, _, params = spec.partition(':')
+    if kind not in ('baseline', 'gated'):
+        raise argparse.ArgumentTypeError(f"unknown policy kind '{kind}' (use baseline or gated)")
+
+    overrides = {}
+    for assignment in filter(None, params.split(',')):
+        name, _, value = assignment.partition('=')
+        if not hasattr(vertical_scaler, name):
+            raise argparse.ArgumentTypeError(f"vertical_scaler has no constant '{name}'")
+        overrides[name] = json.loads(value)
+
+    return spec, kind, overrides
+
+def simulate(timestamps, cpu, memory, trace_type, kind, capabilities, catalog):
+    """Replay one trace through one policy and return its report"""
+
+    types = vertical_scaler.INSTANCE_TYPES
+    type_index = {t: i for i, t in enumerate(types)}
+    n = len(timestamps)
+    period = int(np.median(np.diff(timestamps))) if n > 1 else 60
+    tick = max(1, DECISION_INTERVAL_MINUTES * 60 // period)
+    refresh_samples = max(1, REFRESH_MINUTES * 60 // period)
+
+    # Utilization the trace would show on every candidate type, scaled by capacity
+    base = capabilities[trace_type]
+    scaled_cpu = np.stack([
+        np.clip(cpu * base['vcpus'] / capabilities[t]['vcpus'], 0, 100) for t in types
+    ])
+    scaled_memory = np.stack([
+        np.clip(memory * base['memory_mib'] / capabilities[t]['memory_mib'], 0, 100) for t in types
+    ])
+
+    observed = {'cpu': np.empty(n), 'memory': np.empty(n)}
+    history = TraceHistory(timestamps, observed)
+    lookback = max(1, vertical_scaler.METRIC_LOOKBACK_MINUTES * 60 // period)
+
+    current = type_index[trace_type]
+    segments = [(0, current)]
+    pending = None
+    filled = 0
+    refreshes = 0
+
+    for end in range(tick, n + tick, tick):
+        end = min(end, n)
+
+        # Apply a finished refresh at the sample where it completes
+        if pending and pending[0] <= end:
+            switch_at, target = pending
+            observed['cpu'][filled:switch_at] = scaled_cpu[current, filled:switch_at]
+            observed['memory'][filled:switch_at] = scaled_memory[current, filled:switch_at]
+            filled = switch_at
+            current = target
+            segments.append((switch_at, current))
+            pending = None
+
+        observed['cpu'][filled:end] = scaled_cpu[current, filled:end]
+        observed['memory'][filled:end] = scaled_memory[current, filled:end]
+        filled = end
+
+        # Mirror the refresh tracker: no decisions while a refresh is in flight
+        if pending:
+            continue
+
+        now = int(timestamps[end - 1])
+        current_type = types[current]
+        cpu_avg = round(float(observed['cpu'][max(0, end - lookback):end].mean()), 2)
+        memory_avg = round(float(observed['memory'][max(0, end - lookback):end].mean()), 2)
+
+        new_type = vertical_scaler.determine_scaling_action(current_type, cpu_avg, memory_avg)
+        if new_type != current_type and kind == 'gated':
+            new_type, _ = vertical_scaler.apply_scaling_policy(current_type, new_type, history, now)
+            if new_type != current_type:
+                new_type = vertical_scaler.apply_right_size(current_type, new_type, history, catalog, now)
+
+        if new_type != current_type:
+            refreshes += 1
+            history.record_scaling(
+                current_type, new_type,
+                vertical_scaler.get_scaling_direction(current_type, new_type), now
+            )
+            pending = (min(end + refresh_samples, n), type_index[new_type])
+
+    # Per-sample type, then everything else is vectorized
+    starts = np.array([s for s, _ in segments] + [n])
+    sample_types = np.repeat([t for _, t in segments], np.diff(starts))
+    samples = np.arange(n)
+
+    effective_cpu = scaled_cpu[sample_types, samples]
+    effective_memory = scaled_memory[sample_types, samples]
+    over = (
+        (effective_cpu > REPORT_CPU_THRESHOLD)
+        | (effective_memory > REPORT_MEMORY_THRESHOLD)
+    )
+    prices = np.array([capabilities[t]['price'] for t in types])
+    hours_per_sample = period / 3600
+
+    return {
+        'refreshes': refreshes,
+        'hours_over_threshold': round(float(over.sum() * hours_per_sample), 1),
+        'percent_over_threshold': round(float(over.mean() * 100), 2),
+        'instance_hours_cost': round(float(prices[sample_types].sum() * hours_per_sample), 2),
+        'hours_by_type': {
+            types[i]: round(float((sample_types == i).sum() * hours_per_sample), 1)
+            for i in np.unique(sample_types)
+        }
+    }
+
+def run_policy(label, kind, overrides, trace, trace_type, capabilities):
+    """Run one policy with its constant overrides applied, then restore them"""
+
+    saved = {name: getattr(vertical_scaler, name) for name in overrides}
+    try:
+        for name, value in overrides.items():
+            setattr(vertical_scaler, name, value)
+
+        catalog = vertical_scaler.InstanceTypeCatalog([
+            {'instance_type': t, 'network': None, **capabilities[t]}
+            for t in vertical_scaler.INSTANCE_TYPES
+        ])
+
+        start = time.perf_counter()
+        report = simulate(*trace, trace_type, kind, capabilities, catalog)
+        report['replay_seconds'] = round(time.perf_counter() - start, 2)
+        report['policy'] = label
+        return report
+    finally:
+        for name, value in saved.items():
+            setattr(vertical_scaler, name, value)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('trace', nargs='?', help='CSV or Parquet trace with timestamp, cpu, memory columns')
+    parser.add_argument('--synthetic-days', type=int, help='replay a generated trace of this many days instead')
+    parser.add_argument('--trace-type', default='t3.medium', help='instance type the trace was recorded on')
+    parser.add_argument('--policy', action='append', type=parse_policy, dest='policies',
+                        help="'baseline' or 'gated', optionally ':CONST=value,...' (repeatable)")
+    parser.add_argument('--capabilities', help='JSON file overriding DEFAULT_CAPABILITIES')
+    parser.add_argument('--json', action='store_true', help='print reports as JSON')
+    args = parser.parse_args(argv)
+
+    if not args.trace and not args.synthetic_days:
+        parser.error('give a trace file or --synthetic-days')
+
+    capabilities = dict(DEFAULT_CAPABILITIES)
+    if args.capabilities:
+        with open(args.capabilities) as f:
+            capabilities.update(json.load(f))
+
+    if args.trace_type not in vertical_scaler.INSTANCE_TYPES:
+        parser.error(f"--trace-type must be one of {', '.join(vertical_scaler.INSTANCE_TYPES)}")
+
+    missing = [t for t in vertical_scaler.INSTANCE_TYPES if t not in capabilities]
+    if missing:
+        parser.error(f"no capabilities for {', '.join(missing)}")
+
+    trace = generate_synthetic_trace(args.synthetic_days) if args.synthetic_days else load_trace(args.trace)
+    policies = args.policies or [parse_policy('baseline'), parse_policy('gated')]
+
+    reports = [run_policy(label, kind, overrides, trace, args.trace_type, capabilities)
+               for label, kind, overrides in policies]
+
+    if args.json:
+        print(json.dumps(reports, indent=2))
+        return reports
+
+    print(f"Replayed {len(trace[0])} samples recorded on {args.trace_type}\n")
+    print(f"{'policy':<50} {'refreshes':>9} {'hrs over':>9} {'% over':>7} {'cost $':>9} {'replay s':>9}")
+    for r in reports:
+        print(f"{r['policy']:<50} {r['refreshes']:>9} {r['hours_over_threshold']:>9} "
+              f"{r['percent_over_threshold']:>7} {r['instance_hours_cost']:>9} {r['replay_seconds']:>9}")
+
+    return reports
+
+if __name__ == '__main__':
+    main()
@@ -18,18 +18,46 @@ log() {
     echo "[$(date '+%Y-%m-%d %H:%M:%S')] [$DEPLOYMENT_COLOR] $1" | tee -a /var/log/deployment.log
 }
 
+# Phase spans, timed on the monotonic boot clock and shipped with the
+# deployment log for the orchestrator's deployment timeline report
+uptime_seconds() {
+    cut -d' ' -f1 /proc/uptime
+}
+
+span() {
+    local seconds=$(awk -v start="$2" -v end="$(uptime_seconds)" 'BEGIN { printf "%.3f", end - start }')
+    echo "{\"event\": \"span\", \"source\": \"instance\", \"phase\": \"$1\", \"color\": \"$DEPLOYMENT_COLOR\", \"seconds\": $seconds}" >> /var/log/deployment.log
+}
+
+# Warm pool instances are launched and prepared while the other color owns
+# the shared EFS; Auto Scaling reports where the instance is headed
+target_lifecycle_state() {
+    local token=$(curl -s -X PUT http://169.254.169.254/latest/api/token -H "X-aws-ec2-metadata-token-ttl-seconds: 60")
+    curl -s -H "X-aws-ec2-metadata-token: $token" http://169.254.169.254/latest/meta-data/autoscaling/target-lifecycle-state
+}
+
+USER_DATA_STARTED=$(uptime_seconds)
+# Kernel start to user data is the instance boot phase
+span instance_boot 0
+
+# Passed by the per-boot hook when a warm pool instance goes into service;
+# packages were installed while it was being warmed
+WARM_POOL_RESUME="$1"
+
 log "Starting $DEPLOYMENT_COLOR deployment configuration..."
 
-# Update system
-log "Updating system packages..."
-apt-get update -y
-apt-get upgrade -y
+if [ "$WARM_POOL_RESUME" != "--warm-pool-resume" ]; then
+    # Update system
+    log "Updating system packages..."
+    apt-get update -y
+    apt-get upgrade -y
 
-# Install CloudWatch agent if not present
-if ! command -v /opt/aws/amazon-cloudwatch-agent/bin/amazon-cloudwatch-agent-ctl &> /dev/null; then
-    log "Installing CloudWatch agent..."
-    wget https://s3.amazonaws.com/amazoncloudwatch-agent/ubuntu/amd64/latest/amazon-cloudwatch-agent.deb
-    dpkg -i amazon-cloudwatch-agent.deb
+    # Install CloudWatch agent if not present
+    if ! command -v /opt/aws/amazon-cloudwatch-agent/bin/amazon-cloudwatch-agent-ctl &> /dev/null; then
+        log "Installing CloudWatch agent..."
+        wget https://s3.amazonaws.com/amazoncloudwatch-agent/ubuntu/amd64/latest/amazon-cloudwatch-agent.deb
+        dpkg -i amazon-cloudwatch-agent.deb
+    fi
 fi
 
 # Configure CloudWatch agent
@@ -190,11 +218,36 @@ mount_efs() {
 }
 
 # Install EFS utils as fallback
-install_efs_utils
+if [ "$WARM_POOL_RESUME" != "--warm-pool-resume" ]; then
+    install_efs_utils
+fi
+
+# A warm pool instance stops here: mounting EFS or starting Jenkins now would
+# run a second controller on the live color's JENKINS_HOME. A per-boot hook
+# re-runs the rest of this script once the instance leaves the pool.
+TARGET_LIFECYCLE_STATE=$(target_lifecycle_state || true)
+if [[ "$TARGET_LIFECYCLE_STATE" == Warmed:* ]]; then
+    log "Warm pool instance ($TARGET_LIFECYCLE_STATE); deferring EFS mount and Jenkins start until InService"
+    install -m 755 "$0" /usr/local/bin/jenkins-user-data.sh
+    cat > /var/lib/cloud/scripts/per-boot/jenkins-warm-pool-resume.sh << 'EOF'
+#!/bin/bash
+/usr/local/bin/jenkins-user-data.sh --warm-pool-resume
+EOF
+    chmod +x /var/lib/cloud/scripts/per-boot/jenkins-warm-pool-resume.sh
+    systemctl disable jenkins || true
+    systemctl stop jenkins || true
+    span user_data $USER_DATA_STARTED
+    exit 0
+fi
+
+# Out of the pool for good: later reboots don't redo the setup
+rm -f /var/lib/cloud/scripts/per-boot/jenkins-warm-pool-resume.sh
 
 # Mount EFS if provided
 if [ -n "$EFS_FILE_SYSTEM_ID" ] && [ "$EFS_FILE_SYSTEM_ID" != "null" ]; then
+    EFS_MOUNT_STARTED=$(uptime_seconds)
     mount_efs "$EFS_FILE_SYSTEM_ID" "$AWS_REGION"
+    span efs_mount $EFS_MOUNT_STARTED
 else
     echo "No EFS ID provided, using local storage"
     mkdir -p /var/lib/jenkins
@@ -253,6 +306,7 @@ echo "*/2 * * * * root /usr/local/bin/health-check.sh >> /var/log/health-check.l
 
 # Start Jenkins service
 log "Starting Jenkins service..."
+JENKINS_START_STARTED=$(uptime_seconds)
 systemctl enable jenkins
 systemctl start jenkins
 
@@ -270,6 +324,7 @@ while ! curl -f -s http://localhost:8080/login > /dev/null; do
 done
 
 log "Jenkins started successfully"
+span jenkins_start $JENKINS_START_STARTED
 
 # Configure deployment-specific settings
 log "Applying deployment-specific configurations..."
@@ -304,4 +359,5 @@ if [ -n "$EFS_FILE_SYSTEM_ID" ] && [ "$EFS_FILE_SYSTEM_ID" != "null" ]; then
     fi
 fi
 
+span user_data $USER_DATA_STARTED
 log "User data script execution completed"
@@ -118,6 +118,139 @@ variable "health_check_url" {
   default     = "/login"
 }
 
+variable "green_target_group_arn" {
+  description = "ARN of the green environment's target group; with listener_arn enables weighted canary switches"
+  type        = string
+  default     = ""
+}
+
+variable "listener_arn" {
+  description = "ARN of the ALB listener whose weights the orchestrator shifts between blue and green"
+  type        = string
+  default     = ""
+}
+
+variable "canary_steps" {
+  description = "Percent of traffic on the new environment at each canary step"
+  type        = list(number)
+  default     = [10, 25, 50, 100]
+
+  validation {
+    condition     = length(var.canary_steps) > 0 && var.canary_steps[length(var.canary_steps) - 1] == 100
+    error_message = "Canary steps must end at 100."
+  }
+}
+
+variable "canary_bake_seconds" {
+  description = "Seconds each canary step must pass its gates before traffic moves on"
+  type        = number
+  default     = 300
+}
+
+variable "canary_max_p95_seconds" {
+  description = "Canary gate: maximum p95 target response time on the new environment"
+  type        = number
+  default     = 2.0
+}
+
+variable "canary_max_5xx_percent" {
+  description = "Canary gate: maximum percentage of target 5xx responses on the new environment"
+  type        = number
+  default     = 1.0
+}
+
+variable "health_probes_enabled" {
+  description = "Probe /login, /api/json and /whoAmI on each instance during health checks (runs the orchestrator in the VPC)"
+  type        = bool
+  default     = false
+}
+
+variable "probe_security_group_id" {
+  description = "Security group for the orchestrator when health probes are enabled; must reach Jenkins on 8080"
+  type        = string
+  default     = ""
+}
+
+variable "switch_step_timeout_seconds" {
+  description = "Seconds a blue/green switch step may wait before the switch is rolled back"
+  type        = number
+  default     = 600
+}
+
+variable "standby_window_seconds" {
+  description = "Seconds the previous color stays on standby after a switch for fast rollback (0 scales it to zero immediately)"
+  type        = number
+  default     = 0
+}
+
+variable "standby_mode" {
+  description = "How the previous color waits out the standby window: 'warm' keeps it running in ASG Standby with Jenkins stopped and EFS unmounted, 'warm_pool' stops it in a warm pool"
+  type        = string
+  default     = "warm"
+
+  validation {
+    condition     = contains(["warm", "warm_pool"], var.standby_mode)
+    error_message = "Standby mode must be either 'warm' or 'warm_pool'."
+  }
+}
+
+variable "metric_history_bucket" {
+  description = "S3 bucket for the vertical scaler's metric history and forecast profile (empty keeps them in the Lambda's /tmp, lost on cold starts; required for predictive scaling)"
+  type        = string
+  default     = ""
+}
+
+variable "metric_history_hours" {
+  description = "Hours of per-ASG metric history retained by the vertical scaler"
+  type        = number
+  default     = 24
+}
+
+variable "vertical_scaling_mode" {
+  description = "Vertical scaling mode: 'reactive' acts on sustained breaches, 'predictive' also scales ahead of the weekly load forecast. Predictive mode needs metric_history_bucket: the forecast takes about two weeks to learn and is lost on cold starts otherwise, so without a bucket the scaler runs reactively"
+  type        = string
+  default     = "reactive"
+
+  validation {
+    condition     = contains(["reactive", "predictive"], var.vertical_scaling_mode)
+    error_message = "Vertical scaling mode must be either 'reactive' or 'predictive'."
+  }
+}
+
+variable "jenkins_url" {
+  description = "Jenkins URL the vertical scaler reads controller signals from (empty disables them)"
+  type        = string
+  default     = ""
+}
+
+variable "jenkins_metrics_source" {
+  description = "Where the vertical scaler reads Jenkins signals: 'api' (JSON API and Metrics plugin) or 'prometheus'"
+  type        = string
+  default     = "api"
+
+  validation {
+    condition     = contains(["api", "prometheus"], var.jenkins_metrics_source)
+    error_message = "Jenkins metrics source must be either 'api' or 'prometheus'."
+  }
+}
+
+variable "jenkins_credentials_parameter" {
+  description = "SSM SecureString parameter holding 'user:api-token' for the Jenkins API (empty for anonymous read)"
+  type        = string
+  default     = ""
+}
+
+variable "metrics_mode" {
+  description = "How the vertical scaler publishes its refresh metrics: api (batched PutMetricData) or emf (Embedded Metric Format log lines, no API calls). The deployment orchestrator always writes its switch metrics as EMF to the deployment log group, whatever this is set to"
+  type        = string
+  default     = "emf"
+
+  validation {
+    condition     = contains(["api", "emf"], var.metrics_mode)
+    error_message = "metrics_mode must be api or emf."
+  }
+}
+
 variable "common_tags" {
   description = "Common tags to apply to all resources"
   type        = map(string)
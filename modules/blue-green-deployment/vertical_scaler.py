@@ -1,23 +1,48 @@
 #!/usr/bin/env python3
 """
 Automatic Vertical Scaling for Jenkins Master
-Monitors CPU/Memory and scales instance type up/down
+Monitors CPU/Memory and Jenkins controller signals and scales instance type up/down
 """
 
+import base64
+import bisect
 import json
 import os
+import re
+import time
+import zlib
 import boto3
+from array import array
 from datetime import datetime, timedelta
 
+from aws_snapshot import AwsSnapshot
+from jenkins_api import COMPUTER_PATH, QUEUE_PATH, JenkinsSession
+from metrics import MetricsEmitter
+
 autoscaling = boto3.client('autoscaling')
 ec2 = boto3.client('ec2')
 cloudwatch = boto3.client('cloudwatch')
 sns = boto3.client('sns')
+s3 = boto3.client('s3')
+ssm = boto3.client('ssm')
+
+# Describe results shared by the reads of one invocation
+snapshot = AwsSnapshot()
 
 BLUE_ASG_NAME = os.environ['BLUE_ASG_NAME']
 GREEN_ASG_NAME = os.environ['GREEN_ASG_NAME']
 INSTANCE_TYPES = json.loads(os.environ['INSTANCE_TYPES'])
 SNS_TOPIC_ARN = os.environ['SNS_TOPIC_ARN']
+ENVIRONMENT = os.environ.get('ENVIRONMENT', '')
+METRIC_HISTORY_BUCKET = os.environ.get('METRIC_HISTORY_BUCKET')
+METRIC_HISTORY_PATH = os.environ.get('METRIC_HISTORY_PATH', '/tmp/vertical-scaler-history')
+METRIC_HISTORY_HOURS = int(os.environ.get('METRIC_HISTORY_HOURS', '24'))
+INSTANCE_PRICES = json.loads(os.environ.get('INSTANCE_PRICES', '{}'))
+SCALING_MODE = os.environ.get('SCALING_MODE', 'reactive')
+JENKINS_URL = os.environ.get('JENKINS_URL', '')
+JENKINS_METRICS_SOURCE = os.environ.get('JENKINS_METRICS_SOURCE', 'api')
+JENKINS_CREDENTIALS_PARAMETER = os.environ.get('JENKINS_CREDENTIALS_PARAMETER', '')
+JENKINS_STATIC_SIGNALS = json.loads(os.environ.get('JENKINS_STATIC_SIGNALS', '{}'))
 
 # Thresholds
 CPU_SCALE_UP_THRESHOLD = 75
@@ -25,8 +50,91 @@ CPU_SCALE_DOWN_THRESHOLD = 30
 MEMORY_SCALE_UP_THRESHOLD = 80
 MEMORY_SCALE_DOWN_THRESHOLD = 40
 
+# Anti-flapping policy: a breach must hold for the sustain window, with
+# HYSTERESIS_MARGIN points of slack once it has started
+HYSTERESIS_MARGIN = 5
+SUSTAIN_FRACTION = 0.8
+SCALE_UP_SUSTAIN_MINUTES = 20
+SCALE_DOWN_SUSTAIN_MINUTES = 60
+MIN_DATA_COVERAGE = 0.5
+REFRESH_COOLDOWN_MINUTES = 30
+DEFAULT_MIN_DWELL_MINUTES = 60
+MIN_DWELL_MINUTES = json.loads(os.environ.get('MIN_DWELL_MINUTES', '{}'))
+OSCILLATION_WINDOW_HOURS = 6
+MAX_SCALING_EVENTS = 50
+
+# Instance refresh statuses that mean a refresh is still running
+IN_FLIGHT_REFRESH_STATUSES = {'Pending', 'InProgress', 'Cancelling', 'RollbackInProgress', 'Baking'}
+REFRESH_METRICS_NAMESPACE = 'Jenkins/VerticalScaling'
+
+# Refresh metrics, published in one batch per invocation
+refresh_metrics = MetricsEmitter(REFRESH_METRICS_NAMESPACE, {'Environment': ENVIRONMENT}, cloudwatch=cloudwatch)
+
+# Right-sizing: pick the smallest type that would run the observed p90 load
+# at these utilization targets
+TARGET_CPU_UTILIZATION = 60
+TARGET_MEMORY_UTILIZATION = 65
+RIGHT_SIZE_PERCENTILE = 90
+CATALOG_TTL_SECONDS = 6 * 3600
+
+# Predictive mode: hour-of-week demand profile plus an EWMA trend on its
+# residuals. A profile bucket needs two weeks of minutes before it is trusted.
+PROFILE_ALPHA = 0.005
+TREND_ALPHA = 0.05
+MIN_PROFILE_SAMPLES = 120
+DEFAULT_REFRESH_LEAD_MINUTES = 20
+DECISION_INTERVAL_MINUTES = 10
+FORECAST_PEAK_MINUTES = 60
+SCALE_DOWN_LOOKAHEAD_MINUTES = 120
+MAX_REFRESH_DURATIONS = 10
+
+# Jenkins controller signals. Queue wait only counts against the controller
+# while executors are free: a full farm needs agents, not a bigger controller.
+GC_PAUSE_SCALE_UP_THRESHOLD = 10
+HEAP_SCALE_UP_THRESHOLD = 90
+HEAP_SCALE_DOWN_THRESHOLD = 50
+QUEUE_WAIT_SCALE_UP_SECONDS = 300
+EXECUTOR_SATURATION_THRESHOLD = 90
+JENKINS_TIMEOUT_SECONDS = 5
+
+# Prometheus plugin metric names for each signal
+PROMETHEUS_SIGNALS = {
+    'queue_wait': ('jenkins_task_waiting_duration', {'quantile': '0.95'}),
+    'executors_busy': ('jenkins_executor_in_use_value', {}),
+    'executors_total': ('jenkins_executor_count_value', {}),
+    'heap_used': ('vm_memory_heap_used', {}),
+    'heap_max': ('vm_memory_heap_max', {})
+}
+PROMETHEUS_GC_TIME = re.compile(r'^vm_gc_.+_time$')
+
+# Instance-type catalog and Jenkins collector, reused across warm invocations
+_catalog = None
+_jenkins_collector = None
+
+# Metrics fetched per run: id -> (namespace, metric name, statistic)
+METRIC_QUERIES = {
+    'cpu': ('AWS/EC2', 'CPUUtilization', 'Average'),
+    'memory': ('CWAgent', 'MemoryUtilization', 'Average'),
+    'network_in': ('AWS/EC2', 'NetworkIn', 'Sum'),
+    'network_out': ('AWS/EC2', 'NetworkOut', 'Sum'),
+    'ebs_burst_balance': ('AWS/EC2', 'EBSByteBalance%', 'Average'),
+    'cpu_credit_balance': ('AWS/EC2', 'CPUCreditBalance', 'Average')
+}
+METRIC_PERIOD_SECONDS = 60
+METRIC_LOOKBACK_MINUTES = 10
+
 def lambda_handler(event, context):
     """Main handler for vertical scaling"""
+
+    snapshot.reset()
+    try:
+        return run_scaling_check()
+    finally:
+        refresh_metrics.flush()
+        print(f"AWS describe calls: {snapshot.report()}")
+
+def run_scaling_check():
+    """One scaling check against the active ASG"""
     
     print(f"Starting vertical scaling check at {datetime.now()}")
     
@@ -46,18 +154,107 @@ def lambda_handler(event, context):
     
     print(f"Current instance type: {current_instance_type}")
     
-    # Get metrics
-    cpu_avg = get_cpu_utilization(active_asg)
-    memory_avg = get_memory_utilization(active_asg)
+    # Get metrics, fetching only what is newer than the stored history
+    history_store = get_history_store()
+    history = history_store.load(active_asg['AutoScalingGroupName'])
+    fetched = update_metric_history(active_asg, history)
+    history_store.save(active_asg['AutoScalingGroupName'], history)
+    print(f"Fetched {fetched} new datapoints; history spans {history.span_minutes()} minutes")
+
+    # Reconcile with any instance refresh started by an earlier run
+    in_flight, finished = sync_refresh_state(active_asg, history)
+    history_store.save(active_asg['AutoScalingGroupName'], history)
+
+    metrics = {name: history.series(name, METRIC_LOOKBACK_MINUTES) for name in METRIC_QUERIES}
+    cpu_avg = metrics['cpu'].average()
+    memory_avg = metrics['memory'].average()
+
+    # A refresh cancelled to be replaced: start the replacement now it has stopped
+    if finished and finished.get('replacement_type') and not in_flight:
+        replacement_type = finished['replacement_type']
+        print(f"Starting replacement refresh to {replacement_type}")
+        return start_scaling(active_asg, history_store, history, current_instance_type, replacement_type,
+                             cpu_avg, memory_avg)
     
     print(f"CPU: {cpu_avg}%, Memory: {memory_avg}%")
+    print("Signals: " + ", ".join(
+        f"{name}={series.latest()} ({len(series)} points)" for name, series in metrics.items()
+    ))
+
+    # Controller-level signals: queue wait, executor saturation, heap and GC
+    jenkins_signals = {}
+    collector = get_jenkins_collector()
+    if collector:
+        jenkins_signals = update_jenkins_signals(history, collector)
+        history_store.save(active_asg['AutoScalingGroupName'], history)
+        print(f"Jenkins: {jenkins_signals}")
     
-    # Determine if scaling is needed
-    new_instance_type = determine_scaling_action(
+    # Determine if scaling is needed, then gate it on the anti-flapping policy
+    proposed_instance_type = determine_scaling_action(
         current_instance_type, 
         cpu_avg, 
-        memory_avg
+        memory_avg,
+        jenkins_signals
     )
+    new_instance_type, reason = apply_scaling_policy(
+        current_instance_type,
+        proposed_instance_type,
+        history
+    )
+    print(f"Policy decision: {reason}")
+
+    # Jump straight to the right size instead of one step per refresh
+    if new_instance_type != current_instance_type:
+        approved_instance_type = new_instance_type
+        new_instance_type = apply_right_size(
+            current_instance_type,
+            approved_instance_type,
+            history,
+            get_instance_catalog()
+        )
+        if new_instance_type != approved_instance_type:
+            print(f"Right-sizing to {new_instance_type} instead of {approved_instance_type}")
+
+    # Predictive mode: act on the seasonal forecast before the load arrives
+    if get_scaling_mode() == 'predictive':
+        catalog = get_instance_catalog()
+        folded = update_forecast_profile(history, current_instance_type, catalog)
+        history_store.save(active_asg['AutoScalingGroupName'], history)
+        new_instance_type, forecast_reason = apply_forecast(
+            current_instance_type,
+            new_instance_type,
+            history,
+            catalog
+        )
+        print(f"Folded {folded} datapoints into the demand profile")
+        if forecast_reason:
+            reason = forecast_reason
+            print(f"Forecast decision: {reason}")
+    
+    # Never stack refreshes: skip, or cancel one heading to a different type
+    if in_flight:
+        tracked = history.refresh or {}
+        progress = {
+            'refresh_id': tracked.get('id'),
+            'target_type': tracked.get('target_type'),
+            'percent_complete': tracked.get('percent_complete', 0)
+        }
+
+        if new_instance_type in (current_instance_type, tracked.get('target_type')):
+            print(f"Instance refresh {progress['refresh_id']} in progress ({progress['percent_complete']}%), skipping")
+            return {'status': 'refresh_in_progress', **progress}
+
+        # Adopted refreshes have no target type: someone else started them, so leave them be
+        if tracked.get('target_type') is None:
+            print(f"Instance refresh {progress['refresh_id']} was not started by this scaler, skipping")
+            return {'status': 'refresh_in_progress', **progress}
+
+        print(f"Cancelling refresh {progress['refresh_id']} to replace it with {new_instance_type}")
+        autoscaling.cancel_instance_refresh(AutoScalingGroupName=active_asg['AutoScalingGroupName'])
+        snapshot.invalidate(autoscaling)
+        tracked['replacement_type'] = new_instance_type
+        history_store.save(active_asg['AutoScalingGroupName'], history)
+        return {'status': 'refresh_cancelling', 'replacement_type': new_instance_type, **progress}
     
     if new_instance_type == current_instance_type:
         print("No scaling needed")
@@ -65,16 +262,32 @@ def lambda_handler(event, context):
             'status': 'no_action',
             'current_type': current_instance_type,
             'cpu': cpu_avg,
-            'memory': memory_avg
+            'memory': memory_avg,
+            'reason': reason
         }
     
     # Perform vertical scaling
     print(f"Scaling from {current_instance_type} to {new_instance_type}")
+    return start_scaling(active_asg, history_store, history, current_instance_type, new_instance_type,
+                         cpu_avg, memory_avg)
+
+def start_scaling(asg, history_store, history, current_instance_type, new_instance_type, cpu_avg, memory_avg):
+    """Start a refresh to new_instance_type, record it, and notify"""
+
     result = perform_vertical_scaling(
-        active_asg,
+        asg,
         current_instance_type,
         new_instance_type
     )
+
+    if result['status'] == 'success':
+        history.record_scaling(
+            current_instance_type,
+            new_instance_type,
+            get_scaling_direction(current_instance_type, new_instance_type)
+        )
+        track_refresh(history, result, new_instance_type)
+        history_store.save(asg['AutoScalingGroupName'], history)
     
     # Send notification
     send_notification(
@@ -89,15 +302,13 @@ def lambda_handler(event, context):
 
 def get_active_asg():
     """Get the ASG that currently has instances"""
+    response = snapshot.describe_auto_scaling_groups(autoscaling, [BLUE_ASG_NAME, GREEN_ASG_NAME])
+    groups = {asg['AutoScalingGroupName']: asg for asg in response['AutoScalingGroups']}
+
     for asg_name in [BLUE_ASG_NAME, GREEN_ASG_NAME]:
-        response = autoscaling.describe_auto_scaling_groups(
-            AutoScalingGroupNames=[asg_name]
-        )
-        
-        if response['AutoScalingGroups']:
-            asg = response['AutoScalingGroups'][0]
-            if asg['DesiredCapacity'] > 0:
-                return asg
+        asg = groups.get(asg_name)
+        if asg and asg['DesiredCapacity'] > 0:
+            return asg
     
     return None
 
@@ -106,7 +317,8 @@ def get_current_instance_type(asg):
     lt_id = asg['LaunchTemplate']['LaunchTemplateId']
     lt_version = asg['LaunchTemplate']['Version']
     
-    response = ec2.describe_launch_template_versions(
+    response = snapshot.describe(
+        ec2, 'describe_launch_template_versions',
         LaunchTemplateId=lt_id,
         Versions=[lt_version]
     )
@@ -116,69 +328,767 @@ def get_current_instance_type(asg):
     
     return None
 
-def get_cpu_utilization(asg):
-    """Get average CPU utilization for last 10 minutes"""
+class MetricSeries:
+    """Time-ordered datapoints (epoch seconds, value) for one ASG metric"""
+
+    def __init__(self, name, timestamps, values):
+        self.name = name
+        self.timestamps = timestamps
+        self.values = values
+
+    def __len__(self):
+        return len(self.values)
+
+    def average(self):
+        """Mean of all datapoints, or 0 if there are none"""
+        if not self.values:
+            return 0
+        return round(sum(self.values) / len(self.values), 2)
+
+    def latest(self):
+        """Most recent datapoint, or None if there are none"""
+        return self.values[-1] if self.values else None
+
+    def percentile(self, p):
+        """Nearest-rank percentile of the datapoints, or 0 if there are none"""
+        if not self.values:
+            return 0
+        ordered = sorted(self.values)
+        rank = max(1, -(-len(ordered) * p // 100))
+        return round(ordered[int(rank) - 1], 2)
+
+    def fraction_above(self, threshold):
+        """Share of datapoints strictly above threshold"""
+        if not self.values:
+            return 0
+        return sum(1 for v in self.values if v > threshold) / len(self.values)
+
+    def fraction_below(self, threshold):
+        """Share of datapoints strictly below threshold"""
+        if not self.values:
+            return 0
+        return sum(1 for v in self.values if v < threshold) / len(self.values)
+
+def get_asg_metrics(asg, minutes=METRIC_LOOKBACK_MINUTES, start_time=None):
+    """Fetch every scaling signal for the ASG in one GetMetricData round trip"""
+
+    end_time = datetime.utcnow()
+    start_time = start_time or end_time - timedelta(minutes=minutes)
+    dimensions = [{'Name': 'AutoScalingGroupName', 'Value': asg['AutoScalingGroupName']}]
+
+    queries = [
+        {
+            'Id': metric_id,
+            'MetricStat': {
+                'Metric': {
+                    'Namespace': namespace,
+                    'MetricName': metric_name,
+                    'Dimensions': dimensions
+                },
+                'Period': METRIC_PERIOD_SECONDS,
+                'Stat': stat
+            },
+            'ReturnData': True
+        }
+        for metric_id, (namespace, metric_name, stat) in METRIC_QUERIES.items()
+    ]
+
+    collected = {metric_id: {} for metric_id in METRIC_QUERIES}
+
     try:
-        response = cloudwatch.get_metric_statistics(
-            Namespace='AWS/EC2',
-            MetricName='CPUUtilization',
-            Dimensions=[{
-                'Name': 'AutoScalingGroupName',
-                'Value': asg['AutoScalingGroupName']
-            }],
-            StartTime=datetime.utcnow() - timedelta(minutes=10),
-            EndTime=datetime.utcnow(),
-            Period=600,
-            Statistics=['Average']
-        )
-        
-        if response['Datapoints']:
-            return round(response['Datapoints'][0]['Average'], 2)
+        kwargs = {
+            'MetricDataQueries': queries,
+            'StartTime': start_time,
+            'EndTime': end_time,
+            'ScanBy': 'TimestampAscending'
+        }
+        while True:
+            response = cloudwatch.get_metric_data(**kwargs)
+            for result in response['MetricDataResults']:
+                points = collected[result['Id']]
+                for timestamp, value in zip(result['Timestamps'], result['Values']):
+                    points[int(timestamp.timestamp())] = value
+
+            if not response.get('NextToken'):
+                break
+            kwargs['NextToken'] = response['NextToken']
     except Exception as e:
-        print(f"Error getting CPU metrics: {e}")
-    
-    return 0
+        print(f"Error getting metrics: {e}")
+
+    series = {}
+    for metric_id, points in collected.items():
+        timestamps = sorted(points)
+        series[metric_id] = MetricSeries(metric_id, timestamps, [points[t] for t in timestamps])
+
+    return series
+
+class MetricHistory:
+    """Rolling per-metric history for one ASG, backed by compact arrays"""
+
+    def __init__(self, retention_seconds=METRIC_HISTORY_HOURS * 3600):
+        self.retention_seconds = retention_seconds
+        self.timestamps = {name: array('q') for name in METRIC_QUERIES}
+        self.values = {name: array('d') for name in METRIC_QUERIES}
+        self.scaling_events = []
+        self.refresh = None
+        self.refresh_durations = []
+        self.forecast = {}
+
+    def record_scaling(self, old_type, new_type, direction, now=None):
+        """Remember a scaling action for cooldown, dwell and oscillation checks"""
+        self.scaling_events.append({
+            'time': int(now or time.time()),
+            'from': old_type,
+            'to': new_type,
+            'direction': direction
+        })
+        del self.scaling_events[:-MAX_SCALING_EVENTS]
+
+    def high_water_mark(self):
+        """Newest CloudWatch timestamp held, or None if empty"""
+        latest = [self.timestamps[name][-1] for name in METRIC_QUERIES if self.timestamps.get(name)]
+        return max(latest) if latest else None
+
+    def span_minutes(self):
+        """Minutes covered by the stored CloudWatch history"""
+        earliest = [self.timestamps[name][0] for name in METRIC_QUERIES if self.timestamps.get(name)]
+        if not earliest:
+            return 0
+        return (self.high_water_mark() - min(earliest)) // 60
+
+    def extend(self, series):
+        """Merge newer datapoints, replacing any that overlap the tail"""
+        timestamps = self.timestamps.setdefault(series.name, array('q'))
+        values = self.values.setdefault(series.name, array('d'))
+        if not series.timestamps:
+            return
+
+        # CloudWatch may revise the most recent periods; newest data wins
+        cut = bisect.bisect_left(timestamps, series.timestamps[0])
+        del timestamps[cut:]
+        del values[cut:]
+
+        timestamps.extend(series.timestamps)
+        values.extend(series.values)
+
+    def trim(self, now=None):
+        """Drop datapoints older than the retention period"""
+        cutoff = (now or time.time()) - self.retention_seconds
+        for name, timestamps in self.timestamps.items():
+            cut = bisect.bisect_left(timestamps, cutoff)
+            if cut:
+                del timestamps[:cut]
+                del self.values[name][:cut]
+
+    def series(self, name, minutes, now=None):
+        """Return the last `minutes` of a metric as a MetricSeries"""
+        timestamps = self.timestamps.get(name, array('q'))
+        cutoff = (now or time.time()) - minutes * 60
+        cut = bisect.bisect_left(timestamps, cutoff)
+        return MetricSeries(name, list(timestamps[cut:]), list(self.values.get(name, array('d'))[cut:]))
+
+    def to_bytes(self):
+        """Serialize to compressed JSON with base64-encoded arrays"""
+        document = {
+            'version': 1,
+            'scaling_events': self.scaling_events,
+            'refresh': self.refresh,
+            'refresh_durations': self.refresh_durations,
+            'forecast': self.forecast,
+            'metrics': {
+                name: {
+                    'timestamps': base64.b64encode(self.timestamps[name].tobytes()).decode(),
+                    'values': base64.b64encode(self.values[name].tobytes()).decode()
+                }
+                for name in self.timestamps
+            }
+        }
+        return zlib.compress(json.dumps(document).encode())
+
+    @classmethod
+    def from_bytes(cls, data):
+        """Inverse of to_bytes"""
+        history = cls()
+        document = json.loads(zlib.decompress(data))
+        history.scaling_events = document.get('scaling_events', [])
+        history.refresh = document.get('refresh')
+        history.refresh_durations = document.get('refresh_durations', [])
+        history.forecast = document.get('forecast', {})
+        for name, encoded in document['metrics'].items():
+            timestamps = array('q')
+            timestamps.frombytes(base64.b64decode(encoded['timestamps']))
+            values = array('d')
+            values.frombytes(base64.b64decode(encoded['values']))
+            history.timestamps[name] = timestamps
+            history.values[name] = values
+        return history
+
+class LocalFileHistoryStore:
+    """Metric history kept on local disk (survives warm invocations only)"""
+
+    def __init__(self, path):
+        self.path = path
+
+    def _file(self, asg_name):
+        return os.path.join(self.path, f"{asg_name}.bin")
+
+    def load(self, asg_name):
+        try:
+            with open(self._file(asg_name), 'rb') as f:
+                return MetricHistory.from_bytes(f.read())
+        except FileNotFoundError:
+            return MetricHistory()
+        except Exception as e:
+            print(f"Discarding unreadable metric history: {e}")
+            return MetricHistory()
+
+    def save(self, asg_name, history):
+        os.makedirs(self.path, exist_ok=True)
+        with open(self._file(asg_name), 'wb') as f:
+            f.write(history.to_bytes())
+
+class S3HistoryStore:
+    """Metric history kept in S3, shared by every invocation"""
+
+    def __init__(self, bucket, prefix='vertical-scaler/history'):
+        self.bucket = bucket
+        self.prefix = prefix
+
+    def _key(self, asg_name):
+        return f"{self.prefix}/{asg_name}.bin"
+
+    def load(self, asg_name):
+        try:
+            response = s3.get_object(Bucket=self.bucket, Key=self._key(asg_name))
+            return MetricHistory.from_bytes(response['Body'].read())
+        except s3.exceptions.NoSuchKey:
+            return MetricHistory()
+        except Exception as e:
+            print(f"Error loading metric history, starting empty: {e}")
+            return MetricHistory()
+
+    def save(self, asg_name, history):
+        try:
+            s3.put_object(
+                Bucket=self.bucket,
+                Key=self._key(asg_name),
+                Body=history.to_bytes(),
+                ContentType='application/octet-stream'
+            )
+        except Exception as e:
+            print(f"Error saving metric history: {e}")
+
+def get_history_store():
+    """Return the configured metric history store"""
+    if METRIC_HISTORY_BUCKET:
+        return S3HistoryStore(METRIC_HISTORY_BUCKET)
+    return LocalFileHistoryStore(METRIC_HISTORY_PATH)
+
+def update_metric_history(asg, history):
+    """Fetch datapoints newer than the history's high-water mark and merge them"""
+
+    now = time.time()
+    high_water_mark = history.high_water_mark()
+
+    if high_water_mark is None or now - high_water_mark > history.retention_seconds:
+        start_time = datetime.utcnow() - timedelta(minutes=METRIC_LOOKBACK_MINUTES)
+    else:
+        # Re-read the last couple of periods, which CloudWatch may still revise
+        start_time = datetime.utcfromtimestamp(high_water_mark - 2 * METRIC_PERIOD_SECONDS)
+
+    fetched = 0
+    for series in get_asg_metrics(asg, start_time=start_time).values():
+        history.extend(series)
+        fetched += len(series)
+
+    history.trim(now)
+    return fetched
+
+class JenkinsApiCollector:
+    """Controller signals from the Jenkins JSON API and the Metrics plugin"""
+
+    def __init__(self, url, auth=None, timeout=JENKINS_TIMEOUT_SECONDS):
+        self.session = JenkinsSession(url, auth, timeout)
+
+    def collect(self):
+        now = time.time()
+        signals = {}
+
+        queue = self.session.get_json(QUEUE_PATH)
+        waits = [now - item['inQueueSince'] / 1000 for item in queue.get('items', []) if item.get('buildable')]
+        signals['queue_wait'] = round(max(waits), 1) if waits else 0
+
+        computers = self.session.get_json(COMPUTER_PATH)
+        if computers.get('totalExecutors'):
+            signals['executors_busy'] = computers['busyExecutors']
+            signals['executors_total'] = computers['totalExecutors']
+
+        # JVM gauges need the Metrics plugin; carry on without them
+        try:
+            gauges = self.session.get_json('/metrics/currentUser/metrics')['gauges']
+            signals['heap_used'] = gauges['vm.memory.heap.used']['value']
+            signals['heap_max'] = gauges['vm.memory.heap.max']['value']
+            signals['gc_time'] = sum(
+                gauge['value'] for name, gauge in gauges.items()
+                if name.startswith('vm.gc.') and name.endswith('.time')
+            )
+        except Exception as e:
+            print(f"JVM metrics unavailable: {e}")
+
+        return signals
+
+class JenkinsPrometheusCollector(JenkinsApiCollector):
+    """Controller signals scraped from the Prometheus plugin endpoint"""
+
+    def collect(self):
+        samples = parse_prometheus_text(self.session.get('/prometheus/', accept='text/plain').decode())
+        signals = {}
+
+        for signal, (name, labels) in PROMETHEUS_SIGNALS.items():
+            for sample_labels, value in samples.get(name, []):
+                if all(sample_labels.get(k) == v for k, v in labels.items()):
+                    signals[signal] = value
+                    break
+
+        gc_times = [value for name, values in samples.items() if PROMETHEUS_GC_TIME.match(name)
+                    for _, value in values]
+        if gc_times:
+            signals['gc_time'] = sum(gc_times)
 
-def get_memory_utilization(asg):
-    """Get average memory utilization for last 10 minutes"""
+        return signals
+
+class StaticJenkinsCollector:
+    """Fixed controller signals, for running the scaler without a Jenkins"""
+
+    def __init__(self, signals):
+        self.signals = signals
+
+    def collect(self):
+        return dict(self.signals)
+
+def parse_prometheus_text(text):
+    """Parse Prometheus exposition text into {name: [(labels, value)]}"""
+    samples = {}
+    for line in text.splitlines():
+        if not line or line.startswith('#'):
+            continue
+        match = re.match(r'^([a-zA-Z_:][a-zA-Z0-9_:]*)(?:\{(.*)\})?\s+(\S+)', line)
+        if not match:
+            continue
+        name, label_text, value = match.groups()
+        labels = dict(re.findall(r'(\w+)="((?:[^"\\]|\\.)*)"', label_text or ''))
+        try:
+            samples.setdefault(name, []).append((labels, float(value)))
+        except ValueError:
+            continue
+    return samples
+
+def get_jenkins_auth():
+    """Return the 'user:token' credentials for the Jenkins API, if configured"""
+    if not JENKINS_CREDENTIALS_PARAMETER:
+        return None
+    response = ssm.get_parameter(Name=JENKINS_CREDENTIALS_PARAMETER, WithDecryption=True)
+    return response['Parameter']['Value']
+
+def get_jenkins_collector():
+    """Return the configured Jenkins signal collector, or None if disabled
+
+    API collectors are cached so their connection and ETags are reused
+    across warm invocations.
+    """
+    global _jenkins_collector
+
+    if JENKINS_METRICS_SOURCE == 'static':
+        return StaticJenkinsCollector(JENKINS_STATIC_SIGNALS)
+    if not JENKINS_URL:
+        return None
+    if _jenkins_collector is None:
+        if JENKINS_METRICS_SOURCE == 'prometheus':
+            _jenkins_collector = JenkinsPrometheusCollector(JENKINS_URL, get_jenkins_auth())
+        else:
+            _jenkins_collector = JenkinsApiCollector(JENKINS_URL, get_jenkins_auth())
+    return _jenkins_collector
+
+def update_jenkins_signals(history, collector, now=None):
+    """Sample the controller and append its signals to the history
+
+    Stores queue wait (s), executor saturation and heap used (% of max) and
+    GC pause (% of wall time since the previous sample). Returns the latest
+    values, or {} if Jenkins could not be reached.
+    """
+
+    now = int(now or time.time())
     try:
-        response = cloudwatch.get_metric_statistics(
-            Namespace='CWAgent',
-            MetricName='MemoryUtilization',
-            Dimensions=[{
-                'Name': 'AutoScalingGroupName',
-                'Value': asg['AutoScalingGroupName']
-            }],
-            StartTime=datetime.utcnow() - timedelta(minutes=10),
-            EndTime=datetime.utcnow(),
-            Period=600,
-            Statistics=['Average']
-        )
-        
-        if response['Datapoints']:
-            return round(response['Datapoints'][0]['Average'], 2)
+        raw = collector.collect()
     except Exception as e:
-        print(f"Error getting memory metrics: {e}")
-    
-    return 0
+        print(f"Error collecting Jenkins signals: {e}")
+        return {}
+
+    signals = {}
+    if 'queue_wait' in raw:
+        signals['queue_wait'] = raw['queue_wait']
+    if raw.get('executors_total'):
+        signals['executor_saturation'] = round(100 * raw['executors_busy'] / raw['executors_total'], 1)
+    if raw.get('heap_max'):
+        signals['heap_used'] = round(100 * raw['heap_used'] / raw['heap_max'], 1)
+    if 'gc_time' in raw:
+        previous = history.series('jenkins_gc_time', METRIC_HISTORY_HOURS * 60, now)
+        # A drop in the cumulative counter means the controller restarted
+        if len(previous) and raw['gc_time'] >= previous.latest() and now > previous.timestamps[-1]:
+            elapsed_ms = (now - previous.timestamps[-1]) * 1000
+            signals['gc_pause'] = round(100 * (raw['gc_time'] - previous.latest()) / elapsed_ms, 2)
+        history.extend(MetricSeries('jenkins_gc_time', [now], [raw['gc_time']]))
+
+    for name, value in signals.items():
+        history.extend(MetricSeries(f'jenkins_{name}', [now], [value]))
+
+    return signals
+
+def is_controller_under_pressure(signals):
+    """True when the latest Jenkins signals show the controller itself is struggling"""
+    if signals.get('gc_pause', 0) > GC_PAUSE_SCALE_UP_THRESHOLD:
+        return True
+    if signals.get('heap_used', 0) > HEAP_SCALE_UP_THRESHOLD:
+        return True
+    return (
+        signals.get('queue_wait', 0) > QUEUE_WAIT_SCALE_UP_SECONDS
+        and signals.get('executor_saturation', 100) < EXECUTOR_SATURATION_THRESHOLD
+    )
+
+def jenkins_pressure_sustained(history, minutes, now=None):
+    """True when a Jenkins pressure signal held for the sustain window"""
+    gc = history.series('jenkins_gc_pause', minutes, now)
+    heap = history.series('jenkins_heap_used', minutes, now)
+    wait = history.series('jenkins_queue_wait', minutes, now)
+    saturation = history.series('jenkins_executor_saturation', minutes, now)
+
+    return (
+        gc.fraction_above(GC_PAUSE_SCALE_UP_THRESHOLD) >= SUSTAIN_FRACTION
+        or heap.fraction_above(HEAP_SCALE_UP_THRESHOLD) >= SUSTAIN_FRACTION
+        or (
+            wait.fraction_above(QUEUE_WAIT_SCALE_UP_SECONDS) >= SUSTAIN_FRACTION
+            and saturation.fraction_below(EXECUTOR_SATURATION_THRESHOLD) >= SUSTAIN_FRACTION
+        )
+    )
+
+def jenkins_idle_sustained(history, minutes, now=None):
+    """True unless Jenkins signals in the window argue against a smaller controller"""
+    heap = history.series('jenkins_heap_used', minutes, now)
+    wait = history.series('jenkins_queue_wait', minutes, now)
+
+    if len(heap) and heap.fraction_below(HEAP_SCALE_DOWN_THRESHOLD) < SUSTAIN_FRACTION:
+        return False
+    return not wait.fraction_above(QUEUE_WAIT_SCALE_UP_SECONDS)
 
-def determine_scaling_action(current_type, cpu, memory):
+class InstanceTypeCatalog:
+    """Capabilities and price of the allowed instance types, indexed for lookup"""
+
+    def __init__(self, entries, loaded_at=None):
+        self.loaded_at = loaded_at or time.time()
+        self.by_name = {entry['instance_type']: entry for entry in entries}
+        # Cheapest first; size breaks ties when prices are unknown
+        self.by_cost = sorted(
+            entries,
+            key=lambda e: (e['price'] if e['price'] is not None else float('inf'), e['vcpus'], e['memory_mib'])
+        )
+
+    def __contains__(self, instance_type):
+        return instance_type in self.by_name
+
+    def get(self, instance_type):
+        return self.by_name.get(instance_type)
+
+    def expired(self, now=None):
+        return (now or time.time()) - self.loaded_at > CATALOG_TTL_SECONDS
+
+    def smallest_fitting(self, vcpus, memory_mib):
+        """Cheapest type with at least the given vCPUs and memory, or None"""
+        for entry in self.by_cost:
+            if entry['vcpus'] >= vcpus and entry['memory_mib'] >= memory_mib:
+                return entry['instance_type']
+        return None
+
+def load_instance_catalog():
+    """Describe the allowed instance types and build a catalog"""
+    entries = []
+    paginator = ec2.get_paginator('describe_instance_types')
+    for page in paginator.paginate(InstanceTypes=INSTANCE_TYPES):
+        for info in page['InstanceTypes']:
+            instance_type = info['InstanceType']
+            entries.append({
+                'instance_type': instance_type,
+                'vcpus': info['VCpuInfo']['DefaultVCpus'],
+                'memory_mib': info['MemoryInfo']['SizeInMiB'],
+                'network': info.get('NetworkInfo', {}).get('NetworkPerformance'),
+                'price': INSTANCE_PRICES.get(instance_type)
+            })
+    return InstanceTypeCatalog(entries)
+
+def get_instance_catalog():
+    """Return the cached instance-type catalog, reloading it after its TTL"""
+    global _catalog
+
+    if _catalog is None or _catalog.expired():
+        try:
+            _catalog = load_instance_catalog()
+        except Exception as e:
+            print(f"Error loading instance type catalog: {e}")
+            # Keep serving a stale catalog rather than none at all
+            if _catalog is None:
+                return None
+
+    return _catalog
+
+def determine_right_size(current_type, cpu, memory, catalog):
+    """Smallest allowed type that runs the projected load at target utilization"""
+
+    current = catalog.get(current_type)
+    if not current:
+        return None
+
+    # Utilization is relative to the current type; project it onto absolute demand
+    required_vcpus = current['vcpus'] * cpu / TARGET_CPU_UTILIZATION
+    required_memory = current['memory_mib'] * memory / TARGET_MEMORY_UTILIZATION
+
+    return catalog.smallest_fitting(required_vcpus, required_memory) or INSTANCE_TYPES[-1]
+
+def apply_right_size(current_type, approved_type, history, catalog, now=None):
+    """Replace an approved one-step move with a jump to the right size"""
+
+    if not catalog or current_type not in catalog:
+        return approved_type
+
+    direction = get_scaling_direction(current_type, approved_type)
+    minutes = SCALE_UP_SUSTAIN_MINUTES if direction == 'up' else SCALE_DOWN_SUSTAIN_MINUTES
+    cpu_p = history.series('cpu', minutes, now).percentile(RIGHT_SIZE_PERCENTILE)
+    memory_p = history.series('memory', minutes, now).percentile(RIGHT_SIZE_PERCENTILE)
+    right_size = determine_right_size(current_type, cpu_p, memory_p, catalog)
+
+    # Only take the jump if it goes further in the approved direction
+    if right_size and get_scaling_direction(current_type, right_size) == direction:
+        return right_size
+
+    return approved_type
+
+def determine_scaling_action(current_type, cpu, memory, jenkins=None):
     """Determine if scaling up or down is needed"""
     
     current_index = INSTANCE_TYPES.index(current_type)
+    jenkins = jenkins or {}
     
-    # Scale UP if CPU or Memory high
-    if cpu > CPU_SCALE_UP_THRESHOLD or memory > MEMORY_SCALE_UP_THRESHOLD:
+    # Scale UP if CPU or Memory high, or Jenkins shows controller pressure
+    if cpu > CPU_SCALE_UP_THRESHOLD or memory > MEMORY_SCALE_UP_THRESHOLD or is_controller_under_pressure(jenkins):
         if current_index < len(INSTANCE_TYPES) - 1:
             return INSTANCE_TYPES[current_index + 1]
     
-    # Scale DOWN if both CPU and Memory low
-    if cpu < CPU_SCALE_DOWN_THRESHOLD and memory < MEMORY_SCALE_DOWN_THRESHOLD:
+    # Scale DOWN if both CPU and Memory low and the JVM heap has headroom
+    if (cpu < CPU_SCALE_DOWN_THRESHOLD and memory < MEMORY_SCALE_DOWN_THRESHOLD
+            and jenkins.get('heap_used', 0) < HEAP_SCALE_DOWN_THRESHOLD):
         if current_index > 0:
             return INSTANCE_TYPES[current_index - 1]
     
     return current_type
 
+def get_scaling_direction(current_type, new_type):
+    """Return 'up', 'down' or None for a move between instance types"""
+    if new_type == current_type:
+        return None
+    return 'up' if INSTANCE_TYPES.index(new_type) > INSTANCE_TYPES.index(current_type) else 'down'
+
+def apply_scaling_policy(current_type, proposed_type, history, now=None, require_sustained=True):
+    """Gate a proposed scaling action on hysteresis, cooldown, dwell and oscillation
+
+    Returns (instance_type, reason); instance_type is current_type when the
+    proposal is rejected. Forecast-driven proposals pass
+    require_sustained=False, since the breach has not happened yet.
+    """
+
+    now = now or time.time()
+    direction = get_scaling_direction(current_type, proposed_type)
+    if direction is None:
+        return current_type, 'within thresholds'
+
+    # Hysteresis: the breach must have held for the whole sustain window
+    if require_sustained:
+        if direction == 'up':
+            minutes = SCALE_UP_SUSTAIN_MINUTES
+            cpu = history.series('cpu', minutes, now)
+            memory = history.series('memory', minutes, now)
+            sustained = (
+                cpu.fraction_above(CPU_SCALE_UP_THRESHOLD - HYSTERESIS_MARGIN) >= SUSTAIN_FRACTION
+                or memory.fraction_above(MEMORY_SCALE_UP_THRESHOLD - HYSTERESIS_MARGIN) >= SUSTAIN_FRACTION
+                or jenkins_pressure_sustained(history, minutes, now)
+            )
+        else:
+            minutes = SCALE_DOWN_SUSTAIN_MINUTES
+            cpu = history.series('cpu', minutes, now)
+            memory = history.series('memory', minutes, now)
+            sustained = (
+                cpu.fraction_below(CPU_SCALE_DOWN_THRESHOLD + HYSTERESIS_MARGIN) >= SUSTAIN_FRACTION
+                and memory.fraction_below(MEMORY_SCALE_DOWN_THRESHOLD + HYSTERESIS_MARGIN) >= SUSTAIN_FRACTION
+                and jenkins_idle_sustained(history, minutes, now)
+            )
+
+        expected_points = minutes * 60 / METRIC_PERIOD_SECONDS
+        if len(cpu) < expected_points * MIN_DATA_COVERAGE:
+            return current_type, f'insufficient data for {minutes}m sustain window'
+        if not sustained:
+            return current_type, f'scale-{direction} breach not sustained for {minutes}m'
+
+    events = history.scaling_events
+    if events:
+        last = events[-1]
+
+        # Cooldown after every refresh
+        elapsed_minutes = (now - last['time']) / 60
+        if elapsed_minutes < REFRESH_COOLDOWN_MINUTES:
+            return current_type, f'cooldown: {elapsed_minutes:.0f}m since last refresh'
+
+        # Minimum dwell time on the current instance type
+        dwell = MIN_DWELL_MINUTES.get(current_type, DEFAULT_MIN_DWELL_MINUTES)
+        if last['to'] == current_type and elapsed_minutes < dwell:
+            return current_type, f'dwell: {elapsed_minutes:.0f}m on {current_type}, minimum {dwell}m'
+
+        # Oscillation: refuse a second direction reversal inside the window
+        window_start = now - OSCILLATION_WINDOW_HOURS * 3600
+        recent = [e['direction'] for e in events if e['time'] >= window_start] + [direction]
+        reversals = sum(1 for a, b in zip(recent, recent[1:]) if a != b)
+        if reversals >= 2:
+            return current_type, f'oscillation: {"/".join(recent)} within {OSCILLATION_WINDOW_HOURS}h'
+
+    if not require_sustained:
+        return proposed_type, f'scale-{direction} ahead of forecast'
+    return proposed_type, f'scale-{direction} sustained for {minutes}m'
+
+def get_scaling_mode():
+    """SCALING_MODE, or 'reactive' when predictive mode has nowhere durable to keep its profile
+
+    The demand profile takes weeks to learn and lives in the metric
+    history, which only survives cold starts in METRIC_HISTORY_BUCKET.
+    """
+    if SCALING_MODE == 'predictive' and not METRIC_HISTORY_BUCKET:
+        print("Predictive scaling needs METRIC_HISTORY_BUCKET to keep its demand profile; scaling reactively")
+        return 'reactive'
+    return SCALING_MODE
+
+def get_profile_bucket(timestamp):
+    """Hour-of-week bucket (0 = Monday 00:00 UTC) for an epoch timestamp"""
+    moment = datetime.utcfromtimestamp(timestamp)
+    return moment.weekday() * 24 + moment.hour
+
+def update_forecast_profile(history, current_type, catalog):
+    """Fold datapoints newer than the last fold into the seasonal demand profile
+
+    The profile is learned in absolute demand (vCPUs and MiB in use) so it
+    stays valid across instance types; points are attributed to the type
+    running now, which holds for everything since the previous run.
+    """
+
+    current = catalog.get(current_type) if catalog else None
+    if not current:
+        return 0
+
+    forecast = history.forecast
+    profile = forecast.setdefault('profile', {})
+    counts = forecast.setdefault('counts', {})
+    bias = forecast.setdefault('bias', {})
+    mark = forecast.get('mark', 0)
+    capacity = {'cpu': current['vcpus'], 'memory': current['memory_mib']}
+
+    folded = 0
+    for name, size in capacity.items():
+        levels = profile.setdefault(name, [0.0] * 168)
+        seen = counts.setdefault(name, [0] * 168)
+        timestamps = history.timestamps.get(name, array('q'))
+        values = history.values.get(name, array('d'))
+
+        for i in range(bisect.bisect_right(timestamps, mark), len(timestamps)):
+            bucket = get_profile_bucket(timestamps[i])
+            demand = values[i] * size / 100
+            if seen[bucket]:
+                # The trend tracks how far demand is running from the usual week
+                bias[name] = bias.get(name, 0.0) + TREND_ALPHA * (demand - levels[bucket] - bias.get(name, 0.0))
+            seen[bucket] += 1
+            # Plain mean until the bucket has history, then an EWMA
+            levels[bucket] += max(PROFILE_ALPHA, 1 / seen[bucket]) * (demand - levels[bucket])
+            folded += 1
+
+    forecast['mark'] = history.high_water_mark() or mark
+    return folded
+
+def forecast_peak_demand(history, start, end):
+    """Forecast peak (vCPUs, MiB) between two epoch times, or None if not yet learned"""
+
+    forecast = history.forecast
+    profile = forecast.get('profile', {})
+    counts = forecast.get('counts', {})
+    if 'cpu' not in profile or 'memory' not in profile:
+        return None
+
+    buckets = {get_profile_bucket(t) for t in range(int(start), int(end), 3600)}
+    buckets.add(get_profile_bucket(end - 1))
+
+    peak = {}
+    for name in ('cpu', 'memory'):
+        if any(counts[name][b] < MIN_PROFILE_SAMPLES for b in buckets):
+            return None
+        peak[name] = max(profile[name][b] for b in buckets) + forecast.get('bias', {}).get(name, 0.0)
+
+    return max(peak['cpu'], 0.0), max(peak['memory'], 0.0)
+
+def get_refresh_lead_minutes(history):
+    """How far ahead a scale-up must start: typical refresh time plus one decision interval"""
+    if not history.refresh_durations:
+        return DEFAULT_REFRESH_LEAD_MINUTES
+    durations = history.refresh_durations
+    return sum(durations) / len(durations) / 60 + DECISION_INTERVAL_MINUTES
+
+def get_forecast_type(demand, catalog):
+    """Smallest allowed type that runs a forecast demand at target utilization"""
+    vcpus, memory_mib = demand
+    return catalog.smallest_fitting(
+        vcpus * 100 / TARGET_CPU_UTILIZATION,
+        memory_mib * 100 / TARGET_MEMORY_UTILIZATION
+    ) or INSTANCE_TYPES[-1]
+
+def apply_forecast(current_type, new_type, history, catalog, now=None):
+    """Scale up ahead of a forecast peak, and hold scale-downs until it has passed
+
+    Returns (instance_type, reason); reason is None when the forecast does
+    not change the decision.
+    """
+
+    if not catalog or current_type not in catalog:
+        return new_type, None
+
+    now = now or time.time()
+    lead = get_refresh_lead_minutes(history)
+
+    # Upcoming peak, starting once a refresh begun now would have finished
+    demand = forecast_peak_demand(history, now + lead * 60, now + (lead + FORECAST_PEAK_MINUTES) * 60)
+    if demand is None:
+        return new_type, None
+
+    # Proactive scale-up: start the refresh now so it has finished when the peak arrives
+    needed = get_forecast_type(demand, catalog)
+    if get_scaling_direction(new_type, needed) == 'up':
+        forecast_type, reason = apply_scaling_policy(current_type, needed, history, now, require_sustained=False)
+        if forecast_type == needed:
+            return needed, f'{reason}: peak in {lead:.0f}m needs {needed}'
+        # Refused (cooldown, dwell, oscillation): never scale down into the peak
+        if get_scaling_direction(current_type, new_type) == 'down':
+            return current_type, f'scale-down held: forecast peak needs {needed}'
+        return new_type, f'forecast scale-up to {needed} deferred: {reason}'
+
+    if get_scaling_direction(current_type, new_type) == 'down':
+        demand = forecast_peak_demand(history, now, now + SCALE_DOWN_LOOKAHEAD_MINUTES * 60)
+        if demand is not None:
+            needed = get_forecast_type(demand, catalog)
+            if get_scaling_direction(new_type, needed) == 'up':
+                return current_type, f'scale-down held: forecast peak within {SCALE_DOWN_LOOKAHEAD_MINUTES}m needs {needed}'
+
+    return new_type, None
+
 def perform_vertical_scaling(asg, old_type, new_type):
     """Perform vertical scaling by updating launch template"""
     
@@ -186,7 +1096,8 @@ def perform_vertical_scaling(asg, old_type, new_type):
         # Get current launch template
         lt_id = asg['LaunchTemplate']['LaunchTemplateId']
         
-        response = ec2.describe_launch_template_versions(
+        response = snapshot.describe(
+            ec2, 'describe_launch_template_versions',
             LaunchTemplateId=lt_id,
             Versions=['$Latest']
         )
@@ -202,6 +1113,7 @@ def perform_vertical_scaling(asg, old_type, new_type):
             }
         )
         
+        snapshot.invalidate(ec2)
         print(f"Created launch template version: {new_version['LaunchTemplateVersion']['VersionNumber']}")
         
         # Update ASG to use new version
@@ -214,7 +1126,7 @@ def perform_vertical_scaling(asg, old_type, new_type):
         )
         
         # Trigger instance refresh for gradual rollout
-        autoscaling.start_instance_refresh(
+        refresh = autoscaling.start_instance_refresh(
             AutoScalingGroupName=asg['AutoScalingGroupName'],
             Strategy='Rolling',
             Preferences={
@@ -223,13 +1135,15 @@ def perform_vertical_scaling(asg, old_type, new_type):
             }
         )
         
+        snapshot.invalidate(autoscaling)
         print(f"Started instance refresh for {asg['AutoScalingGroupName']}")
         
         return {
             'status': 'success',
             'old_type': old_type,
             'new_type': new_type,
-            'asg': asg['AutoScalingGroupName']
+            'asg': asg['AutoScalingGroupName'],
+            'refresh_id': refresh['InstanceRefreshId']
         }
         
     except Exception as e:
@@ -239,6 +1153,86 @@ def perform_vertical_scaling(asg, old_type, new_type):
             'error': str(e)
         }
 
+def track_refresh(history, result, target_type):
+    """Record a refresh this scaler started"""
+    history.refresh = {
+        'id': result['refresh_id'],
+        'target_type': target_type,
+        'started_at': int(time.time()),
+        'status': 'Pending',
+        'percent_complete': 0
+    }
+
+def sync_refresh_state(asg, history):
+    """Reconcile the tracked refresh with describe_instance_refreshes
+
+    Returns (in_flight, finished): whether a refresh is still running on
+    the ASG, and the tracked refresh if it reached a terminal state.
+    """
+
+    asg_name = asg['AutoScalingGroupName']
+    try:
+        refreshes = autoscaling.describe_instance_refreshes(
+            AutoScalingGroupName=asg_name,
+            MaxRecords=5
+        )['InstanceRefreshes']
+    except Exception as e:
+        # Without refresh state, err on the side of not stacking another
+        print(f"Error describing instance refreshes: {e}")
+        return True, None
+
+    running = next((r for r in refreshes if r['Status'] in IN_FLIGHT_REFRESH_STATUSES), None)
+    tracked = history.refresh
+    finished = None
+
+    if tracked:
+        current = next((r for r in refreshes if r['InstanceRefreshId'] == tracked['id']), None)
+        if current:
+            tracked['status'] = current['Status']
+            tracked['percent_complete'] = current.get('PercentageComplete', 0)
+
+            if current['Status'] not in IN_FLIGHT_REFRESH_STATUSES:
+                if current.get('StartTime') and current.get('EndTime'):
+                    tracked['duration_seconds'] = int((current['EndTime'] - current['StartTime']).total_seconds())
+                finished = tracked
+                history.refresh = None
+                if current['Status'] == 'Successful' and 'duration_seconds' in tracked:
+                    history.refresh_durations.append(tracked['duration_seconds'])
+                    del history.refresh_durations[:-MAX_REFRESH_DURATIONS]
+                print(f"Instance refresh {tracked['id']} finished: {current['Status']} "
+                      f"after {tracked.get('duration_seconds')}s")
+        elif not running:
+            # Aged out of the describe results; nothing left to track
+            history.refresh = None
+
+    # Adopt a refresh started elsewhere (console, pipeline) so we don't stack on it
+    if running and (history.refresh is None or history.refresh['id'] != running['InstanceRefreshId']):
+        history.refresh = {
+            'id': running['InstanceRefreshId'],
+            'target_type': None,
+            'started_at': int(running['StartTime'].timestamp()) if running.get('StartTime') else int(time.time()),
+            'status': running['Status'],
+            'percent_complete': running.get('PercentageComplete', 0)
+        }
+
+    publish_refresh_metrics(asg_name, history.refresh, finished)
+    return running is not None, finished
+
+def publish_refresh_metrics(asg_name, in_flight, finished):
+    """Queue refresh progress and completed-refresh duration for publishing"""
+
+    dimensions = {'AutoScalingGroupName': asg_name}
+
+    if in_flight:
+        refresh_metrics.put('InstanceRefreshPercentComplete', in_flight.get('percent_complete', 0), 'Percent', dimensions)
+    if finished and finished.get('duration_seconds') is not None:
+        refresh_metrics.put(
+            'InstanceRefreshDurationSeconds',
+            finished['duration_seconds'],
+            'Seconds',
+            {**dimensions, 'Status': finished['status']}
+        )
+
 def send_notification(old_type, new_type, cpu, memory, status):
     """Send SNS notification about scaling action"""
     
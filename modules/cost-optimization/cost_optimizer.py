@@ -1,16 +1,24 @@
 import json
 import boto3
-import requests
 import os
 from datetime import datetime, timedelta
 from decimal import Decimal
 
+from aws_snapshot import AwsSnapshot
+from jenkins_api import JenkinsMetricsCollector
+from metrics import MetricsEmitter
+from spot_prices import SpotPriceIndex
+
 # AWS clients
 autoscaling = boto3.client('autoscaling')
 ec2 = boto3.client('ec2')
 cloudwatch = boto3.client('cloudwatch')
 sns = boto3.client('sns')
 s3 = boto3.client('s3')
+ssm = boto3.client('ssm')
+
+# Describe results shared by the reads of one invocation
+snapshot = AwsSnapshot()
 
 # Configuration from environment
 ENVIRONMENT = os.environ['ENVIRONMENT']
@@ -18,22 +26,67 @@ ASG_NAME = os.environ['ASG_NAME']
 SNS_TOPIC = os.environ['SNS_TOPIC']
 S3_BUCKET = os.environ['S3_BUCKET']
 JENKINS_URL = os.environ.get('JENKINS_URL', 'http://localhost:8080')
+# SSM SecureString holding 'user:api-token' for the Jenkins API
+JENKINS_CREDENTIALS_PARAMETER = os.environ.get('JENKINS_CREDENTIALS_PARAMETER', '')
+
+# Spot prices are reused for this long, in memory and through S3 across cold starts
+SPOT_PRICE_TTL_SECONDS = int(os.environ.get('SPOT_PRICE_TTL_SECONDS', '10800'))
+SPOT_PRICE_CACHE_KEY = 'spot-prices/index.json'
+
+# Linux on-demand hourly prices, the baseline for spot savings
+ON_DEMAND_PRICES = {
+    't3.small': 0.0208,
+    't3.medium': 0.0416,
+    't3.large': 0.0832,
+    't3.xlarge': 0.1664,
+    't3a.medium': 0.0376,
+    't3a.large': 0.0752,
+    'm5.large': 0.096,
+    'm5a.large': 0.086,
+    'm6i.large': 0.096,
+    'c5.large': 0.085
+}
+ON_DEMAND_PRICES.update(json.loads(os.environ.get('ON_DEMAND_PRICES', '{}')))
+
+# Used only when no price is known for a worker at all
+DEFAULT_SPOT_PRICE = 0.012
+DEFAULT_ON_DEMAND_PRICE = 0.0416
+
+# Reused across warm invocations so the keep-alive connection and ETag cache survive
+_jenkins_collector = None
+
+# Spot prices, reused across warm invocations until they expire
+_spot_price_index = None
+
+# Cost metrics, published in one batch per invocation
+cost_metrics = MetricsEmitter(
+    f'Jenkins/CostOptimization/{ENVIRONMENT}',
+    {'Environment': ENVIRONMENT, 'AutoScalingGroupName': ASG_NAME},
+    cloudwatch=cloudwatch
+)
 
 def lambda_handler(event, context):
     """
     Jenkins Cost Optimization Lambda
     Runs every hour to optimize costs through intelligent scaling
     """
+    snapshot.reset()
     try:
         print(f"🚀 Starting cost optimization for {ENVIRONMENT}")
         
         # Get current metrics
         jenkins_metrics = get_jenkins_metrics()
+        if not jenkins_metrics['available']:
+            # Scaling is paused until the controller answers; say so rather than report "no change"
+            send_error_alert(
+                f"Jenkins API at {JENKINS_URL} is unreachable ({jenkins_metrics['error']}); "
+                f"worker scaling is paused until it answers"
+            )
         infrastructure_costs = get_infrastructure_costs()
         scaling_decision = make_scaling_decision(jenkins_metrics)
         
         # Execute scaling if needed
-        cost_impact = execute_scaling(scaling_decision)
+        cost_impact = execute_scaling(scaling_decision, infrastructure_costs['worker_price'])
         
         # Store optimization data
         optimization_data = {
@@ -60,7 +113,8 @@ def lambda_handler(event, context):
             'body': json.dumps({
                 'message': 'Cost optimization completed',
                 'cost_impact': cost_impact,
-                'current_capacity': scaling_decision.get('current_capacity', 0)
+                'current_capacity': scaling_decision.get('current_capacity', 0),
+                'jenkins_available': jenkins_metrics['available']
             })
         }
         
@@ -68,42 +122,85 @@ def lambda_handler(event, context):
         print(f"❌ Error in cost optimization: {str(e)}")
         send_error_alert(str(e))
         raise
+    finally:
+        print(f"📊 AWS describe calls: {snapshot.report()}")
+
+def get_jenkins_collector():
+    """Return the cached Jenkins API collector"""
+    global _jenkins_collector
+
+    if _jenkins_collector is None:
+        auth = None
+        if JENKINS_CREDENTIALS_PARAMETER:
+            response = ssm.get_parameter(Name=JENKINS_CREDENTIALS_PARAMETER, WithDecryption=True)
+            auth = response['Parameter']['Value']
+        _jenkins_collector = JenkinsMetricsCollector(JENKINS_URL, auth)
+
+    return _jenkins_collector
+
+def get_spot_price_index():
+    """Return the cached spot price index, seeded from S3 on a cold start"""
+    global _spot_price_index
+
+    if _spot_price_index is None:
+        _spot_price_index = SpotPriceIndex(ec2, SPOT_PRICE_TTL_SECONDS)
+        try:
+            response = s3.get_object(Bucket=S3_BUCKET, Key=SPOT_PRICE_CACHE_KEY)
+            _spot_price_index.load(json.loads(response['Body'].read()))
+        except Exception as e:
+            print(f"⚠️ No cached spot prices loaded: {str(e)}")
+
+    return _spot_price_index
+
+def save_spot_price_index(index):
+    """Persist the index so the next cold start reuses unexpired prices"""
+    try:
+        s3.put_object(
+            Bucket=S3_BUCKET,
+            Key=SPOT_PRICE_CACHE_KEY,
+            Body=json.dumps(index.dump()),
+            ContentType='application/json'
+        )
+    except Exception as e:
+        print(f"⚠️ Error storing spot prices: {str(e)}")
+
+def get_launch_options(asg):
+    """Instance types and availability zones the ASG can launch workers into"""
+    zones = list(asg.get('AvailabilityZones', []))
+    policy = asg.get('MixedInstancesPolicy')
+    if policy:
+        spec = policy['LaunchTemplate']['LaunchTemplateSpecification']
+        types = [o['InstanceType'] for o in policy['LaunchTemplate'].get('Overrides', []) if 'InstanceType' in o]
+    else:
+        spec = asg.get('LaunchTemplate')
+        types = []
+
+    # Without overrides the launch template decides the type
+    if not types and spec:
+        template = {'LaunchTemplateId': spec['LaunchTemplateId']} if 'LaunchTemplateId' in spec \
+            else {'LaunchTemplateName': spec['LaunchTemplateName']}
+        response = snapshot.describe(
+            ec2, 'describe_launch_template_versions',
+            Versions=[spec.get('Version', '$Default')],
+            **template
+        )
+        for version in response['LaunchTemplateVersions']:
+            if 'InstanceType' in version['LaunchTemplateData']:
+                types.append(version['LaunchTemplateData']['InstanceType'])
+
+    # Running workers may predate the current launch configuration
+    for instance in asg['Instances']:
+        types.append(instance['InstanceType'])
+        zones.append(instance['AvailabilityZone'])
+
+    return list(dict.fromkeys(types)), list(dict.fromkeys(zones))
 
 def get_jenkins_metrics():
     """Get Jenkins queue and executor metrics"""
     try:
-        # In production, you'd use Jenkins API with authentication
-        # For demo, we'll simulate realistic metrics
-        
-        current_hour = datetime.now().hour
-        current_day = datetime.now().weekday()  # 0=Monday, 6=Sunday
-        
-        # Simulate realistic Jenkins usage patterns
-        if current_day >= 5:  # Weekend
-            queue_length = 0
-            active_executors = 0
-            idle_executors = 0
-        elif current_hour < 8 or current_hour > 19:  # Off hours
-            queue_length = 1 if current_hour in [7, 20] else 0
-            active_executors = 0
-            idle_executors = 0
-        else:  # Business hours
-            # Peak hours: 10-12, 14-16
-            if current_hour in [10, 11, 14, 15]:
-                queue_length = 5
-                active_executors = 3
-                idle_executors = 1
-            else:
-                queue_length = 2
-                active_executors = 1
-                idle_executors = 2
-        
-        return {
-            'queue_length': queue_length,
-            'active_executors': active_executors,
-            'idle_executors': idle_executors,
-            'total_executors': active_executors + idle_executors
-        }
+        metrics = get_jenkins_collector().collect()
+        metrics['available'] = True
+        return metrics
         
     except Exception as e:
         print(f"⚠️ Error getting Jenkins metrics: {str(e)}")
@@ -111,46 +208,77 @@ def get_jenkins_metrics():
             'queue_length': 0,
             'active_executors': 0,
             'idle_executors': 0,
-            'total_executors': 0
+            'total_executors': 0,
+            'available': False,
+            'error': str(e)
         }
 
 def get_infrastructure_costs():
     """Get current infrastructure costs and capacity"""
     try:
         # Get current ASG capacity
-        response = autoscaling.describe_auto_scaling_groups(
-            AutoScalingGroupNames=[ASG_NAME]
-        )
+        response = snapshot.describe_auto_scaling_groups(autoscaling, [ASG_NAME])
         
         if not response['AutoScalingGroups']:
             current_capacity = 0
+            instances = []
+            types, zones = [], []
         else:
-            current_capacity = response['AutoScalingGroups'][0]['DesiredCapacity']
+            asg = response['AutoScalingGroups'][0]
+            current_capacity = asg['DesiredCapacity']
+            instances = asg['Instances']
+            types, zones = get_launch_options(asg)
         
-        # Get current spot price
-        spot_response = ec2.describe_spot_price_history(
-            InstanceTypes=['t3.medium'],
-            ProductDescriptions=['Linux/UNIX'],
-            MaxResults=1
-        )
-        
-        spot_price = float(spot_response['SpotPriceHistory'][0]['SpotPrice']) if spot_response['SpotPriceHistory'] else 0.012
-        on_demand_price = 0.0416  # t3.medium on-demand price
+        # Current spot prices for every type and zone the ASG can use, in one bulk fetch
+        index = get_spot_price_index()
+        fetches = index.fetches
+        launch_prices = [price for price in index.prices(types, zones).values() if price is not None]
+        if index.fetches != fetches:
+            save_spot_price_index(index)
+
+        # A new worker could land on any launchable type and zone
+        worker_price = sum(launch_prices) / len(launch_prices) if launch_prices else DEFAULT_SPOT_PRICE
+        on_demand_prices = [ON_DEMAND_PRICES[t] for t in types if t in ON_DEMAND_PRICES]
+        on_demand_price = sum(on_demand_prices) / len(on_demand_prices) if on_demand_prices else DEFAULT_ON_DEMAND_PRICE
+
+        # Price the running workers as they are: type, zone and purchase option
+        described = snapshot.describe_instances(ec2, [i['InstanceId'] for i in instances]) if instances else []
+        lifecycles = {i['InstanceId']: i.get('InstanceLifecycle', 'on-demand') for i in described}
+
+        hourly_cost = 0
+        on_demand_hourly = 0
+        for instance in instances:
+            instance_type = instance['InstanceType']
+            spot = index.price(instance_type, instance['AvailabilityZone'])
+            on_demand = ON_DEMAND_PRICES.get(instance_type)
+            if lifecycles.get(instance['InstanceId'], 'spot') == 'spot':
+                cost = spot if spot is not None else worker_price
+            else:
+                cost = on_demand if on_demand is not None else on_demand_price
+            hourly_cost += cost
+            on_demand_hourly += on_demand if on_demand is not None else on_demand_price
+
+        # Capacity still launching is priced as new workers
+        pending = max(current_capacity - len(instances), 0)
+        hourly_cost += pending * worker_price
+        on_demand_hourly += pending * on_demand_price
+
+        spot_price = (hourly_cost / current_capacity) if current_capacity else worker_price
         
         # Calculate costs
-        hourly_cost = current_capacity * spot_price
         daily_cost = hourly_cost * 24
         monthly_cost = daily_cost * 30
         
         # Calculate savings vs on-demand
-        on_demand_monthly = current_capacity * on_demand_price * 24 * 30
+        on_demand_monthly = on_demand_hourly * 24 * 30
         monthly_savings = on_demand_monthly - monthly_cost
         savings_percent = (monthly_savings / on_demand_monthly * 100) if on_demand_monthly > 0 else 0
         
         return {
             'current_capacity': current_capacity,
-            'spot_price': spot_price,
-            'on_demand_price': on_demand_price,
+            'spot_price': round(spot_price, 4),
+            'on_demand_price': round(on_demand_price, 4),
+            'worker_price': round(worker_price, 4),
             'hourly_cost': round(hourly_cost, 4),
             'daily_cost': round(daily_cost, 2),
             'monthly_cost': round(monthly_cost, 2),
@@ -162,8 +290,9 @@ def get_infrastructure_costs():
         print(f"⚠️ Error getting infrastructure costs: {str(e)}")
         return {
             'current_capacity': 0,
-            'spot_price': 0.012,
-            'on_demand_price': 0.0416,
+            'spot_price': DEFAULT_SPOT_PRICE,
+            'on_demand_price': DEFAULT_ON_DEMAND_PRICE,
+            'worker_price': DEFAULT_SPOT_PRICE,
             'hourly_cost': 0,
             'daily_cost': 0,
             'monthly_cost': 0,
@@ -178,9 +307,7 @@ def make_scaling_decision(jenkins_metrics):
     idle_executors = jenkins_metrics['idle_executors']
     
     # Get current capacity
-    response = autoscaling.describe_auto_scaling_groups(
-        AutoScalingGroupNames=[ASG_NAME]
-    )
+    response = snapshot.describe_auto_scaling_groups(autoscaling, [ASG_NAME])
     current_capacity = response['AutoScalingGroups'][0]['DesiredCapacity'] if response['AutoScalingGroups'] else 0
     
     # Scaling parameters
@@ -197,8 +324,13 @@ def make_scaling_decision(jenkins_metrics):
     current_day = datetime.now().weekday()
     is_off_hours = (current_day >= 5) or (current_hour < 8 or current_hour > 19)
     
+    # An unreachable controller looks idle; never scale on that
+    if not jenkins_metrics.get('available', True):
+        action = "no_change"
+        reason = "Jenkins metrics unavailable"
+
     # Scale up logic
-    if queue_length > SCALE_UP_THRESHOLD:
+    elif queue_length > SCALE_UP_THRESHOLD:
         needed_workers = (queue_length + 1) // 2  # 2 jobs per worker
         target_capacity = min(current_capacity + needed_workers, MAX_WORKERS)
         action = "scale_up"
@@ -224,8 +356,8 @@ def make_scaling_decision(jenkins_metrics):
         'is_off_hours': is_off_hours
     }
 
-def execute_scaling(scaling_decision):
-    """Execute the scaling decision"""
+def execute_scaling(scaling_decision, worker_price=DEFAULT_SPOT_PRICE):
+    """Execute the scaling decision; worker_price is the hourly price of one worker"""
     current_capacity = scaling_decision['current_capacity']
     target_capacity = scaling_decision['target_capacity']
     action = scaling_decision['action']
@@ -247,11 +379,11 @@ def execute_scaling(scaling_decision):
                 DesiredCapacity=target_capacity,
                 HonorCooldown=True
             )
+            snapshot.invalidate(autoscaling)
             
             # Calculate cost impact
-            spot_price = 0.012  # Average spot price
             capacity_change = target_capacity - current_capacity
-            hourly_change = capacity_change * spot_price
+            hourly_change = capacity_change * worker_price
             daily_change = hourly_change * 24
             monthly_change = daily_change * 30
             
@@ -325,45 +457,16 @@ Action required: Review scaling policies or increase budget.
 
 def publish_cost_metrics(infrastructure_costs, jenkins_metrics):
     """Publish custom CloudWatch metrics"""
-    try:
-        metrics = [
-            {
-                'MetricName': 'MonthlyEstimatedCost',
-                'Value': infrastructure_costs['monthly_cost'],
-                'Unit': 'None'
-            },
-            {
-                'MetricName': 'SpotSavingsPercent',
-                'Value': infrastructure_costs['savings_percent'],
-                'Unit': 'Percent'
-            },
-            {
-                'MetricName': 'CurrentCapacity',
-                'Value': infrastructure_costs['current_capacity'],
-                'Unit': 'Count'
-            },
-            {
-                'MetricName': 'JenkinsQueueLength',
-                'Value': jenkins_metrics['queue_length'],
-                'Unit': 'Count'
-            }
-        ]
-        
-        for metric in metrics:
-            cloudwatch.put_metric_data(
-                Namespace=f'Jenkins/CostOptimization/{ENVIRONMENT}',
-                MetricData=[{
-                    'MetricName': metric['MetricName'],
-                    'Value': metric['Value'],
-                    'Unit': metric['Unit'],
-                    'Timestamp': datetime.utcnow()
-                }]
-            )
-        
-        print(f"📈 Published {len(metrics)} cost optimization metrics")
-        
-    except Exception as e:
-        print(f"⚠️ Error publishing metrics: {str(e)}")
+    cost_metrics.put('MonthlyEstimatedCost', infrastructure_costs['monthly_cost'])
+    cost_metrics.put('SpotSavingsPercent', infrastructure_costs['savings_percent'], 'Percent')
+    cost_metrics.put('CurrentCapacity', infrastructure_costs['current_capacity'], 'Count')
+    cost_metrics.put('JenkinsApiAvailable', 1 if jenkins_metrics['available'] else 0, 'Count')
+    # An unreachable controller has no queue; don't report it as empty
+    if jenkins_metrics['available']:
+        cost_metrics.put('JenkinsQueueLength', jenkins_metrics['queue_length'], 'Count')
+
+    published = cost_metrics.flush()
+    print(f"📈 Published {published} cost optimization metrics ({cost_metrics.mode})")
 
 def send_error_alert(error_message):
     """Send error alert via SNS"""
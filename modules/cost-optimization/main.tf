@@ -120,11 +120,14 @@ resource "aws_lambda_function" "cost_optimizer" {
 
   environment {
     variables = {
-      ENVIRONMENT = var.environment
-      ASG_NAME    = var.jenkins_asg_name
-      SNS_TOPIC   = aws_sns_topic.cost_alerts.arn
-      S3_BUCKET   = aws_s3_bucket.cost_reports.bucket
-      JENKINS_URL = var.jenkins_url
+      ENVIRONMENT                   = var.environment
+      ASG_NAME                      = var.jenkins_asg_name
+      SNS_TOPIC                     = aws_sns_topic.cost_alerts.arn
+      S3_BUCKET                     = aws_s3_bucket.cost_reports.bucket
+      JENKINS_URL                   = var.jenkins_url
+      JENKINS_CREDENTIALS_PARAMETER = var.jenkins_credentials_parameter
+      SPOT_PRICE_TTL_SECONDS        = var.spot_price_ttl_seconds
+      METRICS_MODE                  = var.metrics_mode
     }
   }
 
@@ -216,7 +219,7 @@ resource "aws_iam_role_policy" "cost_optimizer_policy" {
 
   policy = jsonencode({
     Version = "2012-10-17"
-    Statement = [
+    Statement = concat([
       {
         Effect = "Allow"
         Action = [
@@ -233,6 +236,7 @@ resource "aws_iam_role_policy" "cost_optimizer_policy" {
           "autoscaling:UpdateAutoScalingGroup",
           "autoscaling:SetDesiredCapacity",
           "ec2:DescribeInstances",
+          "ec2:DescribeLaunchTemplateVersions",
           "ec2:DescribeSpotInstanceRequests",
           "ec2:DescribeSpotPriceHistory",
           "cloudwatch:GetMetricStatistics",
@@ -244,7 +248,13 @@ resource "aws_iam_role_policy" "cost_optimizer_policy" {
         ]
         Resource = "*"
       }
-    ]
+      ], var.jenkins_credentials_parameter != "" ? [
+      {
+        Effect   = "Allow"
+        Action   = "ssm:GetParameter"
+        Resource = "arn:aws:ssm:*:*:parameter/${trimprefix(var.jenkins_credentials_parameter, "/")}"
+      }
+    ] : [])
   })
 }
 
@@ -300,5 +310,29 @@ data "aws_region" "current" {}
 data "archive_file" "cost_optimizer_zip" {
   type        = "zip"
   output_path = "${path.module}/cost_optimizer.zip"
-  source_file = "${path.module}/cost_optimizer.py"
+
+  source {
+    content  = file("${path.module}/cost_optimizer.py")
+    filename = "cost_optimizer.py"
+  }
+
+  source {
+    content  = file("${path.module}/../lambda-common/jenkins_api.py")
+    filename = "jenkins_api.py"
+  }
+
+  source {
+    content  = file("${path.module}/spot_prices.py")
+    filename = "spot_prices.py"
+  }
+
+  source {
+    content  = file("${path.module}/../lambda-common/aws_snapshot.py")
+    filename = "aws_snapshot.py"
+  }
+
+  source {
+    content  = file("${path.module}/../lambda-common/metrics.py")
+    filename = "metrics.py"
+  }
 }
@@ -0,0 +1,99 @@
+"""
+Spot Price Index for Cost Optimization
+Current spot prices per instance type and availability zone, cached with a TTL
+"""
+
+import time
+from datetime import datetime, timezone
+
+SPOT_PRODUCT_DESCRIPTION = 'Linux/UNIX'
+SPOT_PRICE_TTL_SECONDS = 3 * 3600
+
+class SpotPriceIndex:
+    """Spot prices keyed by (instance type, availability zone)
+
+    Prices are fetched in bulk, every missing type across every requested
+    zone in one paginated call, and reused until they are older than the
+    TTL. Types not offered in a zone are remembered too, so they are not
+    asked for again on every lookup.
+    """
+
+    def __init__(self, ec2, ttl_seconds=SPOT_PRICE_TTL_SECONDS):
+        self.ec2 = ec2
+        self.ttl_seconds = ttl_seconds
+        self.entries = {}
+        self.fetches = 0
+
+    def evict(self, now=None):
+        """Drop prices older than the TTL"""
+        now = time.time() if now is None else now
+        self.entries = {
+            key: entry for key, entry in self.entries.items()
+            if now - entry['fetched_at'] < self.ttl_seconds
+        }
+
+    def prices(self, instance_types, zones, now=None):
+        """{(type, zone): hourly price or None} for every pair, fetching stale ones"""
+        now = time.time() if now is None else now
+        self.evict(now)
+
+        pairs = [(t, z) for t in dict.fromkeys(instance_types) for z in dict.fromkeys(zones)]
+        stale = [pair for pair in pairs if pair not in self.entries]
+        if stale:
+            self._fetch(sorted({t for t, _ in stale}), sorted({z for _, z in stale}), now)
+
+        return {pair: self.entries[pair]['price'] for pair in pairs}
+
+    def _fetch(self, instance_types, zones, now):
+        """One paginated describe_spot_price_history call for the current prices"""
+        latest = {}
+        paginator = self.ec2.get_paginator('describe_spot_price_history')
+        pages = paginator.paginate(
+            InstanceTypes=instance_types,
+            ProductDescriptions=[SPOT_PRODUCT_DESCRIPTION],
+            Filters=[{'Name': 'availability-zone', 'Values': zones}],
+            # With only a start time the API returns the price in effect at that time
+            StartTime=datetime.fromtimestamp(now, timezone.utc)
+        )
+        for page in pages:
+            for row in page['SpotPriceHistory']:
+                key = (row['InstanceType'], row['AvailabilityZone'])
+                if key not in latest or row['Timestamp'] > latest[key]['Timestamp']:
+                    latest[key] = row
+        self.fetches += 1
+
+        for instance_type in instance_types:
+            for zone in zones:
+                row = latest.get((instance_type, zone))
+                self.entries[(instance_type, zone)] = {
+                    'price': float(row['SpotPrice']) if row else None,
+                    'fetched_at': now
+                }
+
+    def price(self, instance_type, zone, now=None):
+        """Hourly price of one instance; falls back to the type's mean across known zones"""
+        known = self.prices([instance_type], [zone], now)[(instance_type, zone)]
+        if known is not None:
+            return known
+
+        elsewhere = [
+            entry['price'] for (t, _), entry in self.entries.items()
+            if t == instance_type and entry['price'] is not None
+        ]
+        return sum(elsewhere) / len(elsewhere) if elsewhere else None
+
+    def dump(self):
+        """Entries as JSON-friendly data, for persisting across cold starts"""
+        return [
+            {'instance_type': t, 'zone': z, **entry}
+            for (t, z), entry in self.entries.items()
+        ]
+
+    def load(self, data, now=None):
+        """Restore dumped entries, skipping expired ones"""
+        for item in data:
+            self.entries[(item['instance_type'], item['zone'])] = {
+                'price': item['price'],
+                'fetched_at': item['fetched_at']
+            }
+        self.evict(now)
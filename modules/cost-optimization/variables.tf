@@ -13,6 +13,34 @@ variable "jenkins_url" {
   type        = string
 }
 
+variable "jenkins_credentials_parameter" {
+  description = "SSM SecureString parameter holding 'user:api-token' for the Jenkins API (empty for anonymous access)"
+  type        = string
+  default     = ""
+}
+
+variable "spot_price_ttl_seconds" {
+  description = "How long fetched spot prices are reused before EC2 is asked again"
+  type        = number
+  default     = 10800
+
+  validation {
+    condition     = var.spot_price_ttl_seconds >= 0
+    error_message = "spot_price_ttl_seconds must not be negative."
+  }
+}
+
+variable "metrics_mode" {
+  description = "How Lambda metrics are published: api (batched PutMetricData) or emf (Embedded Metric Format log lines, no API calls)"
+  type        = string
+  default     = "emf"
+
+  validation {
+    condition     = contains(["api", "emf"], var.metrics_mode)
+    error_message = "metrics_mode must be api or emf."
+  }
+}
+
 variable "cost_alert_email" {
   description = "Email for cost alerts"
   type        = string
@@ -0,0 +1,104 @@
+"""
+Invocation-Scoped AWS Describe Snapshot
+Memoizes read-only describe calls so each resource is fetched once per invocation
+"""
+
+import json
+import threading
+
+# Largest ID lists sent in one describe call
+DESCRIBE_BATCH_SIZE = 50
+
+class AwsSnapshot:
+    """Describe results for one Lambda invocation
+
+    Clients outlive an invocation in a warm container, so handlers call
+    reset() on entry. Code that changes a resource calls invalidate() with
+    the client it used, so later reads see the change. Cached responses are
+    shared between callers and must not be modified.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """Forget everything; call at the start of each invocation"""
+        with self.lock:
+            self.entries = {}
+            self.calls = 0
+            self.saved = 0
+
+    def describe(self, client, operation, **params):
+        """Call a read-only operation once per distinct set of parameters"""
+        key = (client, operation, json.dumps(params, sort_keys=True, default=str))
+        with self.lock:
+            if key in self.entries:
+                self.saved += 1
+                return self.entries[key]
+
+        response = getattr(client, operation)(**params)
+        with self.lock:
+            self.calls += 1
+            self.entries[key] = response
+        return response
+
+    def describe_auto_scaling_groups(self, autoscaling, names):
+        """describe_auto_scaling_groups, cached per group so overlapping name lists share one fetch"""
+        groups = self._describe_each(
+            autoscaling, 'auto_scaling_group', names,
+            lambda batch: autoscaling.describe_auto_scaling_groups(AutoScalingGroupNames=batch)['AutoScalingGroups'],
+            lambda group: group['AutoScalingGroupName']
+        )
+        return {'AutoScalingGroups': groups}
+
+    def describe_auto_scaling_instances(self, autoscaling, instance_ids):
+        """describe_auto_scaling_instances, cached per instance"""
+        instances = self._describe_each(
+            autoscaling, 'auto_scaling_instance', instance_ids,
+            lambda batch: autoscaling.describe_auto_scaling_instances(InstanceIds=batch)['AutoScalingInstances'],
+            lambda instance: instance['InstanceId']
+        )
+        return {'AutoScalingInstances': instances}
+
+    def describe_instances(self, ec2, instance_ids):
+        """EC2 instance descriptions cached per instance, as a flat list"""
+        def fetch(batch):
+            pages = ec2.get_paginator('describe_instances').paginate(InstanceIds=batch)
+            return [instance for page in pages for reservation in page['Reservations']
+                    for instance in reservation['Instances']]
+
+        return self._describe_each(ec2, 'instance', instance_ids, fetch, lambda instance: instance['InstanceId'])
+
+    def _describe_each(self, client, kind, ids, fetch, id_of):
+        """Resources by ID, fetching only the uncached ones in batched calls
+
+        IDs the API does not return are remembered as missing and left out,
+        as the API itself does.
+        """
+
+        with self.lock:
+            missing = [i for i in dict.fromkeys(ids) if (client, kind, i) not in self.entries]
+            if not missing:
+                self.saved += 1
+
+        for start in range(0, len(missing), DESCRIBE_BATCH_SIZE):
+            batch = missing[start:start + DESCRIBE_BATCH_SIZE]
+            found = {id_of(item): item for item in fetch(batch)}
+            with self.lock:
+                self.calls += 1
+                for i in batch:
+                    self.entries[(client, kind, i)] = found.get(i)
+
+        with self.lock:
+            items = [self.entries.get((client, kind, i)) for i in dict.fromkeys(ids)]
+        return [item for item in items if item]
+
+    def invalidate(self, client):
+        """Drop everything described through client, after changing its resources"""
+        with self.lock:
+            self.entries = {key: value for key, value in self.entries.items() if key[0] is not client}
+
+    def report(self):
+        """Describe calls made and avoided during this invocation"""
+        return {'describe_calls': self.calls, 'describe_calls_saved': self.saved}
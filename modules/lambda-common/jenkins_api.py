@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+"""
+Jenkins API Client
+One keep-alive connection with conditional GETs, shared by the Lambdas that
+read controller signals (cost optimizer, vertical scaler)
+"""
+
+import argparse
+import base64
+import gzip
+import hashlib
+import http.client
+import json
+import threading
+import time
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+JENKINS_TIMEOUT_SECONDS = 5
+
+# Narrow tree= filters keep payloads small on controllers with thousands of queued items
+QUEUE_PATH = '/queue/api/json?tree=items[inQueueSince,buildable]'
+COMPUTER_PATH = '/computer/api/json?tree=busyExecutors,totalExecutors'
+
+class JenkinsSession:
+    """One keep-alive HTTP(S) connection to a controller, with conditional GETs
+
+    Responses carrying an ETag or Last-Modified are cached and revalidated,
+    so an unchanged resource costs a 304 instead of a full payload.
+    """
+
+    def __init__(self, url, auth=None, timeout=JENKINS_TIMEOUT_SECONDS):
+        parts = urllib.parse.urlsplit(url)
+        self.scheme = parts.scheme
+        self.host = parts.hostname
+        self.port = parts.port
+        self.prefix = parts.path.rstrip('/')
+        self.timeout = timeout
+        self.headers = {
+            'Accept-Encoding': 'gzip',
+            'Connection': 'keep-alive',
+            'User-Agent': 'jenkins-platform-lambda'
+        }
+        if auth:
+            self.headers['Authorization'] = 'Basic ' + base64.b64encode(auth.encode()).decode()
+
+        self.connection = None
+        self.cache = {}
+        self.connections_opened = 0
+        self.not_modified = 0
+        self.bytes_received = 0
+
+    def _connect(self):
+        connection_class = http.client.HTTPSConnection if self.scheme == 'https' else http.client.HTTPConnection
+        self.connection = connection_class(self.host, self.port, timeout=self.timeout)
+        self.connections_opened += 1
+
+    def get(self, path, accept='application/json'):
+        """GET path and return its decompressed body; revalidates cached responses
+
+        Raises http.client.HTTPException on any status other than 200 or a
+        304 for a cached response, and OSError when the controller cannot
+        be reached.
+        """
+        headers = dict(self.headers, Accept=accept)
+        cached = self.cache.get(path)
+        if cached:
+            headers.update(cached['validators'])
+
+        while True:
+            reused = self.connection is not None
+            if not reused:
+                self._connect()
+            try:
+                self.connection.request('GET', self.prefix + path, headers=headers)
+                response = self.connection.getresponse()
+                body = response.read()
+                break
+            except Exception as e:
+                # A failed exchange leaves the connection in an unknown state; never reuse it
+                self.close()
+                # The controller may have closed an idle keep-alive connection; retry once on a new one.
+                # Timeouts are not retried.
+                if not reused or not isinstance(e, (http.client.HTTPException, ConnectionError)):
+                    raise
+
+        self.bytes_received += len(body)
+        if response.getheader('Connection', '').lower() == 'close':
+            self.close()
+
+        if response.status == 304 and cached:
+            self.not_modified += 1
+            return cached['body']
+        if response.status != 200:
+            raise http.client.HTTPException(f"GET {path} returned HTTP {response.status}")
+
+        if response.getheader('Content-Encoding') == 'gzip':
+            body = gzip.decompress(body)
+
+        validators = {}
+        if response.getheader('ETag'):
+            validators['If-None-Match'] = response.getheader('ETag')
+        if response.getheader('Last-Modified'):
+            validators['If-Modified-Since'] = response.getheader('Last-Modified')
+        if validators:
+            self.cache[path] = {'validators': validators, 'body': body}
+
+        return body
+
+    def get_json(self, path):
+        """GET path and decode its JSON body"""
+        return json.loads(self.get(path))
+
+    def close(self):
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+class JenkinsMetricsCollector:
+    """Build queue backlog and executor usage from the Jenkins JSON API"""
+
+    def __init__(self, url, auth=None, timeout=JENKINS_TIMEOUT_SECONDS):
+        self.session = JenkinsSession(url, auth, timeout)
+
+    def collect(self):
+        queue = self.session.get_json(QUEUE_PATH)
+        computers = self.session.get_json(COMPUTER_PATH)
+
+        busy = computers.get('busyExecutors', 0)
+        total = computers.get('totalExecutors', 0)
+        return {
+            # Buildable items wait only for an executor; blocked ones would not use a new worker
+            'queue_length': sum(1 for item in queue.get('items', []) if item.get('buildable')),
+            'active_executors': busy,
+            'idle_executors': total - busy,
+            'total_executors': total
+        }
+
+class StandInHandler(BaseHTTPRequestHandler):
+    """Local Jenkins stand-in: queue and computer APIs with ETags and gzip"""
+
+    protocol_version = 'HTTP/1.1'
+    queue_length = 0
+    busy_executors = 0
+    total_executors = 0
+    queued_since = 0
+    auth = None
+
+    def do_GET(self):
+        if self.auth and self.headers.get('Authorization') != 'Basic ' + base64.b64encode(self.auth.encode()).decode():
+            return self._send(401, b'')
+
+        path = urllib.parse.urlsplit(self.path).path
+        if path == '/queue/api/json':
+            data = {
+                '_class': 'hudson.model.Queue',
+                'items': [
+                    {'_class': 'hudson.model.Queue$BuildableItem', 'buildable': True, 'inQueueSince': self.queued_since}
+                ] * self.queue_length
+            }
+        elif path == '/computer/api/json':
+            data = {
+                '_class': 'hudson.model.ComputerSet',
+                'busyExecutors': self.busy_executors,
+                'totalExecutors': self.total_executors
+            }
+        else:
+            return self._send(404, b'')
+
+        body = json.dumps(data).encode()
+        etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+        if self.headers.get('If-None-Match') == etag:
+            return self._send(304, b'', {'ETag': etag})
+
+        headers = {'ETag': etag, 'Content-Type': 'application/json'}
+        if 'gzip' in self.headers.get('Accept-Encoding', ''):
+            body = gzip.compress(body)
+            headers['Content-Encoding'] = 'gzip'
+        self._send(200, body, headers)
+
+    def _send(self, status, body, headers=None):
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+def start_stand_in(queue_length=0, busy_executors=0, total_executors=0, auth=None, queued_since=None):
+    """Run a stand-in on a free local port; returns the server"""
+    handler = type('Handler', (StandInHandler,), {
+        'queue_length': queue_length,
+        'busy_executors': busy_executors,
+        'total_executors': total_executors,
+        'queued_since': int((time.time() if queued_since is None else queued_since) * 1000),
+        'auth': auth
+    })
+    server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def main(argv=None):
+    """Poll a local Jenkins stand-in and report payload sizes and connection reuse"""
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument('--queue', type=int, default=5000, help='queued buildable items')
+    parser.add_argument('--busy', type=int, default=8)
+    parser.add_argument('--executors', type=int, default=10)
+    parser.add_argument('--polls', type=int, default=3)
+    args = parser.parse_args(argv)
+
+    server = start_stand_in(args.queue, args.busy, args.executors, auth='admin:token')
+    collector = JenkinsMetricsCollector(f"http://127.0.0.1:{server.server_address[1]}", auth='admin:token')
+
+    for poll in range(args.polls):
+        received = collector.session.bytes_received
+        started = time.perf_counter()
+        metrics = collector.collect()
+        elapsed = time.perf_counter() - started
+        print(f"poll {poll + 1}: {metrics} in {elapsed * 1000:.1f} ms, "
+              f"{collector.session.bytes_received - received} bytes")
+
+    session = collector.session
+    print(f"{session.connections_opened} connection(s) opened, {session.not_modified} not-modified responses")
+    session.close()
+    server.shutdown()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,126 @@
+"""
+Batched CloudWatch Metrics
+Collects metrics during an invocation and publishes them with as few calls as
+possible: PutMetricData batches, or Embedded Metric Format log lines
+"""
+
+import json
+import os
+import time
+
+# PutMetricData accepts up to 1000 metrics per request
+MAX_API_METRICS = 1000
+# One EMF document may declare up to 100 metrics
+MAX_EMF_METRICS = 100
+
+# 'api' publishes with PutMetricData; 'emf' prints EMF documents, which
+# CloudWatch Logs turns into metrics without any API calls
+METRICS_MODE = os.environ.get('METRICS_MODE', 'api')
+
+def emf_document(namespace, metrics, dimensions=None, properties=None, timestamp=None):
+    """An EMF document
+
+    metrics maps name -> (value, unit); dimensions and properties are flat
+    dicts. Properties are searchable in Logs Insights but do not become
+    metric dimensions.
+    """
+
+    timestamp = timestamp or time.time()
+    dimensions = dimensions or {}
+    return {
+        '_aws': {
+            'Timestamp': int(timestamp * 1000),
+            'CloudWatchMetrics': [{
+                'Namespace': namespace,
+                'Dimensions': [list(dimensions)],
+                'Metrics': [{'Name': name, 'Unit': unit} for name, (_, unit) in metrics.items()]
+            }]
+        },
+        **(properties or {}),
+        **dimensions,
+        **{name: value for name, (value, _) in metrics.items()}
+    }
+
+class MetricsEmitter:
+    """Metrics for one namespace, buffered until flush()
+
+    Every metric carries the emitter's dimensions (environment, ASG) plus
+    any given with it. Publishing failures are printed, not raised, so a
+    metrics outage never fails the invocation.
+    """
+
+    def __init__(self, namespace, dimensions=None, mode=None, cloudwatch=None):
+        if (mode or METRICS_MODE) not in ('api', 'emf'):
+            raise ValueError(f"Unknown metrics mode: {mode or METRICS_MODE}")
+        self.namespace = namespace
+        self.dimensions = {name: value for name, value in (dimensions or {}).items() if value}
+        self.mode = mode or METRICS_MODE
+        self.cloudwatch = cloudwatch
+        self.metrics = []
+        self.api_calls = 0
+        self.published = 0
+
+    def put(self, name, value, unit='None', dimensions=None, timestamp=None):
+        """Buffer one value"""
+        self.metrics.append({
+            'name': name,
+            'value': value,
+            'unit': unit,
+            'dimensions': {**self.dimensions, **(dimensions or {})},
+            'timestamp': timestamp or time.time()
+        })
+
+    def flush(self):
+        """Publish every buffered value; returns how many were published"""
+        if not self.metrics:
+            return 0
+
+        metrics, self.metrics = self.metrics, []
+        try:
+            if self.mode == 'emf':
+                for document in self.documents(metrics):
+                    print(json.dumps(document, default=str))
+            else:
+                for start in range(0, len(metrics), MAX_API_METRICS):
+                    self._put_metric_data(metrics[start:start + MAX_API_METRICS])
+        except Exception as e:
+            print(f"Error publishing {self.namespace} metrics: {e}")
+            return 0
+
+        self.published += len(metrics)
+        return len(metrics)
+
+    def documents(self, metrics):
+        """EMF documents, one per dimension set and second, split at the EMF metric limit"""
+        groups = {}
+        for metric in metrics:
+            key = (tuple(sorted(metric['dimensions'].items())), int(metric['timestamp']))
+            documents = groups.setdefault(key, [{}])
+            # A name appears once per document; repeated values start a new one
+            if metric['name'] in documents[-1] or len(documents[-1]) >= MAX_EMF_METRICS:
+                documents.append({})
+            documents[-1][metric['name']] = (metric['value'], metric['unit'])
+
+        for (dimensions, timestamp), documents in groups.items():
+            for document in documents:
+                yield emf_document(self.namespace, document, dict(dimensions), timestamp=timestamp)
+
+    def _put_metric_data(self, batch):
+        if self.cloudwatch is None:
+            import boto3
+            self.cloudwatch = boto3.client('cloudwatch')
+
+        self.cloudwatch.put_metric_data(
+            Namespace=self.namespace,
+            MetricData=[
+                {
+                    'MetricName': metric['name'],
+                    'Dimensions': [{'Name': name, 'Value': str(value)} for name, value in metric['dimensions'].items()],
+                    'Value': metric['value'],
+                    'Unit': metric['unit'],
+                    'Timestamp': metric['timestamp']
+                }
+                for metric in batch
+            ]
+        )
+        self.api_calls += 1
@@ -133,14 +133,61 @@ resource "aws_lambda_function" "security_responder" {
 
   environment {
     variables = {
-      ENVIRONMENT   = var.environment
-      SNS_TOPIC_ARN = aws_sns_topic.security_alerts.arn
+      ENVIRONMENT       = var.environment
+      SNS_TOPIC_ARN     = aws_sns_topic.security_alerts.arn
+      DEDUP_TABLE_NAME  = aws_dynamodb_table.security_responder_state.name
+      DEDUP_TTL_SECONDS = var.dedup_ttl_seconds
+
+      ALERT_DIGEST_WINDOW_SECONDS = var.alert_digest_window_seconds
+
+      REPLACEMENT_MODE         = var.replacement_mode
+      REPLACEMENT_WAIT_SECONDS = var.replacement_wait_seconds
+
+      METRICS_MODE = var.metrics_mode
     }
   }
 
   tags = local.common_tags
 }
 
+# Seen-set for deduplicating re-emitted findings and repeated remediations
+resource "aws_dynamodb_table" "security_responder_state" {
+  name         = "${var.environment}-jenkins-security-responder-state"
+  billing_mode = "PAY_PER_REQUEST"
+  hash_key     = "pk"
+
+  attribute {
+    name = "pk"
+    type = "S"
+  }
+
+  attribute {
+    name = "digest_queue"
+    type = "S"
+  }
+
+  attribute {
+    name = "window_ends"
+    type = "N"
+  }
+
+  # Sparse index: only buffered alert digests carry digest_queue, so the
+  # flush tick queries due digests instead of scanning the seen-set
+  global_secondary_index {
+    name            = "digests-by-window"
+    hash_key        = "digest_queue"
+    range_key       = "window_ends"
+    projection_type = "KEYS_ONLY"
+  }
+
+  ttl {
+    attribute_name = "expires_at"
+    enabled        = true
+  }
+
+  tags = local.common_tags
+}
+
 # EventBridge rule for GuardDuty findings
 resource "aws_cloudwatch_event_rule" "guardduty_findings" {
   name        = "${var.environment}-jenkins-guardduty-findings"
@@ -163,6 +210,22 @@ resource "aws_cloudwatch_event_target" "guardduty_lambda" {
   arn       = aws_lambda_function.security_responder.arn
 }
 
+# Scheduled tick that publishes alert digests whose window has closed
+resource "aws_cloudwatch_event_rule" "security_alert_digest_flush" {
+  name                = "${var.environment}-jenkins-security-alert-digest-flush"
+  description         = "Flush buffered security alert digests and finish prelaunch terminations and replacement timing"
+  schedule_expression = "rate(1 minute)"
+
+  tags = local.common_tags
+}
+
+resource "aws_cloudwatch_event_target" "security_alert_digest_flush" {
+  rule      = aws_cloudwatch_event_rule.security_alert_digest_flush.name
+  target_id = "SecurityResponderDigestFlush"
+  arn       = aws_lambda_function.security_responder.arn
+  input     = jsonencode({ action = "flush_alerts" })
+}
+
 # SNS topic for security alerts
 resource "aws_sns_topic" "security_alerts" {
   name = "${var.environment}-jenkins-security-alerts"
@@ -215,6 +278,16 @@ data "archive_file" "security_responder" {
     content  = file("${path.module}/security_responder.py")
     filename = "security_responder.py"
   }
+
+  source {
+    content  = file("${path.module}/../lambda-common/aws_snapshot.py")
+    filename = "aws_snapshot.py"
+  }
+
+  source {
+    content  = file("${path.module}/../lambda-common/metrics.py")
+    filename = "metrics.py"
+  }
 }
 
 
@@ -244,7 +317,7 @@ resource "aws_iam_role_policy" "security_responder" {
 
   policy = jsonencode({
     Version = "2012-10-17"
-    Statement = [
+    Statement = concat([
       {
         Effect = "Allow"
         Action = [
@@ -261,15 +334,46 @@ resource "aws_iam_role_policy" "security_responder" {
         ]
         Resource = aws_sns_topic.security_alerts.arn
       },
+      {
+        Effect = "Allow"
+        Action = [
+          "dynamodb:PutItem",
+          "dynamodb:UpdateItem",
+          "dynamodb:DeleteItem",
+          "dynamodb:Query"
+        ]
+        Resource = [
+          aws_dynamodb_table.security_responder_state.arn,
+          "${aws_dynamodb_table.security_responder_state.arn}/index/*"
+        ]
+      },
       {
         Effect = "Allow"
         Action = [
           "ec2:DescribeInstances",
-          "autoscaling:UpdateAutoScalingGroup"
+          "ec2:DescribeSecurityGroups",
+          "ec2:CreateSecurityGroup",
+          "ec2:DeleteSecurityGroup",
+          "ec2:RevokeSecurityGroupEgress",
+          "ec2:CreateTags",
+          "ec2:ModifyInstanceAttribute",
+          "ec2:TerminateInstances",
+          "autoscaling:DescribeAutoScalingInstances",
+          "autoscaling:DescribeAutoScalingGroups",
+          "autoscaling:SetDesiredCapacity",
+          "autoscaling:TerminateInstanceInAutoScalingGroup",
+          "autoscaling:UpdateAutoScalingGroup",
+          "elasticloadbalancing:DeregisterTargets"
         ]
         Resource = "*"
       }
-    ]
+      ], var.metrics_mode == "api" ? [
+      {
+        Effect   = "Allow"
+        Action   = "cloudwatch:PutMetricData"
+        Resource = "*"
+      }
+    ] : [])
   })
 }
 
@@ -281,3 +385,11 @@ resource "aws_lambda_permission" "allow_eventbridge" {
   principal     = "events.amazonaws.com"
   source_arn    = aws_cloudwatch_event_rule.guardduty_findings.arn
 }
+
+resource "aws_lambda_permission" "allow_eventbridge_digest_flush" {
+  statement_id  = "AllowDigestFlushFromEventBridge"
+  action        = "lambda:InvokeFunction"
+  function_name = aws_lambda_function.security_responder.function_name
+  principal     = "events.amazonaws.com"
+  source_arn    = aws_cloudwatch_event_rule.security_alert_digest_flush.arn
+}
@@ -29,3 +29,8 @@ output "security_responder_function_name" {
   description = "Name of the security responder Lambda function"
   value       = aws_lambda_function.security_responder.function_name
 }
+
+output "security_responder_state_table_name" {
+  description = "Name of the DynamoDB table holding the security responder seen-set"
+  value       = aws_dynamodb_table.security_responder_state.name
+}
@@ -1,127 +1,1153 @@
 import json
 import boto3
 import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
 
+from aws_snapshot import AwsSnapshot
+from metrics import MetricsEmitter
+
+# Seen-set configuration (GuardDuty re-emits active findings every 15 minutes)
+DEDUP_TABLE_NAME = os.environ.get('DEDUP_TABLE_NAME')
+DEDUP_TTL_SECONDS = int(os.environ.get('DEDUP_TTL_SECONDS', '3600'))
+
+# Upper bound on instances remediated in parallel
+REMEDIATION_CONCURRENCY = int(os.environ.get('REMEDIATION_CONCURRENCY', '8'))
+
+# Per-instance action order: contain before destroying evidence
+ACTION_ORDER = {'ISOLATE_INSTANCE': 0, 'TERMINATE_INSTANCE': 1}
+
+# ASG replacement for terminated instances: 'terminate' replaces after
+# termination, 'prelaunch' brings the replacement up first. Prelaunch victims
+# are isolated, deregistered and tagged, then terminated by the scheduled tick
+# once replacements are in service, or after REPLACEMENT_WAIT_SECONDS without
+# giving their slot back. Victims terminated straight away are tagged with the
+# request time so the tick can time their replacement too.
+REPLACEMENT_MODE = os.environ.get('REPLACEMENT_MODE', 'terminate')
+REPLACEMENT_WAIT_SECONDS = int(os.environ.get('REPLACEMENT_WAIT_SECONDS', '180'))
+PENDING_TERMINATION_TAG = 'SecurityResponder:PendingTermination'
+REPLACEMENT_REQUESTED_TAG = 'SecurityResponder:ReplacementRequested'
+# Terminated instances stay describable for about an hour
+REPLACEMENT_RECORD_TTL_SECONDS = 7200
+
+# Alert digest window; 0 publishes every alert immediately
+ALERT_DIGEST_WINDOW_SECONDS = int(os.environ.get('ALERT_DIGEST_WINDOW_SECONDS', '300'))
+MAX_DIGEST_ALERTS = 50
+
+# Sparse index over buffered digests, so flushing never scans the seen-set
+DIGEST_INDEX_NAME = 'digests-by-window'
+DIGEST_QUEUE = 'digest'
+# A flusher holds a due digest this long; an unpublished one is retried after
+DIGEST_LEASE_SECONDS = 120
+
+# Seen-set store, reused across warm invocations
+_state_store = None
+
+# Isolation security group ID per VPC, reused across warm invocations
+_isolation_groups = {}
+
+# Only prelaunch victims are deregistered, so the client is created on demand
+_elbv2 = None
+
+SECURITY_METRICS_NAMESPACE = 'Jenkins/Security'
+
+# Describe results shared by the reads of one invocation
+snapshot = AwsSnapshot()
+
+# Compiled RESPONSE_RULES index, built once per container
+_rule_index = None
+
+# Finding type -> response action rules. 'prefix' matches the finding type
+# (case-insensitive) up to a ':', '/', '.' or '!' boundary, e.g. 'Backdoor'
+# or 'Backdoor:EC2/C&CActivity'; 'contains' matches anywhere in it and is
+# meant for the few families that have no fixed position. Lower priority
+# wins; ties go to the longer pattern.
+RESPONSE_RULES = [
+    {'name': 'malware', 'contains': 'Malware', 'min_severity': 8.0, 'priority': 10, 'actions': ['ISOLATE_INSTANCE']},
+    {'name': 'trojan', 'prefix': 'Trojan', 'min_severity': 8.0, 'priority': 10, 'actions': ['ISOLATE_INSTANCE']},
+    {'name': 'cryptocurrency', 'prefix': 'CryptoCurrency', 'min_severity': 8.0, 'priority': 20, 'actions': ['TERMINATE_INSTANCE']},
+    {'name': 'backdoor', 'prefix': 'Backdoor', 'min_severity': 8.0, 'priority': 30, 'actions': ['ISOLATE_INSTANCE']},
+]
+
+# GuardDuty severity bands as (name, lower bound)
+SEVERITY_BANDS = [('LOW', 0.0), ('MEDIUM', 4.0), ('HIGH', 7.0), ('CRITICAL', 9.0)]
+
+FINDING_TYPE_BOUNDARY = re.compile(r'[:/.!]')
+
+class InMemoryStateStore:
+    """TTL-bounded seen-set held in the warm Lambda container"""
+
+    # Buffered alerts live only in this container
+    shared = False
+
+    def __init__(self, max_entries=10000):
+        self.max_entries = max_entries
+        self._expires_at = {}
+        self._digests = {}
+
+    def claim(self, key, ttl):
+        """Mark key as seen, returning False if it is already claimed"""
+        now = time.time()
+        if self._expires_at.get(key, 0) > now:
+            return False
+
+        if len(self._expires_at) >= self.max_entries:
+            self._expires_at = {k: v for k, v in self._expires_at.items() if v > now}
+
+        self._expires_at[key] = now + ttl
+        return True
+
+    def release(self, key):
+        """Forget key so the next delivery is processed again"""
+        self._expires_at.pop(key, None)
+
+    def buffer_alert(self, group_key, alert, window_seconds):
+        """Add an alert to its group's digest, opening a window if needed"""
+        digest = self._digests.setdefault(group_key, {
+            'window_ends': time.time() + window_seconds,
+            'alert_count': 0,
+            'alerts': []
+        })
+        digest['alert_count'] += 1
+        if len(digest['alerts']) < MAX_DIGEST_ALERTS:
+            digest['alerts'].append(alert)
+
+    def due_alerts(self):
+        """Return every digest whose window has closed, leaving it buffered"""
+        now = time.time()
+        return {k: dict(v, alerts=list(v['alerts'])) for k, v in self._digests.items() if v['window_ends'] <= now}
+
+    def ack_alert(self, group_key, digest):
+        """Drop a digest once it has been published"""
+        self._digests.pop(group_key, None)
+
+class DynamoDBStateStore:
+    """TTL-bounded seen-set shared by all concurrent Lambda containers"""
+
+    shared = True
+
+    def __init__(self, table_name, dynamodb=None):
+        self.table_name = table_name
+        self.dynamodb = dynamodb or boto3.client('dynamodb')
+
+    def claim(self, key, ttl):
+        """Atomically mark key as seen, returning False if it is already claimed"""
+        now = int(time.time())
+        try:
+            self.dynamodb.put_item(
+                TableName=self.table_name,
+                Item={
+                    'pk': {'S': key},
+                    'expires_at': {'N': str(now + ttl)}
+                },
+                ConditionExpression='attribute_not_exists(pk) OR expires_at < :now',
+                ExpressionAttributeValues={':now': {'N': str(now)}}
+            )
+            return True
+        except self.dynamodb.exceptions.ConditionalCheckFailedException:
+            return False
+
+    def release(self, key):
+        """Forget key so the next delivery is processed again"""
+        self.dynamodb.delete_item(
+            TableName=self.table_name,
+            Key={'pk': {'S': key}}
+        )
+
+    def buffer_alert(self, group_key, alert, window_seconds):
+        """Add an alert to its group's digest, opening a window if needed"""
+        now = int(time.time())
+        key = {'pk': {'S': f'digest#{group_key}'}}
+
+        try:
+            self.dynamodb.update_item(
+                TableName=self.table_name,
+                Key=key,
+                UpdateExpression=(
+                    'SET alerts = list_append(if_not_exists(alerts, :empty), :alert), '
+                    'window_ends = if_not_exists(window_ends, :window_ends), '
+                    'expires_at = if_not_exists(expires_at, :expires_at), '
+                    'digest_queue = :queue '
+                    'ADD alert_count :one'
+                ),
+                ConditionExpression='attribute_not_exists(alerts) OR size(alerts) < :max',
+                ExpressionAttributeValues={
+                    ':empty': {'L': []},
+                    ':alert': {'L': [{'S': json.dumps(alert)}]},
+                    ':window_ends': {'N': str(now + window_seconds)},
+                    ':expires_at': {'N': str(now + window_seconds + 86400)},
+                    ':one': {'N': '1'},
+                    ':max': {'N': str(MAX_DIGEST_ALERTS)},
+                    ':queue': {'S': DIGEST_QUEUE}
+                }
+            )
+        except self.dynamodb.exceptions.ConditionalCheckFailedException:
+            # Digest is full; keep counting occurrences
+            self.dynamodb.update_item(
+                TableName=self.table_name,
+                Key=key,
+                UpdateExpression='ADD alert_count :one',
+                ExpressionAttributeValues={':one': {'N': '1'}}
+            )
+
+    def due_alerts(self):
+        """Lease and return every digest whose window has closed
+
+        Due digests come from the sparse digest index rather than a table
+        scan. The lease keeps concurrent flushers from sending a digest
+        twice; the digest stays in the table until ack_alert.
+        """
+
+        now = int(time.time())
+        due = {}
+
+        paginator = self.dynamodb.get_paginator('query')
+        pages = paginator.paginate(
+            TableName=self.table_name,
+            IndexName=DIGEST_INDEX_NAME,
+            KeyConditionExpression='digest_queue = :queue AND window_ends <= :now',
+            ExpressionAttributeValues={':queue': {'S': DIGEST_QUEUE}, ':now': {'N': str(now)}}
+        )
+
+        for page in pages:
+            for item in page['Items']:
+                lease_until = now + DIGEST_LEASE_SECONDS
+                try:
+                    response = self.dynamodb.update_item(
+                        TableName=self.table_name,
+                        Key={'pk': item['pk']},
+                        UpdateExpression='SET lease_until = :lease',
+                        ConditionExpression=(
+                            'window_ends <= :now AND (attribute_not_exists(lease_until) OR lease_until < :now)'
+                        ),
+                        ExpressionAttributeValues={':now': {'N': str(now)}, ':lease': {'N': str(lease_until)}},
+                        ReturnValues='ALL_NEW'
+                    )
+                except self.dynamodb.exceptions.ConditionalCheckFailedException:
+                    continue
+
+                digest = response['Attributes']
+                due[digest['pk']['S'][len('digest#'):]] = {
+                    'window_ends': int(digest['window_ends']['N']),
+                    'alert_count': int(digest['alert_count']['N']),
+                    'alerts': [json.loads(a['S']) for a in digest.get('alerts', {}).get('L', [])],
+                    'lease_until': lease_until
+                }
+
+        return due
+
+    def ack_alert(self, group_key, digest):
+        """Remove what was published from a leased digest
+
+        Alerts buffered since the lease was taken stay behind for the next
+        flush; the digest is deleted once nothing is left.
+        """
+
+        key = {'pk': {'S': f'digest#{group_key}'}}
+        published = ', '.join(f'alerts[{i}]' for i in range(len(digest['alerts'])))
+        response = self.dynamodb.update_item(
+            TableName=self.table_name,
+            Key=key,
+            UpdateExpression=f"REMOVE lease_until{', ' + published if published else ''} ADD alert_count :published",
+            ConditionExpression='lease_until = :lease',
+            ExpressionAttributeValues={
+                ':published': {'N': str(-digest['alert_count'])},
+                ':lease': {'N': str(digest['lease_until'])}
+            },
+            ReturnValues='ALL_NEW'
+        )
+
+        if int(response['Attributes']['alert_count']['N']) <= 0:
+            try:
+                self.dynamodb.delete_item(
+                    TableName=self.table_name,
+                    Key=key,
+                    ConditionExpression='alert_count <= :zero',
+                    ExpressionAttributeValues={':zero': {'N': '0'}}
+                )
+            except self.dynamodb.exceptions.ConditionalCheckFailedException:
+                # A new alert arrived in between; it is flushed next time
+                pass
+
+def get_state_store():
+    """Return the configured seen-set store"""
+    global _state_store
+
+    if _state_store is None:
+        if DEDUP_TABLE_NAME:
+            _state_store = DynamoDBStateStore(DEDUP_TABLE_NAME)
+        else:
+            _state_store = InMemoryStateStore()
+
+    return _state_store
+
 def lambda_handler(event, context):
     """
     Automated security incident response handler
     Processes GuardDuty findings and takes appropriate actions
+
+    Accepts a single EventBridge event, an SQS batch ('Records') or a
+    direct batch ('findings'). Repeated findings and remediations are
+    collapsed through a TTL-bounded seen-set.
     """
-    
+
+    snapshot.reset()
+
     # Initialize AWS clients
     sns = boto3.client('sns')
     ec2 = boto3.client('ec2')
     autoscaling = boto3.client('autoscaling')
-    
+
     # Get environment variables
     environment = os.environ.get('ENVIRONMENT', 'dev')
     sns_topic_arn = os.environ.get('SNS_TOPIC_ARN')
-    
+
+    metrics = MetricsEmitter(SECURITY_METRICS_NAMESPACE, {'Environment': environment})
+
     try:
-        # Parse the GuardDuty finding
-        detail = event.get('detail', {})
-        finding_type = detail.get('type', 'Unknown')
-        severity = detail.get('severity', 0)
-        instance_id = None
-        
-        # Extract instance ID if available
-        if 'resource' in detail and 'instanceDetails' in detail['resource']:
-            instance_id = detail['resource']['instanceDetails'].get('instanceId')
-        
-        # Determine response based on finding type and severity
-        response_actions = []
-        
-        if severity >= 8.0:  # High/Critical severity
-            if 'Malware' in finding_type or 'Trojan' in finding_type:
-                response_actions.append('ISOLATE_INSTANCE')
-            elif 'Cryptocurrency' in finding_type:
-                response_actions.append('TERMINATE_INSTANCE')
-            elif 'Backdoor' in finding_type:
-                response_actions.append('ISOLATE_INSTANCE')
-        
-        # Execute response actions
-        for action in response_actions:
-            if action == 'ISOLATE_INSTANCE' and instance_id:
-                isolate_instance(ec2, instance_id)
-            elif action == 'TERMINATE_INSTANCE' and instance_id:
-                terminate_instance(ec2, autoscaling, instance_id, environment)
-        
-        # Send notification
-        message = create_alert_message(detail, response_actions)
-        if sns_topic_arn:
-            sns.publish(
-                TopicArn=sns_topic_arn,
-                Subject=f'Security Alert - {finding_type}',
-                Message=message
-            )
-        
-        return {
+        # Scheduled tick: publish digests whose window has closed and finish
+        # prelaunch terminations whose replacements are up
+        if event.get('action') == 'flush_alerts':
+            flushed = flush_due_alerts(sns, sns_topic_arn, get_state_store())
+            terminated = complete_prelaunch_terminations(ec2, autoscaling, metrics)
+            record_replacement_times(ec2, autoscaling, metrics, get_state_store())
+            return {
+                'statusCode': 200,
+                'body': json.dumps({'message': 'Alert digests flushed', 'digests': flushed, 'terminated': terminated})
+            }
+
+        findings, unparsed_message_ids = extract_findings(event)
+        is_batch = 'Records' in event or 'findings' in event
+
+        store = get_state_store()
+        results, failed_message_ids = process_findings(
+            findings, sns, ec2, autoscaling, environment, sns_topic_arn, store
+        )
+        failed_message_ids = unparsed_message_ids + failed_message_ids
+        record_response_metrics(metrics, results)
+
+        # A container-local buffer can't rely on the scheduled tick landing here
+        if not store.shared:
+            flush_due_alerts(sns, sns_topic_arn, store)
+
+        if not is_batch:
+            result = results[0]
+            body = {
+                'message': 'Security response completed',
+                'actions_taken': result['actions_taken'],
+                'finding_type': result['finding_type'],
+                'severity': result['severity'],
+                'duplicate': result['duplicate'],
+                'remediations': result.get('remediations', [])
+            }
+            if 'error' in result:
+                return {'statusCode': 500, 'body': json.dumps({**body, 'error': result['error']})}
+            return {'statusCode': 200, 'body': json.dumps(body)}
+
+        response = {
             'statusCode': 200,
             'body': json.dumps({
-                'message': 'Security response completed',
-                'actions_taken': response_actions,
-                'finding_type': finding_type,
-                'severity': severity
+                'message': 'Security batch response completed',
+                'received': len(findings),
+                'processed': len([r for r in results if not r['duplicate']]),
+                'duplicates': len([r for r in results if r['duplicate']]),
+                'results': results
             })
         }
-        
+
+        # Partial batch response so SQS only redelivers failed messages
+        if 'Records' in event:
+            response['batchItemFailures'] = [
+                {'itemIdentifier': message_id} for message_id in failed_message_ids
+            ]
+
+        return response
+
     except Exception as e:
         print(f"Error processing security event: {str(e)}")
-        return {
+        response = {
             'statusCode': 500,
             'body': json.dumps({'error': str(e)})
         }
+        # SQS deletes a batch that returns without failures; have all of it redelivered
+        if 'Records' in event:
+            response['batchItemFailures'] = [
+                {'itemIdentifier': record.get('messageId')} for record in event['Records']
+            ]
+        return response
+    finally:
+        metrics.flush()
+        print(f"AWS describe calls: {snapshot.report()}")
+
+def extract_findings(event):
+    """Extract (message_id, finding detail) pairs from a single or batch event
+
+    Returns the pairs and the IDs of SQS messages whose body could not be
+    parsed; those fail on their own without taking the batch with them.
+    """
+
+    if 'Records' in event:
+        findings = []
+        unparsed = []
+        for record in event['Records']:
+            try:
+                body = json.loads(record.get('body') or '{}')
+                findings.append((record.get('messageId'), body.get('detail', body)))
+            except Exception as e:
+                print(f"Unreadable message {record.get('messageId')}: {str(e)}")
+                unparsed.append(record.get('messageId'))
+        return findings, unparsed
+
+    if 'findings' in event:
+        return [(None, finding.get('detail', finding)) for finding in event['findings']], []
+
+    return [(None, event.get('detail', {}))], []
+
+def get_instance_ids(detail):
+    """Extract every affected instance ID from a finding"""
+
+    instance_ids = []
+
+    instance_id = detail.get('resource', {}).get('instanceDetails', {}).get('instanceId')
+    if instance_id:
+        instance_ids.append(instance_id)
+
+    # Security Hub (ASFF) findings list every affected resource
+    for resource in detail.get('Resources', []):
+        if resource.get('Type') == 'AwsEc2Instance':
+            instance_id = resource.get('Id', '').split('/')[-1]
+            if instance_id and instance_id not in instance_ids:
+                instance_ids.append(instance_id)
+
+    return instance_ids
+
+def get_finding_key(detail):
+    """Stable identity of a finding across GuardDuty re-emissions"""
+    finding_id = detail.get('id')
+    if finding_id:
+        return f"finding#{finding_id}"
+    return f"finding#{detail.get('type', 'Unknown')}#{','.join(get_instance_ids(detail)) or 'none'}"
 
-def isolate_instance(ec2, instance_id):
-    """Isolate instance by modifying security groups"""
+def process_findings(findings, sns, ec2, autoscaling, environment, sns_topic_arn, store):
+    """Process a batch of findings, running each remediation at most once"""
+
+    results = []
+    failed_message_ids = []
+    seen_in_batch = set()
+    planned = []
+    remediations = {}
+
+    for message_id, detail in findings:
+        finding_key = get_finding_key(detail)
+
+        # Collapse duplicates within the batch before touching the store
+        if finding_key in seen_in_batch:
+            results.append(build_result(detail, [], duplicate=True))
+            continue
+        seen_in_batch.add(finding_key)
+
+        try:
+            result = plan_finding(detail, store, remediations)
+        except Exception as e:
+            print(f"Error processing finding {finding_key}: {str(e)}")
+            release_claim(store, finding_key)
+            if message_id:
+                failed_message_ids.append(message_id)
+            result = build_result(detail, [], duplicate=False, error=str(e))
+
+        results.append(result)
+        if not result['duplicate'] and 'error' not in result:
+            planned.append((message_id, detail, result))
+
+    # Remediate every affected instance concurrently
+    outcomes = run_remediations(remediations, ec2, autoscaling, environment, store)
+
+    for message_id, detail, result in planned:
+        result['remediations'] = [
+            outcomes[instance_id] for instance_id in result['instance_ids'] if instance_id in outcomes
+        ]
+
+        # A failed remediation must not leave the finding marked as handled:
+        # release it so the redelivery (or GuardDuty's re-emission) retries
+        # the actions whose claims were released
+        failed_actions = [
+            outcome['action'] for remediation in result['remediations']
+            for outcome in remediation['actions'] if outcome['status'] == 'failed'
+        ]
+        if failed_actions:
+            release_claim(store, get_finding_key(detail))
+            if message_id:
+                failed_message_ids.append(message_id)
+            result['error'] = f"Remediation failed: {', '.join(failed_actions)}"
+
+        # Send notification
+        try:
+            dispatch_alert(detail, result, sns, sns_topic_arn, store)
+        except Exception as e:
+            print(f"Error notifying for finding {get_finding_key(detail)}: {str(e)}")
+            release_claim(store, get_finding_key(detail))
+            if message_id and message_id not in failed_message_ids:
+                failed_message_ids.append(message_id)
+            result['error'] = str(e)
+
+    return results, failed_message_ids
+
+def plan_finding(detail, store, remediations):
+    """Claim a finding and queue its remediations unless it was already handled"""
+
+    finding_key = get_finding_key(detail)
+
+    if not store.claim(finding_key, DEDUP_TTL_SECONDS):
+        print(f"Skipping duplicate finding {finding_key}")
+        return build_result(detail, [], duplicate=True)
+
+    # Determine response based on finding type and severity
+    response_actions = determine_response_actions(detail.get('type', 'Unknown'), detail.get('severity', 0))
+    vpc_id = get_vpc_id(detail)
+
+    # Queue response actions, once per instance across findings
+    for instance_id in get_instance_ids(detail):
+        for action in response_actions:
+            action_key = f"action#{action}#{instance_id}"
+            if not store.claim(action_key, DEDUP_TTL_SECONDS):
+                print(f"Skipping {action} for {instance_id}: already performed")
+                continue
+
+            plan = remediations.setdefault(instance_id, {'vpc_id': vpc_id, 'actions': []})
+            plan['actions'].append((action, action_key))
+
+    return build_result(detail, response_actions, duplicate=False)
+
+def run_remediations(remediations, ec2, autoscaling, environment, store):
+    """Remediate instances in parallel on a bounded thread pool"""
+
+    outcomes = {}
+    if not remediations:
+        return outcomes
+
+    # One batched lookup per kind instead of one per instance and thread
+    actions = {instance_id: {action for action, _ in plan['actions']} for instance_id, plan in remediations.items()}
+    terminate_ids = [i for i, names in actions.items() if 'TERMINATE_INSTANCE' in names]
+    describe_ids = [i for i, names in actions.items()
+                    if 'ISOLATE_INSTANCE' in names and not remediations[i]['vpc_id']]
     try:
-        # Create isolation security group
-        response = ec2.create_security_group(
-            GroupName=f'isolation-{instance_id}',
-            Description='Isolation security group for compromised instance'
+        if terminate_ids:
+            snapshot.describe_auto_scaling_instances(autoscaling, terminate_ids)
+        if describe_ids:
+            snapshot.describe_instances(ec2, describe_ids)
+    except Exception as e:
+        # Each remediation describes its own instance instead
+        print(f"Batched instance lookup failed: {str(e)}")
+
+    if REPLACEMENT_MODE == 'prelaunch' and terminate_ids:
+        try:
+            for instance_id, mode in reserve_replacements(autoscaling, terminate_ids).items():
+                remediations[instance_id]['replacement_mode'] = mode
+        except Exception as e:
+            # Unreserved victims are terminated and replaced afterwards
+            print(f"Failed to reserve replacements: {str(e)}")
+
+    workers = min(REMEDIATION_CONCURRENCY, len(remediations))
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            executor.submit(remediate_instance, instance_id, plan, ec2, autoscaling, environment, store): instance_id
+            for instance_id, plan in remediations.items()
+        }
+        for future in as_completed(futures):
+            outcomes[futures[future]] = future.result()
+
+    return outcomes
+
+def remediate_instance(instance_id, plan, ec2, autoscaling, environment, store):
+    """Run the queued actions for one instance in order, timing each"""
+
+    instance_start = time.monotonic()
+    outcomes = []
+    isolated = False
+
+    for action, action_key in sorted(plan['actions'], key=lambda a: ACTION_ORDER.get(a[0], len(ACTION_ORDER))):
+        start = time.monotonic()
+
+        details = {}
+
+        if action == 'ISOLATE_INSTANCE':
+            succeeded = isolated = isolate_instance(ec2, instance_id, environment, plan['vpc_id'])
+        elif action == 'TERMINATE_INSTANCE':
+            details = terminate_instance(ec2, autoscaling, instance_id, environment,
+                                         plan.get('replacement_mode', 'terminate'), plan['vpc_id'], isolated)
+            succeeded = details.pop('succeeded')
+        else:
+            print(f"Unknown action {action} for {instance_id}")
+            succeeded = False
+
+        # Allow a retry on the next delivery if the remediation failed;
+        # process_findings releases the finding itself
+        if not succeeded:
+            release_claim(store, action_key)
+
+        outcome = {
+            'action': action,
+            'status': 'succeeded' if succeeded else 'failed',
+            'duration_ms': round((time.monotonic() - start) * 1000, 1)
+        }
+        outcome.update(details)
+        outcomes.append(outcome)
+
+    return {
+        'instance_id': instance_id,
+        'actions': outcomes,
+        'duration_ms': round((time.monotonic() - instance_start) * 1000, 1)
+    }
+
+def record_response_metrics(metrics, results):
+    """Finding counts, and per-action remediation durations and failures"""
+    metrics.put('FindingsProcessed', len([r for r in results if not r['duplicate']]), 'Count')
+    metrics.put('DuplicateFindings', len([r for r in results if r['duplicate']]), 'Count')
+    metrics.put('FindingErrors', len([r for r in results if 'error' in r]), 'Count')
+
+    # Findings for the same instance share one remediation; count it once
+    remediations = {r['instance_id']: r for result in results for r in result.get('remediations', [])}
+    for remediation in remediations.values():
+        for outcome in remediation['actions']:
+            dimensions = {'Action': outcome['action']}
+            metrics.put('RemediationSeconds', outcome['duration_ms'] / 1000, 'Seconds', dimensions)
+            metrics.put('RemediationFailures', 1 if outcome['status'] == 'failed' else 0, 'Count', dimensions)
+
+def dispatch_alert(detail, result, sns, sns_topic_arn, store):
+    """Publish critical and acted-on alerts immediately and buffer the rest into digests"""
+
+    if not sns_topic_arn:
+        return
+
+    # Anything we acted on is reported straight away, whatever its band
+    critical_band = len(SEVERITY_BANDS) - 1
+    if (ALERT_DIGEST_WINDOW_SECONDS <= 0 or result['actions_taken']
+            or get_severity_band(result['severity']) == critical_band):
+        sns.publish(
+            TopicArn=sns_topic_arn,
+            Subject=f"Security Alert - {result['finding_type']}",
+            Message=create_alert_message(detail, result['actions_taken'])
         )
-        isolation_sg_id = response['GroupId']
-        
+        return
+
+    alert = {
+        'finding_id': result['finding_id'],
+        'finding_type': result['finding_type'],
+        'severity': result['severity'],
+        'instance_ids': result['instance_ids'],
+        'actions': result['actions_taken'],
+        'description': detail.get('description', 'No description available'),
+        'region': detail.get('region', 'N/A'),
+        'timestamp': datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S UTC')
+    }
+    store.buffer_alert(get_alert_group_key(result), alert, ALERT_DIGEST_WINDOW_SECONDS)
+
+def get_alert_group_key(result):
+    """Digest grouping: finding type, severity band and affected instances"""
+    band_name = SEVERITY_BANDS[get_severity_band(result['severity'])][0]
+    instances = ','.join(sorted(result['instance_ids'])) or 'none'
+    return f"{result['finding_type']}|{band_name}|{instances}"
+
+def flush_due_alerts(sns, sns_topic_arn, store):
+    """Publish one digest per group whose window has closed"""
+
+    flushed = 0
+    for group_key, digest in store.due_alerts().items():
+        finding_type = group_key.split('|')[0]
+        try:
+            sns.publish(
+                TopicArn=sns_topic_arn,
+                Subject=f"Security Alert Digest - {finding_type} ({digest['alert_count']})"[:100],
+                Message=create_digest_message(group_key, digest)
+            )
+        except Exception as e:
+            # Still buffered; the next flush retries it
+            print(f"Failed to publish digest {group_key}: {str(e)}")
+            continue
+
+        flushed += 1
+        try:
+            store.ack_alert(group_key, digest)
+        except Exception as e:
+            print(f"Failed to remove published digest {group_key}, it may be sent again: {str(e)}")
+
+    return flushed
+
+def release_claim(store, key):
+    """Release a seen-set claim, logging rather than raising on failure"""
+    try:
+        store.release(key)
+    except Exception as e:
+        print(f"Failed to release {key}: {str(e)}")
+
+def build_result(detail, actions, duplicate, error=None):
+    """Build the per-finding result entry"""
+    result = {
+        'finding_id': detail.get('id'),
+        'finding_type': detail.get('type', 'Unknown'),
+        'severity': detail.get('severity', 0),
+        'instance_ids': get_instance_ids(detail),
+        'actions_taken': actions,
+        'duplicate': duplicate
+    }
+    if error:
+        result['error'] = error
+    return result
+
+def get_severity_band(severity):
+    """Return the index of the severity band containing severity"""
+    band = 0
+    for index, (_, lower_bound) in enumerate(SEVERITY_BANDS):
+        if severity >= lower_bound:
+            band = index
+    return band
+
+def compile_rules(rules):
+    """Compile a rules table into a {(prefix, band): [rules]} index
+
+    'contains' rules are filed under a None prefix and checked by substring.
+    """
+
+    index = {}
+    for rule in rules:
+        if 'contains' in rule:
+            prefix = None
+            pattern = rule['contains'].lower()
+        else:
+            prefix = pattern = rule['prefix'].lower().rstrip(':/.!')
+        compiled = {
+            'name': rule['name'],
+            'min_severity': rule.get('min_severity', 0.0),
+            'priority': rule.get('priority', 100),
+            'specificity': len(pattern),
+            'actions': list(rule['actions'])
+        }
+        if prefix is None:
+            compiled['contains'] = pattern
+
+        # File the rule under every band it can fire in
+        first_band = get_severity_band(compiled['min_severity'])
+        for band in range(first_band, len(SEVERITY_BANDS)):
+            index.setdefault((prefix, band), []).append(compiled)
+
+    for bucket in index.values():
+        bucket.sort(key=lambda rule: (rule['priority'], -rule['specificity']))
+
+    return index
+
+def get_rule_index():
+    """Return the compiled RESPONSE_RULES index"""
+    global _rule_index
+
+    if _rule_index is None:
+        _rule_index = compile_rules(RESPONSE_RULES)
+
+    return _rule_index
+
+def get_type_prefixes(finding_type):
+    """Return every boundary-delimited prefix of a finding type"""
+    finding_type = finding_type.lower()
+    prefixes = [finding_type[:match.start()] for match in FINDING_TYPE_BOUNDARY.finditer(finding_type)]
+    prefixes.append(finding_type)
+    return prefixes
+
+def match_rule(finding_type, severity, index=None):
+    """Return the winning rule for a finding, or None"""
+
+    if index is None:
+        index = get_rule_index()
+
+    band = get_severity_band(severity)
+    best = None
+    lowered = finding_type.lower()
+
+    # One lookup per type segment, independent of the number of prefix rules,
+    # plus the substring rules (None)
+    for prefix in get_type_prefixes(finding_type) + [None]:
+        for rule in index.get((prefix, band), ()):
+            if severity < rule['min_severity']:
+                continue
+            if prefix is None and rule['contains'] not in lowered:
+                continue
+            if best is None or (rule['priority'], -rule['specificity']) < (best['priority'], -best['specificity']):
+                best = rule
+            break
+
+    return best
+
+def determine_response_actions(finding_type, severity):
+    """Map a finding type and severity to response actions"""
+    rule = match_rule(finding_type, severity)
+    return list(rule['actions']) if rule else []
+
+def get_vpc_id(detail):
+    """Extract the affected instance's VPC ID from a finding, if any"""
+    interfaces = detail.get('resource', {}).get('instanceDetails', {}).get('networkInterfaces', [])
+    for interface in interfaces:
+        if interface.get('vpcId'):
+            return interface['vpcId']
+    return None
+
+def get_isolation_group(ec2, vpc_id, environment):
+    """Look up or lazily create the shared isolation security group for a VPC
+
+    Egress is checked on every use, not only at creation: a group that kept
+    egress rules (a failed revoke, a manual edit) must never isolate anything.
+    """
+
+    group_name = f'{environment}-jenkins-isolation'
+    group = None
+
+    group_id = _isolation_groups.get(vpc_id)
+    if group_id:
+        try:
+            # Described once per invocation however many instances it isolates
+            groups = snapshot.describe(ec2, 'describe_security_groups', GroupIds=[group_id])['SecurityGroups']
+            group = groups[0] if groups else None
+        except ec2.exceptions.ClientError as e:
+            if e.response.get('Error', {}).get('Code') != 'InvalidGroup.NotFound':
+                raise
+        if group is None:
+            _isolation_groups.pop(vpc_id, None)
+
+    if group is None:
+        group = find_isolation_group(ec2, vpc_id, group_name)
+
+    if group is None:
+        try:
+            group_id = ec2.create_security_group(
+                GroupName=group_name,
+                Description='Isolation security group for compromised instances',
+                VpcId=vpc_id,
+                TagSpecifications=[{
+                    'ResourceType': 'security-group',
+                    'Tags': [
+                        {'Key': 'Name', 'Value': group_name},
+                        {'Key': 'Environment', 'Value': environment},
+                        {'Key': 'Purpose', 'Value': 'incident-isolation'}
+                    ]
+                }]
+            )['GroupId']
+        except ec2.exceptions.ClientError as e:
+            # Another container created the group concurrently
+            if e.response.get('Error', {}).get('Code') != 'InvalidGroup.Duplicate':
+                raise
+            group = find_isolation_group(ec2, vpc_id, group_name)
+        else:
+            # New groups allow all egress by default; isolation allows nothing
+            try:
+                ec2.revoke_security_group_egress(
+                    GroupId=group_id,
+                    IpPermissions=[{'IpProtocol': '-1', 'IpRanges': [{'CidrIp': '0.0.0.0/0'}]}]
+                )
+            except Exception:
+                # Never leave an open group behind under the isolation name
+                try:
+                    ec2.delete_security_group(GroupId=group_id)
+                except Exception as e:
+                    print(f"Failed to delete unrevoked isolation group {group_id}: {str(e)}")
+                raise
+            group = {'GroupId': group_id, 'IpPermissionsEgress': []}
+
+    revoke_egress(ec2, group)
+    _isolation_groups[vpc_id] = group['GroupId']
+    return group['GroupId']
+
+def find_isolation_group(ec2, vpc_id, group_name):
+    """The VPC's isolation group by name, or None"""
+    response = ec2.describe_security_groups(
+        Filters=[
+            {'Name': 'vpc-id', 'Values': [vpc_id]},
+            {'Name': 'group-name', 'Values': [group_name]}
+        ]
+    )
+    return response['SecurityGroups'][0] if response['SecurityGroups'] else None
+
+def revoke_egress(ec2, group):
+    """Revoke whatever egress rules an isolation group has; raises if that fails"""
+    rules = group.get('IpPermissionsEgress', [])
+    if not rules:
+        return
+
+    print(f"Revoking {len(rules)} egress rule(s) on isolation group {group['GroupId']}")
+    ec2.revoke_security_group_egress(GroupId=group['GroupId'], IpPermissions=rules)
+    snapshot.invalidate(ec2)
+
+def isolate_instance(ec2, instance_id, environment, vpc_id=None):
+    """Isolate instance by moving it into the VPC's isolation security group"""
+    try:
+        # Findings usually carry the VPC; only describe the instance if not
+        if not vpc_id:
+            vpc_id = snapshot.describe_instances(ec2, [instance_id])[0]['VpcId']
+
+        isolation_sg_id = get_isolation_group(ec2, vpc_id, environment)
+
         # Modify instance security groups
         ec2.modify_instance_attribute(
             InstanceId=instance_id,
             Groups=[isolation_sg_id]
         )
-        
+
         print(f"Instance {instance_id} isolated with security group {isolation_sg_id}")
-        
+        return True
+
     except Exception as e:
         print(f"Failed to isolate instance {instance_id}: {str(e)}")
+        # Drop the cached group in case it was deleted out from under us
+        _isolation_groups.pop(vpc_id, None)
+        return False
 
-def terminate_instance(ec2, autoscaling, instance_id, environment):
-    """Terminate instance and trigger ASG replacement"""
-    try:
-        # Get ASG name from instance tags
-        response = ec2.describe_instances(InstanceIds=[instance_id])
-        tags = response['Reservations'][0]['Instances'][0].get('Tags', [])
-        
-        asg_name = None
-        for tag in tags:
-            if tag['Key'] == 'aws:autoscaling:groupName':
-                asg_name = tag['Value']
-                break
-        
-        # Terminate instance
-        ec2.terminate_instances(InstanceIds=[instance_id])
-        
-        # If part of ASG, trigger replacement
-        if asg_name:
+def reserve_replacements(autoscaling, instance_ids):
+    """Raise each ASG's desired capacity once for all of its victims
+
+    Returns instance ID -> replacement mode. Victims beyond an ASG's
+    headroom below MaxSize, or in a group whose capacity could not be
+    raised, fall back to 'terminate'.
+    """
+
+    victims = {}
+    for instance in snapshot.describe_auto_scaling_instances(autoscaling, instance_ids)['AutoScalingInstances']:
+        victims.setdefault(instance['AutoScalingGroupName'], []).append(instance['InstanceId'])
+
+    modes = {}
+    for asg_name, ids in victims.items():
+        modes.update({instance_id: 'terminate' for instance_id in ids})
+        try:
+            # Read live: capacity may have changed since the snapshot was taken
+            asg = autoscaling.describe_auto_scaling_groups(AutoScalingGroupNames=[asg_name])['AutoScalingGroups'][0]
+            reserved = min(len(ids), asg['MaxSize'] - asg['DesiredCapacity'])
+            if reserved <= 0:
+                continue
             autoscaling.set_desired_capacity(
                 AutoScalingGroupName=asg_name,
-                DesiredCapacity=1,
+                DesiredCapacity=asg['DesiredCapacity'] + reserved,
                 HonorCooldown=False
             )
-        
-        print(f"Instance {instance_id} terminated, ASG {asg_name} will replace it")
-        
+            modes.update({instance_id: 'prelaunch' for instance_id in ids[:reserved]})
+        except Exception as e:
+            print(f"Failed to reserve replacements in {asg_name}: {str(e)}")
+
+    snapshot.invalidate(autoscaling)
+    return modes
+
+def get_elbv2():
+    """Return the ELBv2 client, reused across warm invocations"""
+    global _elbv2
+
+    if _elbv2 is None:
+        _elbv2 = boto3.client('elbv2')
+
+    return _elbv2
+
+def deregister_instance(autoscaling, instance_id, asg_name):
+    """Take an instance out of its ASG's target groups"""
+    group = snapshot.describe_auto_scaling_groups(autoscaling, [asg_name])['AutoScalingGroups'][0]
+    elbv2 = get_elbv2()
+    for target_group_arn in group.get('TargetGroupARNs', []):
+        elbv2.deregister_targets(TargetGroupArn=target_group_arn, Targets=[{'Id': instance_id}])
+    print(f"Instance {instance_id} deregistered from {len(group.get('TargetGroupARNs', []))} target group(s)")
+
+def defer_termination(ec2, autoscaling, instance_id, asg_name, environment, vpc_id, isolated):
+    """Contain a prelaunch victim and tag it for the scheduled tick to terminate"""
+    if not isolated and not isolate_instance(ec2, instance_id, environment, vpc_id):
+        raise RuntimeError('isolation failed')
+    try:
+        deregister_instance(autoscaling, instance_id, asg_name)
+    except Exception as e:
+        # The isolation group already blocks the load balancer's traffic
+        print(f"Failed to deregister {instance_id}: {str(e)}")
+    ec2.create_tags(
+        Resources=[instance_id],
+        Tags=[{'Key': PENDING_TERMINATION_TAG, 'Value': str(int(time.time()))}]
+    )
+
+def terminate_instance(ec2, autoscaling, instance_id, environment, mode='terminate', vpc_id=None, isolated=False):
+    """Terminate instance, leaving its replacement to its ASG
+
+    In 'prelaunch' mode a replacement slot was already reserved; the
+    instance is isolated, deregistered and tagged for the scheduled tick
+    to terminate once the replacement is in service. Nothing here waits
+    on the ASG.
+    """
+    try:
+        # One call tells us whether the instance belongs to an ASG
+        response = snapshot.describe_auto_scaling_instances(autoscaling, [instance_id])
+        asg_name = None
+        if response['AutoScalingInstances']:
+            asg_name = response['AutoScalingInstances'][0]['AutoScalingGroupName']
+
+        if not asg_name:
+            ec2.terminate_instances(InstanceIds=[instance_id])
+            print(f"Instance {instance_id} terminated (not in an ASG)")
+            return {'succeeded': True, 'asg': None}
+
+        if mode == 'prelaunch':
+            try:
+                defer_termination(ec2, autoscaling, instance_id, asg_name, environment, vpc_id, isolated)
+                print(f"Instance {instance_id} in {asg_name} will be terminated once its replacement is in service")
+                return {'succeeded': True, 'asg': asg_name, 'replacement_mode': mode, 'termination': 'pending'}
+            except Exception as e:
+                # Give the reserved slot straight back rather than leave the victim running
+                print(f"Failed to defer termination of {instance_id}: {str(e)}")
+                autoscaling.terminate_instance_in_auto_scaling_group(
+                    InstanceId=instance_id,
+                    ShouldDecrementDesiredCapacity=True
+                )
+        else:
+            try:
+                ec2.create_tags(
+                    Resources=[instance_id],
+                    Tags=[{'Key': REPLACEMENT_REQUESTED_TAG, 'Value': str(int(time.time()))}]
+                )
+            except Exception as e:
+                print(f"Failed to tag {instance_id} for replacement timing: {str(e)}")
+            # ASG launches a replacement straight away at the same desired capacity
+            autoscaling.terminate_instance_in_auto_scaling_group(
+                InstanceId=instance_id,
+                ShouldDecrementDesiredCapacity=False
+            )
+
+        print(f"Instance {instance_id} terminated via ASG {asg_name} ({mode})")
+        return {'succeeded': True, 'asg': asg_name, 'replacement_mode': mode, 'termination': 'done'}
+
     except Exception as e:
         print(f"Failed to terminate instance {instance_id}: {str(e)}")
+        return {'succeeded': False, 'error': str(e)}
+
+def complete_prelaunch_terminations(ec2, autoscaling, metrics):
+    """Terminate tagged prelaunch victims whose replacements are in service
+
+    A victim is terminated, giving its reserved slot back, only while the
+    group's in-service count stays at its level before the incident. After
+    REPLACEMENT_WAIT_SECONDS without a replacement it is terminated without
+    the decrement, so the ASG still replaces it. Returns the number of
+    instances terminated.
+    """
+
+    pages = ec2.get_paginator('describe_instances').paginate(Filters=[
+        {'Name': 'tag-key', 'Values': [PENDING_TERMINATION_TAG]},
+        {'Name': 'instance-state-name', 'Values': ['pending', 'running', 'stopping', 'stopped']}
+    ])
+
+    pending = {}
+    for page in pages:
+        for reservation in page['Reservations']:
+            for instance in reservation['Instances']:
+                tags = {tag['Key']: tag['Value'] for tag in instance.get('Tags', [])}
+                pending.setdefault(tags.get('aws:autoscaling:groupName'), []).append(
+                    (instance['InstanceId'], float(tags[PENDING_TERMINATION_TAG]))
+                )
+    if not pending:
+        return 0
+
+    groups = {
+        group['AutoScalingGroupName']: group
+        for group in autoscaling.describe_auto_scaling_groups(
+            AutoScalingGroupNames=[name for name in pending if name]
+        )['AutoScalingGroups']
+    } if any(pending) else {}
+
+    now = time.time()
+    terminated = 0
+    for asg_name, victims in pending.items():
+        group = groups.get(asg_name)
+        members = {instance['InstanceId'] for instance in group['Instances']} if group else set()
+
+        # No longer in the group: nothing to replace
+        detached = [instance_id for instance_id, _ in victims if instance_id not in members]
+        if detached:
+            ec2.terminate_instances(InstanceIds=detached)
+            terminated += len(detached)
+
+        victims = sorted((v for v in victims if v[0] in members), key=lambda v: v[1])
+        if not victims:
+            continue
+
+        victim_ids = {instance_id for instance_id, _ in victims}
+        healthy = [
+            instance for instance in group['Instances']
+            if instance['InstanceId'] not in victim_ids
+            and instance['LifecycleState'] == 'InService' and instance['HealthStatus'] == 'Healthy'
+        ]
+        # Desired capacity holds one reserved slot per victim on top of the
+        # pre-incident capacity, which the victims themselves were part of
+        ready = len(healthy) + 2 * len(victims) - group['DesiredCapacity']
+
+        for index, (instance_id, tagged_at) in enumerate(victims):
+            replaced = index < ready
+            if not replaced and now < tagged_at + REPLACEMENT_WAIT_SECONDS:
+                continue
+            try:
+                autoscaling.terminate_instance_in_auto_scaling_group(
+                    InstanceId=instance_id,
+                    ShouldDecrementDesiredCapacity=replaced
+                )
+            except Exception as e:
+                print(f"Failed to terminate prelaunch victim {instance_id}: {str(e)}")
+                continue
+
+            terminated += 1
+            if replaced:
+                metrics.put('TimeToReplacementSeconds', round(now - tagged_at, 1), 'Seconds',
+                            {'Action': 'TERMINATE_INSTANCE'})
+                print(f"Instance {instance_id} terminated via ASG {asg_name} after its replacement came up")
+            else:
+                print(f"No replacement for {instance_id} in {asg_name} after {REPLACEMENT_WAIT_SECONDS}s; "
+                      f"terminated without releasing its slot")
+
+    return terminated
+
+def record_replacement_times(ec2, autoscaling, metrics, store):
+    """Time replacements of victims terminated without waiting for one
+
+    A victim counts as replaced by the first healthy in-service instance
+    of its group launched after it was tagged; each victim is reported
+    once. Returns the number of replacements recorded.
+    """
+
+    pages = ec2.get_paginator('describe_instances').paginate(Filters=[
+        {'Name': 'tag-key', 'Values': [REPLACEMENT_REQUESTED_TAG]},
+        {'Name': 'instance-state-name', 'Values': ['shutting-down', 'terminated']}
+    ])
+
+    victims = {}
+    for page in pages:
+        for reservation in page['Reservations']:
+            for instance in reservation['Instances']:
+                tags = {tag['Key']: tag['Value'] for tag in instance.get('Tags', [])}
+                if tags.get('aws:autoscaling:groupName'):
+                    victims.setdefault(tags['aws:autoscaling:groupName'], []).append(
+                        (instance['InstanceId'], float(tags[REPLACEMENT_REQUESTED_TAG]))
+                    )
+    if not victims:
+        return 0
+
+    now = time.time()
+    recorded = 0
+    for group in autoscaling.describe_auto_scaling_groups(AutoScalingGroupNames=list(victims))['AutoScalingGroups']:
+        in_service = [
+            instance['InstanceId'] for instance in group['Instances']
+            if instance['LifecycleState'] == 'InService' and instance['HealthStatus'] == 'Healthy'
+        ]
+        launched = sorted(
+            instance['LaunchTime'].timestamp() for instance in snapshot.describe_instances(ec2, in_service)
+        ) if in_service else []
+
+        for instance_id, requested_at in sorted(victims[group['AutoScalingGroupName']], key=lambda v: v[1]):
+            replacement = next((launched_at for launched_at in launched if launched_at >= requested_at), None)
+            if replacement is None:
+                continue
+            # Matched victims keep their replacement on every tick
+            launched.remove(replacement)
+            if not store.claim(f"replacement:{instance_id}", REPLACEMENT_RECORD_TTL_SECONDS):
+                continue
+            metrics.put('TimeToReplacementSeconds', round(now - requested_at, 1), 'Seconds',
+                        {'Action': 'TERMINATE_INSTANCE'})
+            recorded += 1
+
+    return recorded
 
 def create_alert_message(detail, actions):
     """Create formatted alert message"""
@@ -136,7 +1162,7 @@ Severity: {detail.get('severity', 'Unknown')}
 Description: {detail.get('description', 'No description available')}
 
 Resource Details:
-- Instance ID: {detail.get('resource', {}).get('instanceDetails', {}).get('instanceId', 'N/A')}
+- Instance ID: {', '.join(get_instance_ids(detail)) or 'N/A'}
 - Region: {detail.get('region', 'N/A')}
 
 Actions Taken:
@@ -146,3 +1172,37 @@ Please review the Security Hub console for full details.
 """
     
     return message
+
+def create_digest_message(group_key, digest):
+    """Create formatted digest message for a group of buffered alerts"""
+    finding_type, band_name, instances = group_key.split('|')
+    alerts = digest['alerts']
+
+    lines = [
+        f"- {a['timestamp']} {a['finding_id'] or 'N/A'} (severity {a['severity']}): "
+        f"{', '.join(a['actions']) if a['actions'] else 'no automated actions'}"
+        for a in alerts
+    ]
+    omitted = digest['alert_count'] - len(alerts)
+    if omitted > 0:
+        lines.append(f"- ... and {omitted} more")
+
+    message = f"""
+SECURITY ALERT DIGEST - Jenkins Enterprise Platform
+
+Finding Type: {finding_type}
+Severity Band: {band_name}
+Occurrences: {digest['alert_count']}
+Description: {alerts[0]['description'] if alerts else 'No description available'}
+
+Resource Details:
+- Instance ID: {instances.replace(',', ', ') if instances != 'none' else 'N/A'}
+- Region: {alerts[0]['region'] if alerts else 'N/A'}
+
+Findings:
+{chr(10).join(lines)}
+
+Please review the Security Hub console for full details.
+"""
+
+    return message
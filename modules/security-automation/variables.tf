@@ -16,6 +16,46 @@ variable "alert_email" {
   default     = ""
 }
 
+variable "dedup_ttl_seconds" {
+  description = "How long a handled finding or remediation is suppressed before it is processed again"
+  type        = number
+  default     = 3600
+}
+
+variable "alert_digest_window_seconds" {
+  description = "Window for coalescing non-critical security alerts into digests (0 disables)"
+  type        = number
+  default     = 300
+}
+
+variable "replacement_mode" {
+  description = "How terminated ASG instances are replaced: terminate (replace after termination) or prelaunch (isolate and deregister the victim, replace it, then terminate it)"
+  type        = string
+  default     = "terminate"
+
+  validation {
+    condition     = contains(["terminate", "prelaunch"], var.replacement_mode)
+    error_message = "replacement_mode must be terminate or prelaunch."
+  }
+}
+
+variable "replacement_wait_seconds" {
+  description = "prelaunch mode: how long a victim waits for its replacement to reach InService before it is terminated without releasing its reserved slot"
+  type        = number
+  default     = 180
+}
+
+variable "metrics_mode" {
+  description = "How Lambda metrics are published: api (batched PutMetricData) or emf (Embedded Metric Format log lines, no API calls)"
+  type        = string
+  default     = "emf"
+
+  validation {
+    condition     = contains(["api", "emf"], var.metrics_mode)
+    error_message = "metrics_mode must be api or emf."
+  }
+}
+
 variable "common_tags" {
   description = "Common tags to apply to all resources"
   type        = map(string)
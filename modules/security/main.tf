@@ -54,6 +54,32 @@ resource "aws_security_group" "alb" {
   }
 }
 
+# Health Prober Security Group (Lambda functions that probe Jenkins directly)
+resource "aws_security_group" "health_prober" {
+  name_prefix = "${var.environment}-${replace(lower(var.project_name), " ", "-")}-health-prober-sg"
+  vpc_id      = var.vpc_id
+
+  description = "Security group for Lambda functions probing Jenkins instances"
+
+  # All outbound traffic
+  egress {
+    description = "All outbound traffic"
+    from_port   = 0
+    to_port     = 0
+    protocol    = "-1"
+    cidr_blocks = ["0.0.0.0/0"]
+  }
+
+  tags = merge(var.tags, {
+    Name = "${var.environment}-${replace(lower(var.project_name), " ", "-")}-health-prober-sg"
+    Type = "Health Prober Security Group"
+  })
+
+  lifecycle {
+    create_before_destroy = true
+  }
+}
+
 # Jenkins Security Group
 resource "aws_security_group" "jenkins" {
   name_prefix = "${var.environment}-${replace(lower(var.project_name), " ", "-")}-jenkins-sg"
@@ -70,6 +96,15 @@ resource "aws_security_group" "jenkins" {
     security_groups = [aws_security_group.alb.id]
   }
 
+  # Jenkins port from the deployment health prober
+  ingress {
+    description     = "Jenkins from health prober"
+    from_port       = 8080
+    to_port         = 8080
+    protocol        = "tcp"
+    security_groups = [aws_security_group.health_prober.id]
+  }
+
   # SSH access from VPC
   ingress {
     description = "SSH from VPC"
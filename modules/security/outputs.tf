@@ -11,6 +11,11 @@ output "jenkins_security_group_id" {
   value       = aws_security_group.jenkins.id
 }
 
+output "health_prober_security_group_id" {
+  description = "ID of the health prober security group"
+  value       = aws_security_group.health_prober.id
+}
+
 output "efs_security_group_id" {
   description = "ID of the EFS security group"
   value       = aws_security_group.efs.id
@@ -26,6 +31,7 @@ output "security_group_ids" {
   value = {
     alb     = aws_security_group.alb.id
     jenkins = aws_security_group.jenkins.id
+    prober  = aws_security_group.health_prober.id
     efs     = aws_security_group.efs.id
     rds     = aws_security_group.rds.id
   }
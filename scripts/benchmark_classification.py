@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""Benchmark GuardDuty finding classification in the security responder
+
+Times rule matching over synthetic findings as the rules table grows:
+
+    python3 scripts/benchmark_classification.py
+"""
+
+import os
+import random
+import sys
+import time
+
+MODULES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'modules')
+sys.path[:0] = [os.path.join(MODULES_DIR, 'security-automation'), os.path.join(MODULES_DIR, 'lambda-common')]
+
+import security_responder  # noqa: E402
+
+def benchmark_classification(findings=100000, extra_rules=(0, 100, 1000), seed=42):
+    """Time rule matching over synthetic findings as the rules table grows"""
+
+    rng = random.Random(seed)
+    purposes = ['Backdoor', 'Trojan', 'CryptoCurrency', 'Execution', 'Recon', 'UnauthorizedAccess', 'Impact']
+    families = ['C&CActivity', 'BlackholeTraffic', 'BitcoinTool', 'MaliciousFile', 'PortProbeUnprotectedPort', 'TorClient']
+    synthetic = [
+        (f"{rng.choice(purposes)}:EC2/{rng.choice(families)}.{rng.choice('ABC')}!DNS", round(rng.uniform(1.0, 10.0), 1))
+        for _ in range(findings)
+    ]
+
+    results = {}
+    for extra in extra_rules:
+        rules = security_responder.RESPONSE_RULES + [
+            {'name': f'synthetic-{i}', 'prefix': f'Synthetic{i}:EC2/Family{i}', 'min_severity': 5.0, 'priority': 50, 'actions': ['NOTIFY']}
+            for i in range(extra)
+        ]
+        index = security_responder.compile_rules(rules)
+
+        start = time.perf_counter()
+        matched = 0
+        for finding_type, severity in synthetic:
+            if security_responder.match_rule(finding_type, severity, index):
+                matched += 1
+        elapsed = time.perf_counter() - start
+
+        results[len(rules)] = {
+            'seconds': round(elapsed, 4),
+            'ns_per_finding': round(elapsed / findings * 1e9),
+            'matched': matched
+        }
+        print(f"{len(rules)} rules: {findings} findings in {elapsed:.3f}s ({elapsed / findings * 1e9:.0f} ns/finding, {matched} matched)")
+
+    return results
+
+if __name__ == '__main__':
+    benchmark_classification()
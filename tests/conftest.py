@@ -0,0 +1,25 @@
+"""
+Test setup for the Lambda sources
+Each function is packaged flat with the lambda-common modules, so the module
+directories go on sys.path; handlers read their configuration at import.
+"""
+
+import os
+import sys
+
+MODULES = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'modules')
+
+for directory in ['lambda-common', 'security-automation', 'cost-optimization', 'blue-green-deployment']:
+    sys.path.insert(0, os.path.join(MODULES, directory))
+
+os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+os.environ.setdefault('ENVIRONMENT', 'test')
+os.environ.setdefault('ASG_NAME', 'test-workers')
+os.environ.setdefault('SNS_TOPIC', 'arn:aws:sns:us-east-1:000000000000:test')
+os.environ.setdefault('SNS_TOPIC_ARN', 'arn:aws:sns:us-east-1:000000000000:test')
+os.environ.setdefault('S3_BUCKET', 'test-bucket')
+os.environ.setdefault('BLUE_ASG_NAME', 'test-blue')
+os.environ.setdefault('GREEN_ASG_NAME', 'test-green')
+os.environ.setdefault('INSTANCE_TYPES', '["t3.small", "t3.medium", "t3.large"]')
+os.environ.setdefault('TARGET_GROUP_ARN', 'arn:aws:elasticloadbalancing:us-east-1:000000000000:targetgroup/test/1')
+os.environ.setdefault('LOG_GROUP_NAME', '/test/deployment')
@@ -0,0 +1,108 @@
+import time
+from unittest.mock import MagicMock
+
+import pytest
+
+import deployment_orchestrator
+
+@pytest.fixture
+def aws(monkeypatch):
+    autoscaling = MagicMock()
+    autoscaling.describe_auto_scaling_groups.return_value = {'AutoScalingGroups': [{
+        'AutoScalingGroupName': 'jenkins-blue',
+        'Instances': [{'InstanceId': 'i-blue', 'LifecycleState': 'Standby'}]
+    }]}
+    elbv2 = MagicMock()
+    elbv2.describe_target_health.return_value = {'TargetHealthDescriptions': []}
+    ssm = MagicMock()
+    ssm.send_command.return_value = {'Command': {'CommandId': 'command-1'}}
+    store = deployment_orchestrator.InMemorySwitchStore()
+
+    monkeypatch.setattr(deployment_orchestrator, 'autoscaling', autoscaling)
+    monkeypatch.setattr(deployment_orchestrator, 'ssm', ssm)
+    monkeypatch.setattr(deployment_orchestrator, 'elbv2', elbv2)
+    monkeypatch.setattr(deployment_orchestrator, 'sns', MagicMock())
+    monkeypatch.setattr(deployment_orchestrator, '_switch_store', store)
+    monkeypatch.setattr(deployment_orchestrator, '_log_writer', MagicMock())
+    deployment_orchestrator.snapshot.reset()
+
+    now = time.time()
+    store.save({
+        'switch_id': 'blue-to-green-1', 'status': 'completed', 'from': 'blue', 'to': 'green',
+        'old_asg_name': 'jenkins-blue', 'new_asg_name': 'jenkins-green',
+        'step': 'drain', 'step_started_at': now, 'attempt': 0, 'next_check_at': 0,
+        'started_at': now, 'steps': [], 'version': 0,
+        'standby': {'mode': 'warm', 'color': 'blue', 'asg_name': 'jenkins-blue',
+                    'instance_ids': ['i-blue'], 'until': now + 3600}
+    })
+    return {'autoscaling': autoscaling, 'elbv2': elbv2, 'ssm': ssm, 'store': store}
+
+def scaled_down(autoscaling, asg_name):
+    return any(
+        call.kwargs.get('AutoScalingGroupName') == asg_name and call.kwargs.get('DesiredCapacity') == 0
+        for call in autoscaling.update_auto_scaling_group.call_args_list
+    )
+
+def serve(aws):
+    aws['autoscaling'].describe_auto_scaling_groups.return_value = {'AutoScalingGroups': [{
+        'AutoScalingGroupName': 'jenkins-blue',
+        'Instances': [{'InstanceId': 'i-blue', 'LifecycleState': 'InService'}]
+    }]}
+    aws['elbv2'].describe_target_health.return_value = {'TargetHealthDescriptions': [
+        {'Target': {'Id': 'i-blue'}, 'TargetHealth': {'State': 'healthy'}}
+    ]}
+    deployment_orchestrator.snapshot.reset()
+
+def test_standby_rollback_waits_on_ticks_not_in_the_invocation(aws, monkeypatch):
+    monkeypatch.setattr(deployment_orchestrator.time, 'sleep', lambda seconds: pytest.fail('slept'))
+
+    response = deployment_orchestrator.rollback_to_standby('tg-blue', 'topic', 'manual rollback')
+
+    assert response['statusCode'] == 202
+    aws['autoscaling'].exit_standby.assert_called_once_with(AutoScalingGroupName='jenkins-blue', InstanceIds=['i-blue'])
+    assert not scaled_down(aws['autoscaling'], 'jenkins-green')
+    assert aws['store'].load()['step'] == 'restore_standby'
+
+    serve(aws)
+    deployment_orchestrator.resume_deployment_switch('tg-blue', 'topic', force=True)
+
+    state = aws['store'].load()
+    assert state['status'] == 'rolled_back'
+    assert state['standby']['released_at']
+    assert scaled_down(aws['autoscaling'], 'jenkins-green')
+    aws['autoscaling'].exit_standby.assert_called_once()
+
+def test_standby_rollback_goes_ahead_when_restore_times_out(aws):
+    deployment_orchestrator.rollback_to_standby('tg-blue', 'topic', 'manual rollback')
+    state = aws['store'].load()
+    state['standby']['restore_started_at'] -= deployment_orchestrator.STANDBY_RESTORE_TIMEOUT_SECONDS + 1
+    aws['store'].save(state)
+
+    deployment_orchestrator.resume_deployment_switch('tg-blue', 'topic', force=True)
+
+    assert aws['store'].load()['status'] == 'rolled_back'
+    assert scaled_down(aws['autoscaling'], 'jenkins-green')
+
+def test_warm_standby_releases_the_shared_jenkins_home(aws):
+    aws['autoscaling'].describe_auto_scaling_groups.return_value = {'AutoScalingGroups': [{
+        'AutoScalingGroupName': 'jenkins-blue',
+        'Instances': [{'InstanceId': 'i-blue', 'LifecycleState': 'InService'}]
+    }]}
+
+    standby = deployment_orchestrator.enter_standby('blue', 'jenkins-blue')
+
+    assert standby['instance_ids'] == ['i-blue']
+    command = aws['ssm'].send_command.call_args.kwargs
+    assert command['InstanceIds'] == ['i-blue']
+    assert command['Parameters']['commands'] == deployment_orchestrator.STANDBY_PARK_COMMANDS
+
+def test_warm_standby_resumes_jenkins_before_serving(aws):
+    calls = MagicMock()
+    calls.attach_mock(aws['ssm'].send_command, 'send_command')
+    calls.attach_mock(aws['autoscaling'].exit_standby, 'exit_standby')
+
+    deployment_orchestrator.rollback_to_standby('tg-blue', 'topic', 'manual rollback')
+
+    assert [name for name, args, kwargs in calls.mock_calls] == ['send_command', 'exit_standby']
+    command = aws['ssm'].send_command.call_args.kwargs
+    assert command['Parameters']['commands'] == deployment_orchestrator.STANDBY_RESUME_COMMANDS
@@ -0,0 +1,107 @@
+import http.client
+import json
+import socket
+from unittest.mock import MagicMock
+
+import pytest
+
+import cost_optimizer
+import jenkins_api
+import vertical_scaler
+
+@pytest.fixture
+def stand_in():
+    server = jenkins_api.start_stand_in(queue_length=3, busy_executors=2, total_executors=4,
+                                        auth='admin:token', queued_since=0)
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+
+def unreachable_url():
+    """URL of a local port nothing listens on"""
+    with socket.socket() as probe:
+        probe.bind(('127.0.0.1', 0))
+        return f"http://127.0.0.1:{probe.getsockname()[1]}"
+
+def test_unchanged_responses_are_revalidated(stand_in):
+    collector = jenkins_api.JenkinsMetricsCollector(stand_in, auth='admin:token')
+
+    first = collector.collect()
+    second = collector.collect()
+
+    assert first == second == {'queue_length': 3, 'active_executors': 2, 'idle_executors': 2, 'total_executors': 4}
+    assert collector.session.not_modified == 2
+    assert collector.session.connections_opened == 1
+    collector.session.close()
+
+def test_requests_are_authenticated(stand_in):
+    session = jenkins_api.JenkinsSession(stand_in, auth='admin:wrong')
+    with pytest.raises(http.client.HTTPException, match='401'):
+        session.get_json(jenkins_api.COMPUTER_PATH)
+    session.close()
+
+def test_timed_out_connection_is_not_reused(stand_in):
+    session = jenkins_api.JenkinsSession(stand_in, auth='admin:token')
+    session.get_json(jenkins_api.COMPUTER_PATH)
+    timed_out = session.connection
+    timed_out.getresponse = MagicMock(side_effect=socket.timeout('timed out'))
+
+    with pytest.raises(socket.timeout):
+        session.get_json(jenkins_api.COMPUTER_PATH)
+    assert session.connection is None
+
+    assert session.get_json(jenkins_api.COMPUTER_PATH)['busyExecutors'] == 2
+    assert session.connection is not timed_out
+    session.close()
+
+def test_vertical_scaler_reads_through_the_shared_session(stand_in):
+    collector = vertical_scaler.JenkinsApiCollector(stand_in, auth='admin:token')
+
+    signals = collector.collect()
+    collector.collect()
+
+    assert signals['executors_busy'] == 2 and signals['executors_total'] == 4
+    assert signals['queue_wait'] > 0
+    assert collector.session.not_modified == 2
+    collector.session.close()
+
+def test_cost_optimizer_falls_back_when_jenkins_is_unreachable(monkeypatch):
+    collector = jenkins_api.JenkinsMetricsCollector(unreachable_url(), timeout=1)
+    monkeypatch.setattr(cost_optimizer, '_jenkins_collector', collector)
+
+    metrics = cost_optimizer.get_jenkins_metrics()
+
+    assert metrics['available'] is False
+    assert metrics['queue_length'] == 0
+
+def test_vertical_scaler_falls_back_when_jenkins_is_unreachable():
+    collector = vertical_scaler.JenkinsApiCollector(unreachable_url(), timeout=1)
+    history = vertical_scaler.MetricHistory()
+
+    assert vertical_scaler.update_jenkins_signals(history, collector) == {}
+
+def test_cost_optimizer_reports_an_unreachable_controller(monkeypatch):
+    collector = jenkins_api.JenkinsMetricsCollector(unreachable_url(), timeout=1)
+    autoscaling = MagicMock()
+    autoscaling.describe_auto_scaling_groups.return_value = {'AutoScalingGroups': [
+        {'AutoScalingGroupName': cost_optimizer.ASG_NAME, 'DesiredCapacity': 2}
+    ]}
+    sns = MagicMock()
+    put = MagicMock()
+    monkeypatch.setattr(cost_optimizer, '_jenkins_collector', collector)
+    monkeypatch.setattr(cost_optimizer, 'autoscaling', autoscaling)
+    monkeypatch.setattr(cost_optimizer, 'sns', sns)
+    monkeypatch.setattr(cost_optimizer, 'get_infrastructure_costs', lambda: {
+        'worker_price': 0.01, 'monthly_cost': 10, 'savings_percent': 50, 'current_capacity': 2
+    })
+    monkeypatch.setattr(cost_optimizer, 'store_optimization_data', lambda data: None)
+    monkeypatch.setattr(cost_optimizer.cost_metrics, 'put', put)
+    monkeypatch.setattr(cost_optimizer.cost_metrics, 'flush', lambda: 0)
+
+    response = cost_optimizer.lambda_handler({}, None)
+
+    assert json.loads(response['body'])['jenkins_available'] is False
+    assert 'unreachable' in sns.publish.call_args.kwargs['Message']
+    assert ('JenkinsApiAvailable', 0, 'Count') in [call.args for call in put.call_args_list]
+    assert 'JenkinsQueueLength' not in [call.args[0] for call in put.call_args_list]
+    autoscaling.set_desired_capacity.assert_not_called()
+    autoscaling.update_auto_scaling_group.assert_not_called()
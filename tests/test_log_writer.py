@@ -0,0 +1,52 @@
+import json
+from unittest.mock import MagicMock
+
+from log_writer import MAX_EVENT_BYTES, BufferedLogWriter
+
+def messages(writer):
+    return [json.loads(event['message']) for event in writer.events]
+
+def test_oversized_emf_keeps_its_metrics_and_sheds_properties():
+    writer = BufferedLogWriter(MagicMock(), 'group')
+    steps = [{'step': f'step-{i}', 'seconds': i} for i in range(20000)]
+
+    writer.metric('Jenkins/BlueGreen', {'SwitchRollbacks': (1, 'Count')}, {'Outcome': 'rolled_back'}, {'steps': steps})
+
+    assert all(len(event['message'].encode()) <= MAX_EVENT_BYTES for event in writer.events)
+    emf, properties = messages(writer)
+    assert emf['SwitchRollbacks'] == 1 and emf['Outcome'] == 'rolled_back'
+    assert emf['_aws']['CloudWatchMetrics'][0]['Metrics'] == [{'Name': 'SwitchRollbacks', 'Unit': 'Count'}]
+    assert 'steps' not in emf and '_aws' not in properties
+    assert properties['Outcome'] == 'rolled_back' and properties['truncated'] is True
+
+def test_emf_too_big_without_its_properties_is_dropped():
+    writer = BufferedLogWriter(MagicMock(), 'group')
+    metrics = {f'Metric{i:06d}' + 'x' * 100: (i, 'Count') for i in range(3000)}
+
+    writer.metric('Jenkins/BlueGreen', metrics)
+
+    assert writer.events == []
+
+def test_oversized_record_stays_valid_json():
+    writer = BufferedLogWriter(MagicMock(), 'group')
+
+    writer.log({'event': 'span', 'instance_ids': ['i-' + 'f' * 17] * 20000})
+
+    event, = writer.events
+    assert len(event['message'].encode()) <= MAX_EVENT_BYTES
+    record = json.loads(event['message'])
+    assert record['event'] == 'span'
+    assert record['truncated'] is True and record['original_bytes'] > MAX_EVENT_BYTES
+
+def test_record_of_many_short_fields_is_cut_down_to_fit():
+    writer = BufferedLogWriter(MagicMock(), 'group')
+    record = {'event': 'span'}
+    record.update({f'field_{i:06d}': 'x' * 200 for i in range(5000)})
+
+    writer.log(record)
+
+    event, = writer.events
+    assert len(event['message'].encode()) <= MAX_EVENT_BYTES
+    stub = json.loads(event['message'])
+    assert stub['event'] == 'span' and stub['truncated'] is True
+    assert 'preview' not in stub and len(stub) < len(record)
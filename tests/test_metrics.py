@@ -0,0 +1,53 @@
+import json
+
+import pytest
+
+from metrics import MAX_EMF_METRICS, MetricsEmitter
+
+def printed_documents(capsys):
+    return [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+
+def test_emf_mode_prints_one_document_per_dimension_set(capsys):
+    emitter = MetricsEmitter('Jenkins/Test', {'Environment': 'dev', 'Unset': ''}, mode='emf')
+    emitter.put('RemediationSeconds', 1.5, 'Seconds', {'Action': 'ISOLATE_INSTANCE'}, timestamp=1000)
+    emitter.put('RemediationFailures', 0, 'Count', {'Action': 'ISOLATE_INSTANCE'}, timestamp=1000)
+    emitter.put('FindingsProcessed', 3, 'Count', timestamp=1000)
+
+    assert emitter.flush() == 3
+    by_action = {document.get('Action'): document for document in printed_documents(capsys)}
+
+    isolate = by_action['ISOLATE_INSTANCE']
+    assert isolate['_aws'] == {
+        'Timestamp': 1000000,
+        'CloudWatchMetrics': [{
+            'Namespace': 'Jenkins/Test',
+            'Dimensions': [['Action', 'Environment']],
+            'Metrics': [{'Name': 'RemediationSeconds', 'Unit': 'Seconds'}, {'Name': 'RemediationFailures', 'Unit': 'Count'}]
+        }]
+    }
+    assert isolate['Environment'] == 'dev'
+    assert isolate['RemediationSeconds'] == 1.5 and isolate['RemediationFailures'] == 0
+
+    totals = by_action[None]
+    assert totals['_aws']['CloudWatchMetrics'][0]['Dimensions'] == [['Environment']]
+    assert totals['FindingsProcessed'] == 3
+    assert 'Unset' not in totals
+    assert emitter.api_calls == 0
+
+def test_emf_mode_splits_repeated_names_and_the_metric_limit(capsys):
+    emitter = MetricsEmitter('Jenkins/Test', mode='emf')
+    emitter.put('Duration', 1, timestamp=1000)
+    emitter.put('Duration', 2, timestamp=1000)
+    for i in range(MAX_EMF_METRICS + 1):
+        emitter.put(f'Metric{i}', i, timestamp=1000)
+
+    emitter.flush()
+    documents = printed_documents(capsys)
+
+    assert [document['Duration'] for document in documents if 'Duration' in document] == [1, 2]
+    assert all(len(document['_aws']['CloudWatchMetrics'][0]['Metrics']) <= MAX_EMF_METRICS for document in documents)
+    assert sum(len(document['_aws']['CloudWatchMetrics'][0]['Metrics']) for document in documents) == MAX_EMF_METRICS + 3
+
+def test_unknown_mode_is_rejected():
+    with pytest.raises(ValueError):
+        MetricsEmitter('Jenkins/Test', mode='statsd')
@@ -0,0 +1,371 @@
+import json
+from datetime import datetime, timezone
+from unittest.mock import MagicMock
+
+import pytest
+from botocore.exceptions import ClientError
+
+import security_responder
+
+FINDING = {
+    'id': 'finding-1',
+    'type': 'Backdoor:EC2/C&CActivity.B',
+    'severity': 8.5,
+    'resource': {'instanceDetails': {'instanceId': 'i-1', 'networkInterfaces': [{'vpcId': 'vpc-1'}]}}
+}
+
+@pytest.fixture(autouse=True)
+def reset_state(monkeypatch):
+    security_responder._isolation_groups.clear()
+    security_responder.snapshot.reset()
+    monkeypatch.setattr(security_responder, 'ALERT_DIGEST_WINDOW_SECONDS', 0)
+    monkeypatch.setattr(security_responder, '_elbv2', MagicMock())
+
+OPEN_EGRESS = [{'IpProtocol': '-1', 'IpRanges': [{'CidrIp': '0.0.0.0/0'}]}]
+
+def make_ec2():
+    ec2 = MagicMock()
+    ec2.exceptions.ClientError = ClientError
+    ec2.describe_security_groups.return_value = {
+        'SecurityGroups': [{'GroupId': 'sg-isolation', 'IpPermissionsEgress': []}]
+    }
+    return ec2
+
+def test_failed_remediation_is_retried_on_redelivery():
+    store = security_responder.InMemoryStateStore()
+    ec2 = make_ec2()
+    ec2.modify_instance_attribute.side_effect = [Exception('throttled'), None]
+    findings = [('message-1', FINDING)]
+
+    results, failed = security_responder.process_findings(findings, MagicMock(), ec2, MagicMock(), 'test', 'topic', store)
+    assert failed == ['message-1']
+    assert results[0]['remediations'][0]['actions'][0]['status'] == 'failed'
+
+    results, failed = security_responder.process_findings(findings, MagicMock(), ec2, MagicMock(), 'test', 'topic', store)
+    assert failed == []
+    assert results[0]['duplicate'] is False
+    assert results[0]['remediations'][0]['actions'][0]['status'] == 'succeeded'
+
+    # Handled now, so the next re-emission is a duplicate
+    results, _ = security_responder.process_findings(findings, MagicMock(), ec2, MagicMock(), 'test', 'topic', store)
+    assert results[0]['duplicate'] is True
+
+def test_failed_remediation_is_a_batch_item_failure(monkeypatch):
+    ec2 = make_ec2()
+    ec2.modify_instance_attribute.side_effect = Exception('throttled')
+    clients = {'ec2': ec2, 'sns': MagicMock(), 'autoscaling': MagicMock()}
+    monkeypatch.setattr(security_responder.boto3, 'client', lambda name, *args, **kwargs: clients[name])
+    monkeypatch.setattr(security_responder, '_state_store', security_responder.InMemoryStateStore())
+    monkeypatch.setattr(security_responder.MetricsEmitter, 'flush', lambda self: 0)
+
+    event = {'Records': [{'messageId': 'message-1', 'body': json.dumps({'detail': FINDING})}]}
+    response = security_responder.lambda_handler(event, None)
+
+    assert response['batchItemFailures'] == [{'itemIdentifier': 'message-1'}]
+
+def use_clients(monkeypatch, ec2):
+    clients = {'ec2': ec2, 'sns': MagicMock(), 'autoscaling': MagicMock()}
+    monkeypatch.setattr(security_responder.boto3, 'client', lambda name, *args, **kwargs: clients[name])
+    monkeypatch.setattr(security_responder, '_state_store', security_responder.InMemoryStateStore())
+    monkeypatch.setattr(security_responder.MetricsEmitter, 'flush', lambda self: 0)
+
+def test_unreadable_message_fails_on_its_own(monkeypatch):
+    use_clients(monkeypatch, make_ec2())
+
+    event = {'Records': [
+        {'messageId': 'message-1', 'body': '{not json'},
+        {'messageId': 'message-2', 'body': json.dumps({'detail': FINDING})}
+    ]}
+    response = security_responder.lambda_handler(event, None)
+
+    assert response['statusCode'] == 200
+    assert response['batchItemFailures'] == [{'itemIdentifier': 'message-1'}]
+
+def test_unexpected_error_fails_the_whole_batch(monkeypatch):
+    use_clients(monkeypatch, make_ec2())
+    monkeypatch.setattr(security_responder, 'process_findings', MagicMock(side_effect=Exception('boom')))
+
+    event = {'Records': [
+        {'messageId': 'message-1', 'body': json.dumps({'detail': FINDING})},
+        {'messageId': 'message-2', 'body': json.dumps({'detail': FINDING})}
+    ]}
+    response = security_responder.lambda_handler(event, None)
+
+    assert response['statusCode'] == 500
+    assert response['batchItemFailures'] == [{'itemIdentifier': 'message-1'}, {'itemIdentifier': 'message-2'}]
+
+def test_failed_single_event_returns_500(monkeypatch):
+    ec2 = make_ec2()
+    ec2.modify_instance_attribute.side_effect = Exception('throttled')
+    use_clients(monkeypatch, ec2)
+
+    response = security_responder.lambda_handler({'detail': FINDING}, None)
+
+    assert response['statusCode'] == 500
+    assert json.loads(response['body'])['error'].startswith('Remediation failed')
+
+def test_reused_isolation_group_egress_is_revoked():
+    ec2 = make_ec2()
+    ec2.describe_security_groups.return_value = {
+        'SecurityGroups': [{'GroupId': 'sg-isolation', 'IpPermissionsEgress': OPEN_EGRESS}]
+    }
+
+    assert security_responder.get_isolation_group(ec2, 'vpc-1', 'test') == 'sg-isolation'
+    ec2.revoke_security_group_egress.assert_called_once_with(GroupId='sg-isolation', IpPermissions=OPEN_EGRESS)
+
+    # A later invocation re-checks the cached group
+    security_responder.snapshot.reset()
+    ec2.revoke_security_group_egress.reset_mock()
+    security_responder.get_isolation_group(ec2, 'vpc-1', 'test')
+    assert ec2.describe_security_groups.call_args.kwargs == {'GroupIds': ['sg-isolation']}
+    ec2.revoke_security_group_egress.assert_called_once()
+
+def test_created_group_is_deleted_when_revoke_fails():
+    ec2 = make_ec2()
+    ec2.describe_security_groups.return_value = {'SecurityGroups': []}
+    ec2.create_security_group.return_value = {'GroupId': 'sg-new'}
+    ec2.revoke_security_group_egress.side_effect = ClientError({'Error': {'Code': 'RequestLimitExceeded'}}, 'RevokeSecurityGroupEgress')
+
+    assert security_responder.isolate_instance(ec2, 'i-1', 'test', 'vpc-1') is False
+    ec2.delete_security_group.assert_called_once_with(GroupId='sg-new')
+    ec2.modify_instance_attribute.assert_not_called()
+    assert 'vpc-1' not in security_responder._isolation_groups
+
+def test_isolation_fails_when_egress_cannot_be_revoked():
+    ec2 = make_ec2()
+    ec2.describe_security_groups.return_value = {
+        'SecurityGroups': [{'GroupId': 'sg-isolation', 'IpPermissionsEgress': OPEN_EGRESS}]
+    }
+    ec2.revoke_security_group_egress.side_effect = ClientError({'Error': {'Code': 'UnauthorizedOperation'}}, 'RevokeSecurityGroupEgress')
+
+    assert security_responder.isolate_instance(ec2, 'i-1', 'test', 'vpc-1') is False
+    ec2.modify_instance_attribute.assert_not_called()
+
+def baseline_actions(finding_type, severity):
+    """The substring chain RESPONSE_RULES replaced"""
+    if severity >= 8.0:
+        if 'Malware' in finding_type or 'Trojan' in finding_type:
+            return ['ISOLATE_INSTANCE']
+        elif 'Cryptocurrency' in finding_type:
+            return ['TERMINATE_INSTANCE']
+        elif 'Backdoor' in finding_type:
+            return ['ISOLATE_INSTANCE']
+    return []
+
+FINDING_TYPES = [
+    'Backdoor:EC2/C&CActivity.B',
+    'Backdoor:EC2/C&CActivity.B!DNS',
+    'Backdoor:EC2/DenialOfService.Tcp',
+    'Backdoor:Runtime/C&CActivity.B',
+    'Trojan:EC2/BlackholeTraffic',
+    'Trojan:EC2/DNSDataExfiltration',
+    'Trojan:Runtime/DropPoint!DNS',
+    'CryptoCurrency:EC2/BitcoinTool.B',
+    'CryptoCurrency:Runtime/BitcoinTool.B!DNS',
+    'Cryptocurrency:EC2/BitcoinTool.B',
+    'Execution:EC2/MaliciousFile',
+    'Execution:EC2/Malware',
+    'Malware:EC2/Foo',
+    'Impact:EC2/MalwareDropper',
+    'Recon:EC2/PortProbeUnprotectedPort',
+    'UnauthorizedAccess:EC2/TorClient',
+    'Impact:EC2/WinRMBruteForce',
+]
+
+# Decisions the rules table makes on purpose where the chain did not
+INTENDED_ADDITIONS = {
+    # GuardDuty spells it CryptoCurrency, which the case-sensitive chain missed
+    'CryptoCurrency:EC2/BitcoinTool.B': ['TERMINATE_INSTANCE'],
+    'CryptoCurrency:Runtime/BitcoinTool.B!DNS': ['TERMINATE_INSTANCE'],
+}
+
+@pytest.mark.parametrize('finding_type', FINDING_TYPES)
+@pytest.mark.parametrize('severity', [2.0, 5.0, 7.9, 8.0, 8.9, 9.5])
+def test_rules_table_keeps_baseline_decisions(finding_type, severity):
+    expected = baseline_actions(finding_type, severity)
+    if severity >= 8.0 and finding_type in INTENDED_ADDITIONS:
+        expected = INTENDED_ADDITIONS[finding_type]
+    assert security_responder.determine_response_actions(finding_type, severity) == expected
+
+def test_digest_survives_a_failed_publish(monkeypatch):
+    store = security_responder.InMemoryStateStore()
+    store.buffer_alert('Recon:EC2/PortProbeUnprotectedPort|MEDIUM|i-1', {
+        'finding_id': 'finding-2', 'severity': 5.0, 'actions': [], 'description': 'probe',
+        'region': 'us-east-1', 'timestamp': '2026-01-01 00:00:00 UTC'
+    }, 0)
+    sns = MagicMock()
+    sns.publish.side_effect = [Exception('throttled'), None]
+
+    assert security_responder.flush_due_alerts(sns, 'topic', store) == 0
+    assert security_responder.flush_due_alerts(sns, 'topic', store) == 1
+    assert security_responder.flush_due_alerts(sns, 'topic', store) == 0
+    assert sns.publish.call_count == 2
+
+def test_dynamodb_digest_is_kept_until_published():
+    dynamodb = MagicMock()
+    dynamodb.exceptions.ConditionalCheckFailedException = type('ConditionalCheckFailed', (Exception,), {})
+    dynamodb.get_paginator.return_value.paginate.return_value = [{'Items': [{'pk': {'S': 'digest#group|LOW|none'}}]}]
+    dynamodb.update_item.return_value = {'Attributes': {
+        'pk': {'S': 'digest#group|LOW|none'},
+        'window_ends': {'N': '0'},
+        'alert_count': {'N': '1'},
+        'alerts': {'L': [{'S': json.dumps({'finding_id': 'f', 'severity': 2.0, 'actions': [], 'description': 'd',
+                                           'region': 'r', 'timestamp': 't'})}]}
+    }}
+    store = security_responder.DynamoDBStateStore('table', dynamodb)
+    sns = MagicMock()
+    sns.publish.side_effect = Exception('throttled')
+
+    assert security_responder.flush_due_alerts(sns, 'topic', store) == 0
+    dynamodb.get_paginator.assert_called_once_with('query')
+    assert dynamodb.get_paginator.return_value.paginate.call_args.kwargs['IndexName'] == security_responder.DIGEST_INDEX_NAME
+    # Only the lease was taken; nothing was removed
+    assert dynamodb.update_item.call_count == 1
+    dynamodb.delete_item.assert_not_called()
+
+@pytest.mark.parametrize('actions, immediate', [(['ISOLATE_INSTANCE'], True), ([], False)])
+def test_acted_on_findings_are_not_digested(monkeypatch, actions, immediate):
+    monkeypatch.setattr(security_responder, 'ALERT_DIGEST_WINDOW_SECONDS', 300)
+    store = security_responder.InMemoryStateStore()
+    sns = MagicMock()
+    result = security_responder.build_result(FINDING, actions, duplicate=False)
+
+    security_responder.dispatch_alert(FINDING, result, sns, 'topic', store)
+
+    assert sns.publish.called is immediate
+    assert bool(store._digests) is not immediate
+
+def make_autoscaling(instances, desired, max_size=10):
+    autoscaling = MagicMock()
+    autoscaling.describe_auto_scaling_instances.return_value = {
+        'AutoScalingInstances': [{'InstanceId': i, 'AutoScalingGroupName': 'asg-1'} for i in ('i-1', 'i-2')]
+    }
+    autoscaling.describe_auto_scaling_groups.return_value = {'AutoScalingGroups': [{
+        'AutoScalingGroupName': 'asg-1',
+        'DesiredCapacity': desired,
+        'MaxSize': max_size,
+        'TargetGroupARNs': ['tg-1'],
+        'Instances': [
+            {'InstanceId': i, 'LifecycleState': 'InService', 'HealthStatus': 'Healthy'} for i in instances
+        ]
+    }]}
+    return autoscaling
+
+def test_prelaunch_raises_capacity_once_per_group(monkeypatch):
+    monkeypatch.setattr(security_responder, 'REPLACEMENT_MODE', 'prelaunch')
+    ec2 = make_ec2()
+    autoscaling = make_autoscaling(['i-1', 'i-2', 'i-3'], desired=3)
+    remediations = {
+        instance_id: {'actions': [('TERMINATE_INSTANCE', f'{instance_id}:TERMINATE_INSTANCE')], 'vpc_id': 'vpc-1'}
+        for instance_id in ('i-1', 'i-2')
+    }
+
+    outcomes = security_responder.run_remediations(remediations, ec2, autoscaling, 'test', security_responder.InMemoryStateStore())
+
+    autoscaling.set_desired_capacity.assert_called_once_with(
+        AutoScalingGroupName='asg-1', DesiredCapacity=5, HonorCooldown=False
+    )
+    assert ec2.create_tags.call_count == 2
+    autoscaling.terminate_instance_in_auto_scaling_group.assert_not_called()
+    # Victims wait for their replacement contained and out of the load balancer
+    assert {c.kwargs['InstanceId'] for c in ec2.modify_instance_attribute.call_args_list} == {'i-1', 'i-2'}
+    assert {c.kwargs['Targets'][0]['Id'] for c in security_responder._elbv2.deregister_targets.call_args_list} == {'i-1', 'i-2'}
+    assert all(
+        action['status'] == 'succeeded' and action['termination'] == 'pending'
+        for outcome in outcomes.values() for action in outcome['actions']
+    )
+
+def test_prelaunch_victim_is_terminated_when_it_cannot_be_isolated(monkeypatch):
+    monkeypatch.setattr(security_responder, 'REPLACEMENT_MODE', 'prelaunch')
+    ec2 = make_ec2()
+    ec2.modify_instance_attribute.side_effect = Exception('throttled')
+    autoscaling = make_autoscaling(['i-1', 'i-2', 'i-3'], desired=3)
+    remediations = {'i-1': {'actions': [('TERMINATE_INSTANCE', 'i-1:TERMINATE_INSTANCE')], 'vpc_id': 'vpc-1'}}
+
+    outcomes = security_responder.run_remediations(remediations, ec2, autoscaling, 'test', security_responder.InMemoryStateStore())
+
+    ec2.create_tags.assert_not_called()
+    autoscaling.terminate_instance_in_auto_scaling_group.assert_called_once_with(
+        InstanceId='i-1', ShouldDecrementDesiredCapacity=True
+    )
+    assert outcomes['i-1']['actions'][0]['termination'] == 'done'
+
+def pending_victims(ec2, tagged_at):
+    ec2.get_paginator.return_value.paginate.return_value = [{'Reservations': [{'Instances': [{
+        'InstanceId': 'i-1',
+        'Tags': [
+            {'Key': 'aws:autoscaling:groupName', 'Value': 'asg-1'},
+            {'Key': security_responder.PENDING_TERMINATION_TAG, 'Value': str(tagged_at)}
+        ]
+    }]}]}]
+
+def test_prelaunch_victim_is_terminated_once_replaced():
+    ec2 = MagicMock()
+    pending_victims(ec2, security_responder.time.time())
+    # i-1 is the victim, i-4 its replacement; desired still holds the reserved slot
+    autoscaling = make_autoscaling(['i-1', 'i-2', 'i-3', 'i-4'], desired=4)
+    metrics = MagicMock()
+
+    assert security_responder.complete_prelaunch_terminations(ec2, autoscaling, metrics) == 1
+    autoscaling.terminate_instance_in_auto_scaling_group.assert_called_once_with(
+        InstanceId='i-1', ShouldDecrementDesiredCapacity=True
+    )
+    assert metrics.put.call_args[0][0] == 'TimeToReplacementSeconds'
+
+def test_prelaunch_victim_waits_for_its_replacement():
+    ec2 = MagicMock()
+    pending_victims(ec2, security_responder.time.time())
+    autoscaling = make_autoscaling(['i-1', 'i-2', 'i-3'], desired=4)
+
+    assert security_responder.complete_prelaunch_terminations(ec2, autoscaling, MagicMock()) == 0
+    autoscaling.terminate_instance_in_auto_scaling_group.assert_not_called()
+
+def test_prelaunch_victim_keeps_its_slot_when_no_replacement_came_up():
+    ec2 = MagicMock()
+    pending_victims(ec2, security_responder.time.time() - security_responder.REPLACEMENT_WAIT_SECONDS - 1)
+    autoscaling = make_autoscaling(['i-1', 'i-2', 'i-3'], desired=4)
+
+    assert security_responder.complete_prelaunch_terminations(ec2, autoscaling, MagicMock()) == 1
+    autoscaling.terminate_instance_in_auto_scaling_group.assert_called_once_with(
+        InstanceId='i-1', ShouldDecrementDesiredCapacity=False
+    )
+
+def test_terminate_mode_times_the_replacement():
+    requested_at = security_responder.time.time() - 120
+    ec2 = make_ec2()
+    autoscaling = make_autoscaling(['i-1', 'i-2', 'i-3'], desired=3)
+    remediations = {'i-1': {'actions': [('TERMINATE_INSTANCE', 'i-1:TERMINATE_INSTANCE')], 'vpc_id': 'vpc-1'}}
+    security_responder.run_remediations(remediations, ec2, autoscaling, 'test', security_responder.InMemoryStateStore())
+    assert ec2.create_tags.call_args.kwargs['Tags'][0]['Key'] == security_responder.REPLACEMENT_REQUESTED_TAG
+
+    victim = {
+        'InstanceId': 'i-1',
+        'Tags': [
+            {'Key': 'aws:autoscaling:groupName', 'Value': 'asg-1'},
+            {'Key': security_responder.REPLACEMENT_REQUESTED_TAG, 'Value': str(requested_at)}
+        ]
+    }
+    launched = {'i-2': requested_at - 3600, 'i-3': requested_at - 3600, 'i-4': requested_at + 90}
+
+    def paginate(Filters=None, InstanceIds=None):
+        if Filters:
+            return [{'Reservations': [{'Instances': [victim]}]}]
+        return [{'Reservations': [{'Instances': [
+            {'InstanceId': i, 'LaunchTime': datetime.fromtimestamp(launched[i], timezone.utc)} for i in InstanceIds
+        ]}]}]
+    ec2.get_paginator.return_value.paginate.side_effect = paginate
+    autoscaling = make_autoscaling(['i-2', 'i-3'], desired=3)
+    store = security_responder.InMemoryStateStore()
+    metrics = MagicMock()
+
+    # Still waiting: both in-service instances predate the request
+    assert security_responder.record_replacement_times(ec2, autoscaling, metrics, store) == 0
+
+    autoscaling = make_autoscaling(['i-2', 'i-3', 'i-4'], desired=3)
+    security_responder.snapshot.reset()
+    assert security_responder.record_replacement_times(ec2, autoscaling, metrics, store) == 1
+    assert metrics.put.call_args[0][0] == 'TimeToReplacementSeconds'
+
+    # Reported once
+    security_responder.snapshot.reset()
+    assert security_responder.record_replacement_times(ec2, autoscaling, metrics, store) == 0
@@ -0,0 +1,104 @@
+from unittest.mock import MagicMock
+
+import pytest
+
+import vertical_scaler
+
+ASG = {'AutoScalingGroupName': 'jenkins-blue', 'DesiredCapacity': 1}
+
+@pytest.fixture
+def scaler(monkeypatch):
+    """run_scaling_check with AWS and the decision inputs stubbed out"""
+    history = vertical_scaler.MetricHistory()
+    store = MagicMock()
+    store.load.return_value = history
+    autoscaling = MagicMock()
+    sync = MagicMock(return_value=(False, None))
+
+    monkeypatch.setattr(vertical_scaler, 'autoscaling', autoscaling)
+    monkeypatch.setattr(vertical_scaler, 'SCALING_MODE', 'reactive')
+    monkeypatch.setattr(vertical_scaler, 'get_active_asg', lambda: ASG)
+    monkeypatch.setattr(vertical_scaler, 'get_current_instance_type', lambda asg: 't3.small')
+    monkeypatch.setattr(vertical_scaler, 'get_history_store', lambda: store)
+    monkeypatch.setattr(vertical_scaler, 'update_metric_history', lambda asg, history: 0)
+    monkeypatch.setattr(vertical_scaler, 'sync_refresh_state', sync)
+    monkeypatch.setattr(vertical_scaler, 'get_jenkins_collector', lambda: None)
+    monkeypatch.setattr(vertical_scaler, 'determine_scaling_action', lambda *args: 't3.large')
+    monkeypatch.setattr(vertical_scaler, 'apply_scaling_policy', lambda current, proposed, history: (proposed, 'test'))
+    monkeypatch.setattr(vertical_scaler, 'apply_right_size', lambda current, approved, history, catalog: approved)
+    monkeypatch.setattr(vertical_scaler, 'get_instance_catalog', lambda: None)
+    monkeypatch.setattr(vertical_scaler, 'perform_vertical_scaling',
+                        lambda asg, old, new: {'status': 'success', 'refresh_id': 'refresh-2'})
+    monkeypatch.setattr(vertical_scaler, 'send_notification', MagicMock())
+
+    return {'history': history, 'autoscaling': autoscaling, 'sync': sync}
+
+def test_adopted_refresh_is_not_cancelled(scaler):
+    scaler['history'].refresh = {'id': 'refresh-1', 'target_type': None, 'percent_complete': 40}
+    scaler['sync'].return_value = (True, None)
+
+    result = vertical_scaler.run_scaling_check()
+
+    assert result['status'] == 'refresh_in_progress'
+    scaler['autoscaling'].cancel_instance_refresh.assert_not_called()
+
+def test_own_refresh_is_cancelled_for_a_new_target(scaler):
+    scaler['history'].refresh = {'id': 'refresh-1', 'target_type': 't3.medium', 'percent_complete': 40}
+    scaler['sync'].return_value = (True, None)
+
+    result = vertical_scaler.run_scaling_check()
+
+    assert result['status'] == 'refresh_cancelling'
+    scaler['autoscaling'].cancel_instance_refresh.assert_called_once()
+
+def test_replacement_refresh_is_recorded_and_notified(scaler):
+    finished = {'id': 'refresh-1', 'target_type': 't3.medium', 'replacement_type': 't3.large'}
+    scaler['sync'].return_value = (False, finished)
+
+    result = vertical_scaler.run_scaling_check()
+
+    assert result['status'] == 'success'
+    assert scaler['history'].scaling_events[-1]['to'] == 't3.large'
+    assert scaler['history'].refresh['id'] == 'refresh-2'
+    vertical_scaler.send_notification.assert_called_once()
+
+CATALOG = vertical_scaler.InstanceTypeCatalog([
+    {'instance_type': 't3.small', 'vcpus': 2, 'memory_mib': 2048, 'price': 0.02},
+    {'instance_type': 't3.medium', 'vcpus': 2, 'memory_mib': 4096, 'price': 0.04},
+    {'instance_type': 't3.large', 'vcpus': 2, 'memory_mib': 8192, 'price': 0.08}
+])
+
+def learned_history(memory_mib):
+    """History whose weekly profile forecasts a flat memory demand"""
+    history = vertical_scaler.MetricHistory()
+    samples = vertical_scaler.MIN_PROFILE_SAMPLES
+    history.forecast = {
+        'profile': {'cpu': [0.5] * 168, 'memory': [float(memory_mib)] * 168},
+        'counts': {'cpu': [samples] * 168, 'memory': [samples] * 168}
+    }
+    return history
+
+def test_forecast_peak_scales_up_ahead_of_time():
+    history = learned_history(4000)
+
+    instance_type, reason = vertical_scaler.apply_forecast('t3.small', 't3.small', history, CATALOG)
+
+    assert instance_type == 't3.large'
+    assert 'ahead of forecast' in reason
+
+def test_refused_forecast_scale_up_holds_a_scale_down():
+    history = learned_history(4000)
+    history.record_scaling('t3.medium', 't3.medium', 'up', now=vertical_scaler.time.time() - 60)
+
+    instance_type, reason = vertical_scaler.apply_forecast('t3.medium', 't3.small', history, CATALOG)
+
+    assert instance_type == 't3.medium'
+    assert reason.startswith('scale-down held')
+
+def test_predictive_mode_needs_a_history_bucket(monkeypatch):
+    monkeypatch.setattr(vertical_scaler, 'SCALING_MODE', 'predictive')
+    monkeypatch.setattr(vertical_scaler, 'METRIC_HISTORY_BUCKET', None)
+    assert vertical_scaler.get_scaling_mode() == 'reactive'
+
+    monkeypatch.setattr(vertical_scaler, 'METRIC_HISTORY_BUCKET', 'history-bucket')
+    assert vertical_scaler.get_scaling_mode() == 'predictive'